@@ -27,8 +27,25 @@ class Beacon(object):
         self.functions = functions
         self.beacons = salt.loader.beacons(opts, functions)
         self.interval_map = dict()
+        # The beacons providing a get_fds function are only run when one of
+        # their file descriptors is readable once an io_loop is set
+        self.io_loop = None
+        self.ready_callback = None
+        self.watched = {}
+        self.muted = set()
+        self.ready = set()
 
-    def process(self, config, grains):
+    def set_io_loop(self, io_loop, callback):
+        '''
+        Watch the file descriptors of the beacons providing a ``get_fds``
+        function with the given io_loop. When one of them is readable, the
+        beacon is marked as ready and ``callback`` is called, which is
+        expected to call ``process`` with ``ready_only=True``.
+        '''
+        self.io_loop = io_loop
+        self.ready_callback = callback
+
+    def process(self, config, grains, ready_only=False):
         '''
         Process the configured beacons
 
@@ -40,14 +57,24 @@ class Beacon(object):
                 - files:
                     - /etc/fstab: {}
                     - /var/cache/foo: {}
+
+        With ``ready_only``, only the watched beacons whose file descriptors
+        are readable are run.
         '''
         ret = []
         b_config = copy.deepcopy(config)
         if 'enabled' in b_config and not b_config['enabled']:
+            self.unwatch()
             return
+        if not ready_only:
+            for mod in list(self.watched):
+                if mod not in config:
+                    self.unwatch(mod)
         for mod in config:
             if mod == 'enabled':
                 continue
+            if ready_only and mod not in self.ready:
+                continue
 
             # Convert beacons that are lists to a dict to make processing easier
             current_beacon_config = None
@@ -60,6 +87,7 @@ class Beacon(object):
             if 'enabled' in current_beacon_config:
                 if not current_beacon_config['enabled']:
                     log.trace('Beacon %s disabled', mod)
+                    self.unwatch(mod)
                     continue
                 else:
                     # remove 'enabled' item before processing the beacon
@@ -74,6 +102,24 @@ class Beacon(object):
             if fun_str in self.beacons:
                 runonce = self._determine_beacon_config(current_beacon_config, 'run_once')
                 interval = self._determine_beacon_config(current_beacon_config, 'interval')
+                # The beacons run on an interval are polled
+                fds_str = '{0}.get_fds'.format(mod)
+                watch = self.io_loop is not None and not interval and \
+                    fds_str in self.beacons
+                if ready_only and not watch:
+                    continue
+                watch_config = copy.deepcopy(b_config[mod]) if watch else None
+                if watch and mod in self.watched:
+                    if self.watched[mod][1] != watch_config:
+                        # Run the beacon and watch it again with its new
+                        # configuration
+                        self.unwatch(mod)
+                    elif not ready_only:
+                        self._arm(mod)
+                        if mod not in self.ready:
+                            log.trace('Skipping beacon %s. No data available.', mod)
+                            continue
+                self.ready.discard(mod)
                 if interval:
                     b_config = self._trim_config(b_config, mod, 'interval')
                     if not self._process_interval(mod, interval):
@@ -91,6 +137,7 @@ class Beacon(object):
                         close_str = '{0}.close'.format(mod)
                         if close_str in self.beacons:
                             log.info('Closing beacon %s. State run in progress.', mod)
+                            self.unwatch(mod)
                             self.beacons[close_str](b_config[mod])
                         else:
                             log.info('Skipping beacon %s. State run in progress.', mod)
@@ -117,12 +164,82 @@ class Beacon(object):
                     if 'id' not in data:
                         data['id'] = self.opts['id']
                     ret.append({'tag': tag, 'data': data})
+                if watch:
+                    self._watch(mod, b_config[mod], watch_config)
+                    self._arm(mod)
                 if runonce:
+                    self.unwatch(mod)
                     self.disable_beacon(mod)
             else:
                 log.warning('Unable to process beacon %s', mod)
         return ret
 
+    def _watch(self, mod, config, watch_config):
+        '''
+        Register the file descriptors of a beacon with the io_loop after it
+        ran. The beacon is watched until its ``watch_config`` changes, and
+        polled as long as its ``get_fds`` function returns no descriptor.
+        '''
+        try:
+            fds = list(self.beacons['{0}.get_fds'.format(mod)](config) or [])
+        except Exception:
+            log.error('Unable to get the file descriptors of beacon %s, '
+                      'it will be polled', mod, exc_info=True)
+            fds = []
+        if mod in self.watched:
+            if self.watched[mod][0] == fds:
+                return
+            self.unwatch(mod)
+        if not fds:
+            return
+
+        def _handle_fd(fd, events):
+            # Wait for the beacon to run before watching it again, so that
+            # the beacon is not marked as ready again while it reads its data
+            self._mute(mod)
+            self.ready.add(mod)
+            self.ready_callback()
+
+        for fd in fds:
+            self.io_loop.add_handler(fd, _handle_fd, self.io_loop.READ)
+        log.debug('Watching the file descriptors %s of beacon %s', fds, mod)
+        self.watched[mod] = (fds, watch_config)
+
+    def _mute(self, mod):
+        '''
+        Stop watching the file descriptors of a beacon until it is armed
+        '''
+        if mod in self.watched and mod not in self.muted:
+            for fd in self.watched[mod][0]:
+                self.io_loop.update_handler(fd, 0)
+            self.muted.add(mod)
+
+    def _arm(self, mod):
+        '''
+        Watch the file descriptors of a muted beacon again
+        '''
+        if mod in self.muted:
+            for fd in self.watched[mod][0]:
+                self.io_loop.update_handler(fd, self.io_loop.READ)
+            self.muted.discard(mod)
+
+    def unwatch(self, mod=None):
+        '''
+        Stop watching the file descriptors of a beacon, or of all of the
+        beacons if no beacon is passed
+        '''
+        mods = list(self.watched) if mod is None else [mod]
+        for mod_ in mods:
+            if mod_ not in self.watched:
+                continue
+            for fd in self.watched.pop(mod_)[0]:
+                try:
+                    self.io_loop.remove_handler(fd)
+                except Exception:
+                    pass
+            self.muted.discard(mod_)
+            self.ready.discard(mod_)
+
     def _trim_config(self, b_config, mod, key):
         '''
         Take a beacon configuration and strip out the interval bits
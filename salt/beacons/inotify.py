@@ -323,6 +323,22 @@ def beacon(config):
     return ret
 
 
+def get_fds(config):
+    '''
+    Return the file descriptor of the inotify instance once all of the
+    configured paths are watched, so that the minion only runs the beacon
+    when there are events to read. The beacon is polled as long as some of
+    the paths do not exist.
+    '''
+    _config = {}
+    list(map(_config.update, config))
+    wm = _get_notifier(_config)._watch_manager
+    for path in _config.get('files', {}):
+        if wm.get_wd(path) is None:
+            return []
+    return [wm.get_fd()]
+
+
 def close(config):
     if 'inotify.notifier' in __context__:
         __context__['inotify.notifier'].stop()
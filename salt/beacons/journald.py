@@ -62,6 +62,17 @@ def validate(config):
     return True, 'Valid beacon configuration'
 
 
+def get_fds(config):
+    '''
+    Return the file descriptor of the journal, which is readable when new
+    entries are available, so that the minion only runs the beacon then
+    '''
+    journal = _get_journal()
+    fd = journal.fileno()
+    __context__['systemd.journald.watched'] = True
+    return [fd]
+
+
 def beacon(config):
     '''
     The journald beacon allows for the systemd journal to be parsed and linked
@@ -80,6 +91,9 @@ def beacon(config):
     '''
     ret = []
     journal = _get_journal()
+    if __context__.get('systemd.journald.watched'):
+        # Acknowledge the wake up of the journal file descriptor
+        journal.process()
 
     _config = {}
     list(map(_config.update, config))
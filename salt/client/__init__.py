@@ -29,6 +29,7 @@ from datetime import datetime
 # Import salt libs
 import salt.config
 import salt.cache
+import salt.client.stream
 import salt.payload
 import salt.transport
 import salt.loader
@@ -170,9 +171,18 @@ class LocalClient(object):
                 listen=False,
                 io_loop=io_loop,
                 keep_loop=keep_loop)
+        if self.opts.get('local_client_event_filter', False) \
+                and hasattr(self.event, 'set_tag_prefixes'):
+            # Only get the events of the subscribed jobs from the publisher
+            self.event.set_tag_prefixes([])
         self.utils = salt.loader.utils(self.opts)
         self.functions = salt.loader.minion_mods(self.opts, utils=self.utils)
         self.returners = salt.loader.returners(self.opts, self.functions)
+        # The jids whose events are subscribed to
+        self._subscribed_jids = set()
+        # The streams of cmd_stream by jid, and the reader of their events
+        self._streams = {}
+        self._stream_reader = None
 
     def __read_master_key(self):
         '''
@@ -287,12 +297,41 @@ class LocalClient(object):
         if not listen:
             return pub_data
 
+        self._subscribe_job(pub_data['jid'])
+
+        return pub_data
+
+    def _subscribe_job(self, jid):
+        '''
+        Subscribe to the events of a job, unless they already are
+        '''
+        if jid in self._subscribed_jids:
+            return
+        self._subscribed_jids.add(jid)
         if self.opts.get('order_masters'):
-            self.event.subscribe('syndic/.*/{0}'.format(pub_data['jid']), 'regex')
+            self.event.subscribe('syndic/.*/{0}'.format(jid), 'regex')
+        self.event.subscribe('salt/job/{0}'.format(jid))
 
-        self.event.subscribe('salt/job/{0}'.format(pub_data['jid']))
+    def _subscribe_job_before_pub(self, jid, listen):
+        '''
+        When the publisher only sends the events of the subscribed jobs,
+        subscribe to the events of the job before publishing it, so that the
+        returns of the fastest minions are not dropped. Return the jid of the
+        job, generated if none was passed.
+        '''
+        if not listen or getattr(self.event, 'tag_prefixes', None) is None:
+            return jid
+        if not jid:
+            jid = salt.utils.jid.gen_jid(self.opts)
+        self._subscribe_job(jid)
+        return jid
 
-        return pub_data
+    def _unsubscribe_failed_pub(self, jid):
+        '''
+        Drop the subscription made before publishing a job which failed
+        '''
+        if jid in self._subscribed_jids:
+            self._clean_up_subscriptions(jid)
 
     def run_job(
             self,
@@ -321,6 +360,7 @@ class LocalClient(object):
             {'jid': '20131219215650131543', 'minions': ['jerry']}
         '''
         arg = salt.utils.args.condition_input(arg, kwarg)
+        jid = self._subscribe_job_before_pub(jid, listen)
 
         try:
             pub_data = self.pub(
@@ -334,15 +374,20 @@ class LocalClient(object):
                 listen=listen,
                 **kwargs)
         except SaltClientError:
+            self._unsubscribe_failed_pub(jid)
             # Re-raise error with specific message
             raise SaltClientError(
                 'The salt master could not be contacted. Is master running?'
             )
         except Exception as general_exception:
+            self._unsubscribe_failed_pub(jid)
             # Convert to generic client error and pass along message
             raise SaltClientError(general_exception)
 
-        return self._check_pub_data(pub_data, listen=listen)
+        pub_data = self._check_pub_data(pub_data, listen=listen)
+        if not pub_data:
+            self._unsubscribe_failed_pub(jid)
+        return pub_data
 
     def gather_minions(self, tgt, expr_form):
         _res = salt.utils.minions.CkMinions(self.opts).check_minions(tgt, tgt_type=expr_form)
@@ -377,6 +422,7 @@ class LocalClient(object):
             {'jid': '20131219215650131543', 'minions': ['jerry']}
         '''
         arg = salt.utils.args.condition_input(arg, kwarg)
+        jid = self._subscribe_job_before_pub(jid, listen)
 
         try:
             pub_data = yield self.pub_async(
@@ -391,15 +437,20 @@ class LocalClient(object):
                   listen=listen,
                   **kwargs)
         except SaltClientError:
+            self._unsubscribe_failed_pub(jid)
             # Re-raise error with specific message
             raise SaltClientError(
                 'The salt master could not be contacted. Is master running?'
             )
         except Exception as general_exception:
+            self._unsubscribe_failed_pub(jid)
             # Convert to generic client error and pass along message
             raise SaltClientError(general_exception)
 
-        raise tornado.gen.Return(self._check_pub_data(pub_data, listen=listen))
+        pub_data = self._check_pub_data(pub_data, listen=listen)
+        if not pub_data:
+            self._unsubscribe_failed_pub(jid)
+        raise tornado.gen.Return(pub_data)
 
     def cmd_async(
             self,
@@ -909,6 +960,167 @@ class LocalClient(object):
             if not was_listening:
                 self.event.close_pub()
 
+    @tornado.gen.coroutine
+    def cmd_stream(
+            self,
+            tgt,
+            fun,
+            arg=(),
+            tgt_type='glob',
+            ret='',
+            timeout=None,
+            jid='',
+            kwarg=None,
+            reducer=None,
+            initial=None,
+            max_pending=1000,
+            expect_minions=False,
+            raw=False,
+            **kwargs):
+        '''
+        Asynchronously publish a command and stream the returns of the
+        minions as their events arrive on the io_loop passed to the
+        LocalClient, without polling for them.
+
+        The function signature is the same as :py:meth:`cmd` with the
+        following exceptions.
+
+        :param reducer: A function called as ``reducer(value, ret)`` with
+            each return, returning the new value. The returns are then folded
+            as they arrive instead of being queued, see
+            :py:func:`salt.client.stream.count` and
+            :py:func:`salt.client.stream.aggregate`.
+        :param initial: The initial value passed to the reducer.
+        :param max_pending: The maximum number of returns queued until they
+            are consumed. The events are not read while the queue is full.
+        :param expect_minions: Report the minions which did not return.
+        :param raw: Stream the full return events.
+
+        :return: A :py:class:`salt.client.stream.ReturnStream`, or None on
+            failure.
+
+        .. code-block:: python
+
+            >>> stream = yield local.cmd_stream('*', 'test.ping')
+            >>> ret = yield stream.get()
+            {'jerry': {'ret': True}}
+        '''
+        if self.event._run_io_loop_sync:
+            raise SaltClientError(
+                'An io_loop must be passed to the LocalClient to stream the '
+                'returns of a job'
+            )
+        timeout = self._get_timeout(timeout)
+        gather_job_timeout = int(kwargs.get('gather_job_timeout',
+                                            self.opts['gather_job_timeout']))
+        if not jid:
+            jid = salt.utils.jid.gen_jid(self.opts)
+
+        # Listen before publishing, so that the returns of the fastest
+        # minions are not lost
+        yield self.event.connect_pub_async(timeout=timeout)
+        self._subscribe_job(jid)
+        # Hold the events of the job read for the other streams until its
+        # stream is created
+        yield self._add_stream(jid)
+        try:
+            pub_data = yield self.run_job_async(tgt,
+                                                fun,
+                                                arg,
+                                                tgt_type,
+                                                ret,
+                                                timeout,
+                                                jid=jid,
+                                                kwarg=kwarg,
+                                                listen=False,
+                                                io_loop=self.event.io_loop,
+                                                **kwargs)
+        except Exception:
+            self._remove_stream_jid(jid)
+            raise
+        if not pub_data:
+            self._remove_stream_jid(jid)
+            raise tornado.gen.Return(None)
+
+        stream = salt.client.stream.ReturnStream(
+            self,
+            pub_data['jid'],
+            pub_data['minions'],
+            timeout,
+            gather_job_timeout,
+            reducer=reducer,
+            initial=initial,
+            max_pending=max_pending,
+            expect_minions=expect_minions,
+            raw=raw,
+            **kwargs)
+        yield self._add_stream(pub_data['jid'], stream)
+        stream.start()
+        raise tornado.gen.Return(stream)
+
+    @tornado.gen.coroutine
+    def _add_stream(self, jid, stream=None):
+        '''
+        Dispatch the events of the jid to the stream, starting the reader of
+        the events if needed. Without a stream, the events of the jid are held
+        until its stream is added, which is done before publishing the job so
+        that its fastest returns are not dropped.
+        '''
+        held = self._streams.get(jid)
+        if stream is None or not isinstance(held, list):
+            self._streams[jid] = [] if stream is None else stream
+        if self._stream_reader is None or self._stream_reader.done():
+            self._stream_reader = self._read_stream_events()
+        if stream is not None and isinstance(held, list):
+            # More events can be held while the stream handles the first ones
+            index = 0
+            while index < len(held):
+                yield stream.handle_event(held[index])
+                index += 1
+            if jid in self._streams:
+                self._streams[jid] = stream
+
+    def _remove_stream(self, stream):
+        '''
+        Stop dispatching the events of the jids of the stream
+        '''
+        for jid in [stream.jid] + list(stream.jinfo_jids):
+            self._remove_stream_jid(jid)
+
+    def _remove_stream_jid(self, jid):
+        '''
+        Stop dispatching the events of the jid, or holding them
+        '''
+        if self._streams.pop(jid, None) is not None \
+                and jid in self._subscribed_jids:
+            self._clean_up_subscriptions(jid)
+
+    @tornado.gen.coroutine
+    def _read_stream_events(self):
+        '''
+        Dispatch the events of the jobs to their streams, until no stream is
+        left. The next event is not read until the stream handled the last one.
+        '''
+        try:
+            while self._streams:
+                raw = yield self.event.get_event_async()
+                if raw is None:
+                    continue
+                stream = self._streams.get(
+                    salt.client.stream.tag_jid(raw['tag']))
+                if isinstance(stream, list):
+                    # The stream of the job is not added yet
+                    stream.append(raw)
+                elif stream is not None:
+                    yield stream.handle_event(raw)
+        except Exception as exc:
+            log.error('Unable to read the events of the streamed jobs: %s',
+                      exc)
+            streams = set(stream for stream in six.itervalues(self._streams)
+                          if not isinstance(stream, list))
+            for stream in streams:
+                yield stream.finish(error=exc)
+
     def cmd_full_return(
             self,
             tgt,
@@ -1856,6 +2068,7 @@ class LocalClient(object):
             del self.event
 
     def _clean_up_subscriptions(self, job_id):
+        self._subscribed_jids.discard(job_id)
         if self.opts.get('order_masters'):
             self.event.unsubscribe('syndic/.*/{0}'.format(job_id), 'regex')
         self.event.unsubscribe('salt/job/{0}'.format(job_id))
@@ -8,7 +8,6 @@ import base64
 import copy
 import getpass
 import logging
-import multiprocessing
 import subprocess
 import hashlib
 import tarfile
@@ -32,6 +31,7 @@ import salt.defaults.exitcodes
 import salt.log
 import salt.loader
 import salt.minion
+import salt.payload
 import salt.roster
 import salt.serializers.yaml
 import salt.state
@@ -55,6 +55,11 @@ from salt.template import compile_template
 # Import 3rd-party libs
 from salt.ext import six
 from salt.ext.six.moves import input  # pylint: disable=import-error,redefined-builtin
+import tornado.gen
+import tornado.ioloop
+import tornado.iostream
+import tornado.locks
+import tornado.queues
 try:
     import saltwinshell
     HAS_WINSHELL = True
@@ -315,12 +320,22 @@ class SSH(object):
         self.serial = salt.payload.Serial(opts)
         self.returners = salt.loader.returners(self.opts, {})
         self.fsclient = salt.fileclient.FSClient(self.opts)
-        self.thin = salt.utils.thin.gen_thin(self.opts['cachedir'],
-                                             extra_mods=self.opts.get('thin_extra_mods'),
-                                             overwrite=self.opts['regen_thin'],
-                                             python2_bin=self.opts['python2_bin'],
-                                             python3_bin=self.opts['python3_bin'],
-                                             extended_cfg=self.opts.get('ssh_ext_alternatives'))
+        if self.opts.get('ssh_thin_parts'):
+            # The parts of the thin are deployed instead of the tarball
+            salt.utils.thin.gen_thin_parts(self.opts['cachedir'],
+                                           extra_mods=self.opts.get('thin_extra_mods'),
+                                           overwrite=self.opts['regen_thin'],
+                                           python2_bin=self.opts['python2_bin'],
+                                           python3_bin=self.opts['python3_bin'],
+                                           extended_cfg=self.opts.get('ssh_ext_alternatives'))
+            self.thin = salt.utils.thin.thin_path(self.opts['cachedir'])
+        else:
+            self.thin = salt.utils.thin.gen_thin(self.opts['cachedir'],
+                                                 extra_mods=self.opts.get('thin_extra_mods'),
+                                                 overwrite=self.opts['regen_thin'],
+                                                 python2_bin=self.opts['python2_bin'],
+                                                 python3_bin=self.opts['python3_bin'],
+                                                 extended_cfg=self.opts.get('ssh_ext_alternatives'))
         self.mods = mod_data(self.fsclient)
 
     def _get_roster(self):
@@ -499,12 +514,12 @@ class SSH(object):
             return {host: stderr}
         return {host: stdout}
 
-    def handle_routine(self, que, opts, host, target, mine=False):
+    def _single(self, opts, host, target, mine=False):
         '''
-        Run the routine in a "Thread", put a dict on the queue
+        Return the Single running the routine of a target
         '''
         opts = copy.deepcopy(opts)
-        single = Single(
+        return Single(
                 opts,
                 opts['argv'],
                 host,
@@ -513,9 +528,12 @@ class SSH(object):
                 thin=self.thin,
                 mine=mine,
                 **target)
-        ret = {'id': single.id}
-        stdout, stderr, retcode = single.run()
-        # This job is done, yield
+
+    def _routine_ret(self, id_, stdout, stderr, retcode):
+        '''
+        Return the dict holding the return of a routine
+        '''
+        ret = {'id': id_}
         try:
             data = salt.utils.json.find_json(stdout)
             if len(data) < 2 and 'local' in data:
@@ -532,37 +550,132 @@ class SSH(object):
                 'stderr': stderr,
                 'retcode': retcode,
             }
-        que.put(ret)
+        return ret
 
-    def handle_ssh(self, mine=False):
+    def handle_routine(self, que, opts, host, target, mine=False):
         '''
-        Spin up the needed threads or processes and execute the subsequent
-        routines
-        '''
-        que = multiprocessing.Queue()
-        running = {}
-        target_iter = self.targets.__iter__()
-        returned = set()
-        rets = set()
-        init = False
-        while True:
-            if not self.targets:
-                log.error('No matching targets found in roster.')
-                break
-            if len(running) < self.opts.get('ssh_max_procs', 25) and not init:
-                try:
-                    host = next(target_iter)
-                except StopIteration:
-                    init = True
-                    continue
+        Run the routine in a "Thread", put a dict on the queue
+        '''
+        single = self._single(opts, host, target, mine)
+        stdout, stderr, retcode = single.run()
+        # This job is done, yield
+        que.put(self._routine_ret(single.id, stdout, stderr, retcode))
+
+    def _pipe_routine(self, wfd, opts, host, target, mine=False):
+        '''
+        Run the routine in a process, write the serialized dict to the pipe
+        '''
+        single = self._single(opts, host, target, mine)
+        stdout, stderr, retcode = single.run()
+        ret = self._routine_ret(single.id, stdout, stderr, retcode)
+        with os.fdopen(wfd, 'wb') as fp_:
+            fp_.write(self.serial.dumps(ret))
+
+    @tornado.gen.coroutine
+    def _handle_routine_proc(self, opts, host, target, mine=False):
+        '''
+        Run the routine in a process, and return the dict it writes to the
+        pipe watched by the io_loop
+        '''
+        rfd, wfd = os.pipe()
+        routine = MultiprocessingProcess(
+                        target=self._pipe_routine,
+                        args=(wfd, opts, host, target, mine))
+        routine.start()
+        # Only the process may hold the write end, else the pipe never closes
+        os.close(wfd)
+        stream = tornado.iostream.PipeIOStream(rfd)
+        try:
+            data = yield stream.read_until_close()
+        finally:
+            stream.close()
+        # The process exits right after closing the pipe
+        while routine.is_alive():
+            yield tornado.gen.sleep(0.01)
+        routine.join()
+        if not data:
+            raise tornado.gen.Return(None)
+        raise tornado.gen.Return(self.serial.loads(data))
+
+    @tornado.gen.coroutine
+    def _handle_routine_async(self, opts, host, target, mine=False):
+        '''
+        Run the routine through non-blocking pipes, and return its dict, or
+        None if it has to be run in a process instead
+        '''
+        single = self._single(opts, host, target, mine)
+        ret = yield single.run_async()
+        if ret is None:
+            raise tornado.gen.Return(None)
+        raise tornado.gen.Return(self._routine_ret(single.id, *ret))
+
+    def _pipeable(self, target, wfuncs, mine=False):
+        '''
+        Return whether the routine of a target can run through non-blocking
+        pipes: ssh must not be answered a password, no tty is allocated and no
+        wrapper function is called
+        '''
+        if mine or target.get('passwd') or target.get('tty') or target.get('winrm'):
+            return False
+        if self.opts.get('raw_shell', False):
+            return True
+        argv = self.opts['argv']
+        if isinstance(argv, six.string_types):
+            fun = argv
+        else:
+            fun = argv[0] if argv else ''
+        return fun not in wfuncs
+
+    @tornado.gen.coroutine
+    def _handle_target(self, rets, host, sessions, procs, piped, mine=False):
+        '''
+        Run the routine of a target once a session, or a process, is free and
+        put its return on the queue
+        '''
+        ret = None
+        try:
+            if piped:
+                with (yield sessions.acquire()):
+                    ret = yield self._handle_routine_async(
+                        self.opts, host, self.targets[host], mine)
+            if ret is None:
+                with (yield procs.acquire()):
+                    ret = yield self._handle_routine_proc(
+                        self.opts, host, self.targets[host], mine)
+        except Exception:
+            log.error('Failed to run the routine of target \'%s\'', host,
+                      exc_info=True)
+            ret = None
+        if not ret or 'id' not in ret:
+            error = ('Target \'{0}\' did not return any data, '
+                     'probably due to an error.').format(host)
+            log.error(error)
+            ret = {'id': host,
+                   'ret': error}
+        rets.put_nowait({ret['id']: ret['ret']})
+
+    @tornado.gen.coroutine
+    def _dispatch_routines(self, rets, mine=False):
+        '''
+        Run the routines of all of the targets, put their returns on the queue
+        as they complete, and then None
+        '''
+        try:
+            sessions = tornado.locks.Semaphore(
+                self.opts.get('ssh_max_sessions', 256))
+            procs = tornado.locks.Semaphore(self.opts.get('ssh_max_procs', 25))
+            wfuncs = salt.loader.ssh_wrapper(
+                self.opts,
+                None,
+                {'master_opts': self.opts, 'fileclient': self.fsclient})
+            routines = []
+            for host in self.targets:
                 for default in self.defaults:
                     if default not in self.targets[host]:
                         self.targets[host][default] = self.defaults[default]
                 if 'host' not in self.targets[host]:
                     self.targets[host]['host'] = host
                 if self.targets[host].get('winrm') and not HAS_WINSHELL:
-                    returned.add(host)
-                    rets.add(host)
                     log_msg = 'Please contact sales@saltstack.com for access to the enterprise saltwinshell module.'
                     log.debug(log_msg)
                     no_ret = {'fun_args': [],
@@ -571,64 +684,40 @@ class SSH(object):
                               'retcode': 1,
                               'fun': '',
                               'id': host}
-                    yield {host: no_ret}
+                    rets.put_nowait({host: no_ret})
                     continue
-                args = (
-                        que,
-                        self.opts,
-                        host,
-                        self.targets[host],
-                        mine,
-                        )
-                routine = MultiprocessingProcess(
-                                target=self.handle_routine,
-                                args=args)
-                routine.start()
-                running[host] = {'thread': routine}
-                continue
-            ret = {}
-            try:
-                ret = que.get(False)
-                if 'id' in ret:
-                    returned.add(ret['id'])
-                    yield {ret['id']: ret['ret']}
-            except Exception:
-                # This bare exception is here to catch spurious exceptions
-                # thrown by que.get during healthy operation. Please do not
-                # worry about this bare exception, it is entirely here to
-                # control program flow.
-                pass
-            for host in running:
-                if not running[host]['thread'].is_alive():
-                    if host not in returned:
-                        # Try to get any returns that came through since we
-                        # last checked
-                        try:
-                            while True:
-                                ret = que.get(False)
-                                if 'id' in ret:
-                                    returned.add(ret['id'])
-                                    yield {ret['id']: ret['ret']}
-                        except Exception:
-                            pass
-
-                        if host not in returned:
-                            error = ('Target \'{0}\' did not return any data, '
-                                     'probably due to an error.').format(host)
-                            ret = {'id': host,
-                                   'ret': error}
-                            log.error(error)
-                            yield {ret['id']: ret['ret']}
-                    running[host]['thread'].join()
-                    rets.add(host)
-            for host in rets:
-                if host in running:
-                    running.pop(host)
-            if len(rets) >= len(self.targets):
-                break
-            # Sleep when limit or all threads started
-            if len(running) >= self.opts.get('ssh_max_procs', 25) or len(self.targets) >= len(running):
-                time.sleep(0.1)
+                piped = self._pipeable(self.targets[host], wfuncs, mine)
+                routines.append(
+                    self._handle_target(rets, host, sessions, procs, piped, mine))
+            yield routines
+        finally:
+            rets.put_nowait(None)
+
+    def handle_ssh(self, mine=False):
+        '''
+        Execute the routines of the targets, and yield their returns as they
+        complete.
+
+        An io_loop private to this generator drives the routines: up to
+        ``ssh_max_sessions`` of them run through non-blocking pipes, and the
+        ones which need to answer ssh, to allocate a tty or to call a wrapper
+        function run in up to ``ssh_max_procs`` processes, which write their
+        return to a pipe watched by the io_loop.
+        '''
+        if not self.targets:
+            log.error('No matching targets found in roster.')
+            return
+        io_loop = tornado.ioloop.IOLoop(make_current=False)
+        rets = tornado.queues.Queue()
+        io_loop.add_callback(self._dispatch_routines, rets, mine)
+        try:
+            while True:
+                ret = io_loop.run_sync(rets.get)
+                if ret is None:
+                    break
+                yield ret
+        finally:
+            io_loop.close(all_fds=True)
 
     def run_iter(self, mine=False, jid=None):
         '''
@@ -920,6 +1009,14 @@ class Single(object):
             arch, _, _ = self.shell.exec_cmd('powershell $ENV:PROCESSOR_ARCHITECTURE')
             self.arch = arch.strip()
         self.thin = thin if thin else salt.utils.thin.thin_path(opts['cachedir'])
+        self.thin_parts = None
+        if self.opts.get('ssh_thin_parts') and not self.winrm:
+            if '_caller_cachedir' in self.opts:
+                cachedir = self.opts['_caller_cachedir']
+            else:
+                cachedir = self.opts['cachedir']
+            self.thin_parts = salt.utils.thin.thin_parts(cachedir)
+            self.thin_parts_dir = os.path.join(cachedir, 'thin', 'parts')
 
     def __arg_comps(self):
         '''
@@ -946,15 +1043,35 @@ class Single(object):
             return arg
         return ''.join(['\\' + char if re.match(r'\W', char) else char for char in arg])
 
-    def deploy(self):
+    def deploy(self, parts=None):
+        '''
+        Deploy salt-thin, or only the listed parts of it when deploying it by
+        parts
+        '''
+        if self.thin_parts is not None:
+            self.deploy_parts(parts)
+        else:
+            self.shell.send(
+                self.thin,
+                os.path.join(self.thin_dir, 'salt-thin.tgz'),
+            )
+        self.deploy_ext()
+        return True
+
+    def deploy_parts(self, parts=None):
         '''
-        Deploy salt-thin
+        Deploy the listed parts of salt-thin, all of them by default
         '''
+        if parts is None:
+            parts = list(self.thin_parts['parts'])
+        parts = [part for part in parts if part in self.thin_parts['parts']]
+        if not parts:
+            return True
         self.shell.send(
-            self.thin,
-            os.path.join(self.thin_dir, 'salt-thin.tgz'),
+            ' '.join([os.path.join(self.thin_parts_dir, '{0}.tgz'.format(part))
+                      for part in parts]),
+            os.path.join(self.thin_dir, 'parts', ''),
         )
-        self.deploy_ext()
         return True
 
     def deploy_ext(self):
@@ -994,6 +1111,23 @@ class Single(object):
 
         return stdout, stderr, retcode
 
+    @tornado.gen.coroutine
+    def run_async(self):
+        '''
+        Execute the routine like ``run``, through non-blocking pipes on the
+        current io_loop. Only a raw shell command or a remote Salt command can
+        be executed this way.
+
+        Returns tuple of (stdout, stderr, retcode), or None if the routine has
+        to be executed by ``run`` instead
+        '''
+        if self.opts.get('raw_shell', False):
+            cmd_str = ' '.join([self._escape_arg(arg) for arg in self.argv])
+            ret = yield self.shell.exec_cmd_async(cmd_str)
+        else:
+            ret = yield self.cmd_block_async()
+        raise tornado.gen.Return(ret)
+
     def run_wfunc(self):
         '''
         Execute a wrapper function
@@ -1175,7 +1309,14 @@ class Single(object):
             cachedir = self.opts['_caller_cachedir']
         else:
             cachedir = self.opts['cachedir']
-        thin_code_digest, thin_sum = salt.utils.thin.thin_sum(cachedir, 'sha1')
+        if self.thin_parts is not None:
+            # The thin tarball is not deployed, the parts are checked instead
+            thin_code_digest, thin_sum = "''", ''
+            parts = dict([(digest, [part['root'], part['sum']])
+                          for digest, part in six.iteritems(self.thin_parts['parts'])])
+        else:
+            thin_code_digest, thin_sum = salt.utils.thin.thin_sum(cachedir, 'sha1')
+            parts = None
         debug = ''
         if not self.opts.get('log_level'):
             self.opts['log_level'] = 'info'
@@ -1196,6 +1337,7 @@ OPTIONS.wipe = {wipe}
 OPTIONS.tty = {tty}
 OPTIONS.cmd_umask = {cmd_umask}
 OPTIONS.code_checksum = {code_checksum}
+OPTIONS.parts = {parts}
 ARGS = {arguments}\n'''.format(config=self.minion_config,
                                delimeter=RSTR,
                                saltdir=self.thin_dir,
@@ -1207,6 +1349,7 @@ ARGS = {arguments}\n'''.format(config=self.minion_config,
                                tty=self.tty,
                                cmd_umask=self.cmd_umask,
                                code_checksum=thin_code_digest,
+                               parts=parts,
                                arguments=self.argv)
         py_code = SSH_PY_SHIM.replace('#%%OPTS', arg_str)
         if six.PY2:
@@ -1353,6 +1496,17 @@ ARGS = {arguments}\n'''.format(config=self.minion_config,
                 else:
                     while re.search(RSTR_RE, stderr):
                         stderr = re.split(RSTR_RE, stderr, 1)[1].strip()
+            elif 'deploy_parts' == shim_command and retcode == salt.defaults.exitcodes.EX_THIN_DEPLOY:
+                self.deploy_parts(re.split(r'\r?\n', stdout)[1].split())
+                stdout, stderr, retcode = self.shim_cmd(cmd_str)
+                if not re.search(RSTR_RE, stdout) or not re.search(RSTR_RE, stderr):
+                    # If RSTR is not seen in both stdout and stderr then there
+                    # was a thin deployment problem.
+                    return 'ERROR: Failure deploying thin parts: {0}'.format(stdout), stderr, retcode
+                while re.search(RSTR_RE, stdout):
+                    stdout = re.split(RSTR_RE, stdout, 1)[1].strip()
+                while re.search(RSTR_RE, stderr):
+                    stderr = re.split(RSTR_RE, stderr, 1)[1].strip()
             elif 'ext_mods' == shim_command:
                 self.deploy_ext()
                 stdout, stderr, retcode = self.shim_cmd(cmd_str)
@@ -1367,6 +1521,51 @@ ARGS = {arguments}\n'''.format(config=self.minion_config,
 
         return stdout, stderr, retcode
 
+    @tornado.gen.coroutine
+    def cmd_block_async(self):
+        '''
+        Execute the SHIM + command like ``cmd_block``, through non-blocking
+        pipes on the current io_loop.
+
+        Returns None when the SHIM returns a master request or when ssh could
+        not verify the host key: deploying salt-thin or the ext_mods and
+        accepting the key are left to ``cmd_block``, which re-executes the
+        command afterwards
+        '''
+        self.argv = _convert_args(self.argv)
+        log.debug(
+            'Performing shimmed, non-blocking command as follows:\n%s',
+            ' '.join([six.text_type(arg) for arg in self.argv])
+        )
+        cmd_str = self._cmd_str()
+        stdout, stderr, retcode = yield self.shell.exec_cmd_async(cmd_str)
+
+        log.trace('STDOUT %s\n%s', self.target['host'], stdout)
+        log.trace('STDERR %s\n%s', self.target['host'], stderr)
+        log.debug('RETCODE %s: %s', self.target['host'], retcode)
+
+        if 'Host key verification failed' in stderr:
+            raise tornado.gen.Return(None)
+        error = self.categorize_shim_errors(stdout, stderr, retcode)
+        if error == 'Undefined SHIM state':
+            raise tornado.gen.Return(None)
+        elif error:
+            raise tornado.gen.Return(('ERROR: {0}'.format(error), stderr, retcode))
+
+        while re.search(RSTR_RE, stdout):
+            stdout = re.split(RSTR_RE, stdout, 1)[1].strip()
+
+        if re.search(RSTR_RE, stderr):
+            # SHIM completed, the remaining output is only from salt
+            while re.search(RSTR_RE, stderr):
+                stderr = re.split(RSTR_RE, stderr, 1)[1].strip()
+        else:
+            shim_command = re.split(r'\r?\n', stdout, 1)[0].strip()
+            if shim_command in ('deploy', 'deploy_parts', 'ext_mods'):
+                raise tornado.gen.Return(None)
+
+        raise tornado.gen.Return((stdout, stderr, retcode))
+
     def categorize_shim_errors(self, stdout, stderr, retcode):
         if re.search(RSTR_RE, stdout) and stdout != RSTR+'\n':
             # RSTR was found in stdout which means that the shim
@@ -7,6 +7,7 @@ from __future__ import absolute_import, print_function
 # Import python libs
 import re
 import os
+import datetime
 import sys
 import time
 import logging
@@ -16,10 +17,16 @@ import subprocess
 import salt.defaults.exitcodes
 import salt.utils.json
 import salt.utils.nb_popen
+import salt.utils.stringutils
 import salt.utils.vt
 
 from salt.ext import six
 
+# Import tornado
+import tornado.gen
+import tornado.iostream
+import tornado.process
+
 log = logging.getLogger(__name__)
 
 SSH_PASSWORD_PROMPT_RE = re.compile(r'(?:.*)[Pp]assword(?: for .*)?:', re.M)
@@ -144,6 +151,7 @@ class Shell(object):
             options.append('User={0}'.format(self.user))
         if self.identities_only:
             options.append('IdentitiesOnly=yes')
+        options.extend(self._control_opts())
 
         ret = []
         for option in options:
@@ -154,12 +162,7 @@ class Shell(object):
         '''
         Return options to pass to ssh
         '''
-        # TODO ControlMaster does not work without ControlPath
-        # user could take advantage of it if they set ControlPath in their
-        # ssh config.  Also, ControlPersist not widely available.
-        options = ['ControlMaster=auto',
-                   'StrictHostKeyChecking=no',
-                   ]
+        options = ['StrictHostKeyChecking=no']
         if self.opts['_ssh_version'] > (4, 9):
             options.append('GSSAPIAuthentication=no')
         options.append('ConnectTimeout={0}'.format(self.timeout))
@@ -184,12 +187,40 @@ class Shell(object):
             options.append('User={0}'.format(self.user))
         if self.identities_only:
             options.append('IdentitiesOnly=yes')
+        options.extend(self._control_opts())
 
         ret = []
         for option in options:
             ret.append('-o {0} '.format(option))
         return ''.join(ret)
 
+    def _control_opts(self):
+        '''
+        Return the options multiplexing the sessions to the host over a master
+        connection, which is kept open ``ssh_control_persist`` seconds after
+        the last session, across the runs of salt-ssh
+        '''
+        persist = self.opts.get('ssh_control_persist', 0)
+        # ControlPersist is available since OpenSSH 5.6
+        if not persist or self.opts.get('_ssh_version', (0,)) < (5, 6):
+            return []
+        control_dir = os.path.join(self.opts['cachedir'], 'ssh_control')
+        if not os.path.isdir(control_dir):
+            try:
+                os.makedirs(control_dir, 0o700)
+            except OSError:
+                # Created by a concurrent routine, or ssh warns that it can
+                # not multiplex the sessions and goes on without it
+                pass
+        if self.opts.get('_ssh_version', (0,)) >= (6, 7):
+            # A hash of the connection keeps the path of the socket short
+            control_path = os.path.join(control_dir, '%C')
+        else:
+            control_path = os.path.join(control_dir, '%r@%h:%p')
+        return ['ControlMaster=auto',
+                'ControlPath={0}'.format(control_path),
+                'ControlPersist={0}'.format(int(persist))]
+
     def _ssh_opts(self):
         return ' '.join(['-o {0}'.format(opt)
                           for opt in self.ssh_options])
@@ -326,12 +357,10 @@ class Shell(object):
             yield None, None, None
         yield ''.join(r_out), ''.join(r_err), rcode
 
-    def exec_cmd(self, cmd):
+    def _log_cmd(self, cmd):
         '''
-        Execute a remote command
+        Log the command to execute, hiding the password and the SHIM
         '''
-        cmd = self._cmd_str(cmd)
-
         logmsg = 'Executing command: {0}'.format(cmd)
         if self.passwd:
             logmsg = logmsg.replace(self.passwd, ('*' * 6))
@@ -341,9 +370,29 @@ class Shell(object):
         else:
             log.debug(logmsg)
 
+    def exec_cmd(self, cmd):
+        '''
+        Execute a remote command
+        '''
+        cmd = self._cmd_str(cmd)
+        self._log_cmd(cmd)
+
         ret = self._run_cmd(cmd)
         return ret
 
+    @tornado.gen.coroutine
+    def exec_cmd_async(self, cmd):
+        '''
+        Execute a remote command through non-blocking pipes on the current
+        io_loop. ssh runs in batch mode, it is never asked for a password nor
+        whether to accept the host key.
+        '''
+        cmd = self._cmd_str('-o BatchMode=yes {0}'.format(cmd))
+        self._log_cmd(cmd)
+
+        ret = yield self._run_cmd_async(cmd)
+        raise tornado.gen.Return(ret)
+
     def send(self, local, remote, makedirs=False):
         '''
         scp a file or files to a remote system
@@ -428,3 +477,52 @@ class Shell(object):
             return ret_stdout, ret_stderr, term.exitstatus
         finally:
             term.close(terminate=True, kill=True)
+
+    @tornado.gen.coroutine
+    def _run_cmd_async(self, cmd):
+        '''
+        Execute a shell command through non-blocking pipes on the current
+        io_loop, and answer the ext_mods request of the SHIM
+        '''
+        proc = tornado.process.Subprocess(
+                cmd,
+                shell=True,
+                stdin=tornado.process.Subprocess.STREAM,
+                stdout=tornado.process.Subprocess.STREAM,
+                stderr=tornado.process.Subprocess.STREAM)
+        ret_stderr = []
+        stderr = proc.stderr.read_until_close(streaming_callback=ret_stderr.append)
+        ret_stdout = []
+        old_stdout = b''
+        try:
+            while True:
+                try:
+                    stdout = yield proc.stdout.read_bytes(65536, partial=True)
+                except tornado.iostream.StreamClosedError:
+                    break
+                ret_stdout.append(stdout)
+                buff = old_stdout + stdout
+                if buff.endswith(b'_||ext_mods||_'):
+                    mods_raw = salt.utils.json.dumps(self.mods, separators=(',', ':')) + '|_E|0|'
+                    yield proc.stdin.write(
+                        salt.utils.stringutils.to_bytes(mods_raw + '\n'))
+                old_stdout = stdout
+            # ssh closes its pipes right before exiting, wait for it without
+            # relying on SIGCHLD which can only be handled by the main thread
+            while proc.proc.poll() is None:
+                yield tornado.gen.sleep(0.01)
+            try:
+                # The master connection forked by ControlPersist can hold on
+                # to stderr, do not wait for it once ssh exited
+                yield tornado.gen.with_timeout(datetime.timedelta(seconds=1), stderr)
+            except tornado.gen.TimeoutError:
+                pass
+        finally:
+            proc.stdin.close()
+            proc.stderr.close()
+            if proc.proc.poll() is None:
+                proc.proc.kill()
+        ret_stdout = salt.utils.stringutils.to_str(b''.join(ret_stdout), errors='replace')
+        ret_stderr = salt.utils.stringutils.to_str(b''.join(ret_stderr), errors='replace')
+        log.trace('Command output: %s\n%s', ret_stdout, ret_stderr)
+        raise tornado.gen.Return((ret_stdout, ret_stderr, proc.proc.returncode))
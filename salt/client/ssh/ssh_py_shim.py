@@ -19,6 +19,7 @@ import subprocess
 import time
 
 THIN_ARCHIVE = 'salt-thin.tgz'
+THIN_PARTS_DIR = 'parts'
 EXT_ARCHIVE = 'salt-ext_mods.tgz'
 
 # Keep these in sync with salt/defaults/exitcodes.py
@@ -134,11 +135,104 @@ def need_deployment():
                                  'and is not root, be certain the user is in the same group\nas the login user')
                 sys.exit(1)
 
+    if getattr(OPTIONS, 'parts', None):
+        check_scp()
+        # The master copies the parts of the thin in there
+        os.mkdir(os.path.join(OPTIONS.saltdir, THIN_PARTS_DIR), 0o700)
+
     # Delimiter emitted on stdout *only* to indicate shim message to master.
     sys.stdout.write("{0}\ndeploy\n".format(OPTIONS.delimiter))
     sys.exit(EX_THIN_DEPLOY)
 
 
+def check_scp():
+    '''
+    Exit if scp is not available to deploy the thin.
+    '''
+    if not sys.platform.startswith('win'):
+        scpstat = subprocess.Popen(['/bin/sh', '-c', 'command -v scp']).wait()
+        if scpstat != 0:
+            sys.exit(EX_SCP_NOT_FOUND)
+
+
+def need_parts(missing):
+    '''
+    Signal that the listed parts of the thin need to be deployed.
+    '''
+    check_scp()
+    sys.stdout.write("{0}\ndeploy_parts\n{1}\n".format(OPTIONS.delimiter, ' '.join(missing)))
+    sys.exit(EX_THIN_DEPLOY)
+
+
+def remove_part_root(root):
+    '''
+    Remove the files unpacked from a part of the thin.
+    '''
+    if not root:
+        # The version files and salt-call are overwritten by the new part
+        return
+    path = os.path.join(OPTIONS.saltdir, root)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.unlink(path)
+
+
+def unpack_parts():
+    '''
+    Unpack the parts of the thin copied by the master, after removing the
+    parts which are not part of the current thin anymore, and signal the
+    parts which are still missing.
+
+    OPTIONS.parts maps the digest of each part to the path it is unpacked
+    under and to the checksum of its archive. An unpacked part is recorded by
+    a file named after its digest which holds this path.
+    '''
+    parts_dir = os.path.join(OPTIONS.saltdir, THIN_PARTS_DIR)
+    if not os.path.isdir(parts_dir):
+        need_deployment()
+    # Remove the stale parts first, so that they do not remove the files of
+    # the parts replacing them
+    for fname in os.listdir(parts_dir):
+        if fname.endswith('.tgz'):
+            if fname[:-len('.tgz')] not in OPTIONS.parts:
+                # Copied for a thin which was superseded before it was unpacked
+                os.unlink(os.path.join(parts_dir, fname))
+            continue
+        if fname in OPTIONS.parts:
+            continue
+        with open(os.path.join(parts_dir, fname), 'r') as fp_:
+            remove_part_root(fp_.read().strip())
+        os.unlink(os.path.join(parts_dir, fname))
+    missing = []
+    unpacked = False
+    for digest, (root, checksum) in OPTIONS.parts.items():
+        if os.path.isfile(os.path.join(parts_dir, digest)):
+            continue
+        part_path = os.path.join(parts_dir, digest + '.tgz')
+        if not os.path.isfile(part_path):
+            missing.append(digest)
+            continue
+        if checksum != get_hash(part_path, OPTIONS.hashfunc):
+            os.unlink(part_path)
+            missing.append(digest)
+            continue
+        remove_part_root(root)
+        tfile = tarfile.TarFile.gzopen(part_path)
+        old_umask = os.umask(0o077)  # pylint: disable=blacklisted-function
+        tfile.extractall(path=OPTIONS.saltdir)
+        tfile.close()
+        with open(os.path.join(parts_dir, digest), 'w') as fp_:
+            fp_.write(root)
+        os.umask(old_umask)  # pylint: disable=blacklisted-function
+        os.unlink(part_path)
+        unpacked = True
+    if unpacked:
+        reset_time(OPTIONS.saltdir)
+    if missing:
+        need_parts(missing)
+
+
 # Adapted from salt.utils.hashutils.get_hash()
 def get_hash(path, form='sha1', chunk_size=4096):
     '''
@@ -249,16 +343,24 @@ def main(argv):  # pylint: disable=W0613
     Main program body
     '''
     thin_path = os.path.join(OPTIONS.saltdir, THIN_ARCHIVE)
-    if os.path.isfile(thin_path):
+    if getattr(OPTIONS, 'parts', None):
+        if os.path.exists(OPTIONS.saltdir) and not os.path.isdir(OPTIONS.saltdir):
+            sys.stderr.write(
+                'ERROR: salt path "{0}" exists but is'
+                ' not a directory\n'.format(OPTIONS.saltdir)
+            )
+            sys.exit(EX_CANTCREAT)
+        if not os.path.exists(OPTIONS.saltdir):
+            need_deployment()
+        unpack_parts()
+        # Salt thin exists and is up-to-date - fall through and use it
+    elif os.path.isfile(thin_path):
         if OPTIONS.checksum != get_hash(thin_path, OPTIONS.hashfunc):
             need_deployment()
         unpack_thin(thin_path)
         # Salt thin now is available to use
     else:
-        if not sys.platform.startswith('win'):
-            scpstat = subprocess.Popen(['/bin/sh', '-c', 'command -v scp']).wait()
-            if scpstat != 0:
-                sys.exit(EX_SCP_NOT_FOUND)
+        check_scp()
 
         if os.path.exists(OPTIONS.saltdir) and not os.path.isdir(OPTIONS.saltdir):
             sys.stderr.write(
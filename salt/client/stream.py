@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+'''
+Stream the returns of a job published by the LocalClient as their events
+arrive, see :py:meth:`salt.client.LocalClient.cmd_stream`.
+
+.. code-block:: python
+
+    import tornado.gen
+    import tornado.ioloop
+    import salt.client
+
+    io_loop = tornado.ioloop.IOLoop.current()
+    local = salt.client.LocalClient(io_loop=io_loop)
+
+    @tornado.gen.coroutine
+    def ping():
+        stream = yield local.cmd_stream('*', 'test.ping')
+        while True:
+            ret = yield stream.get()
+            if ret is None:
+                break
+            print(ret)
+
+    io_loop.run_sync(ping)
+
+A reducer folds the returns as they arrive instead, so that they are never
+held in memory:
+
+.. code-block:: python
+
+    @tornado.gen.coroutine
+    def os_counts():
+        stream = yield local.cmd_stream(
+            '*', 'grains.item', ['os'], reducer=salt.client.stream.aggregate)
+        counts = yield stream.wait()
+'''
+
+# Import python libs
+from __future__ import absolute_import, print_function, unicode_literals
+import logging
+import time
+
+# Import salt libs
+import salt.utils.jid
+from salt.exceptions import SaltClientError
+from salt.ext import six
+
+# Import tornado
+import tornado.gen  # pylint: disable=F0401
+import tornado.queues  # pylint: disable=F0401
+
+log = logging.getLogger(__name__)
+
+
+def tag_jid(tag):
+    '''
+    Return the jid of a job event tag, or None if the tag is not the one of a
+    job event
+    '''
+    parts = tag.split('/')
+    for index, part in enumerate(parts[:-1]):
+        if part == 'job':
+            return parts[index + 1]
+    return None
+
+
+def count(total, ret):
+    '''
+    Reducer counting the returns
+    '''
+    return (total or 0) + len(ret)
+
+
+def aggregate(counts, ret):
+    '''
+    Reducer counting the minions which returned each value. The minions which
+    failed to return are counted under None.
+    '''
+    if counts is None:
+        counts = {}
+    for data in six.itervalues(ret):
+        value = data.get('ret')
+        try:
+            hash(value)
+        except TypeError:
+            value = repr(value)
+        counts[value] = counts.get(value, 0) + 1
+    return counts
+
+
+class ReturnStream(object):
+    '''
+    The returns of a job, handed out as their events are dispatched by the
+    LocalClient on its io_loop.
+
+    At most ``max_pending`` returns are queued: when the queue is full the
+    LocalClient stops reading the events until the returns are consumed.
+    With a ``reducer``, the returns are folded into ``value`` with
+    ``reducer(value, ret)`` as they arrive and are never queued.
+
+    The minions which did not return after ``timeout`` are asked whether they
+    are still running the job with a ``saltutil.find_job`` publication, and
+    waited for as long as they are, like in
+    :py:meth:`salt.client.LocalClient.get_iter_returns`. The timers of the
+    io_loop drive this, no event is ever polled.
+    '''
+    def __init__(self,
+                 client,
+                 jid,
+                 minions,
+                 timeout,
+                 gather_job_timeout,
+                 reducer=None,
+                 initial=None,
+                 max_pending=1000,
+                 expect_minions=False,
+                 raw=False,
+                 **kwargs):
+        self.client = client
+        self.opts = client.opts
+        self.io_loop = client.event.io_loop
+        self.jid = jid
+        self.minions = set(minions)
+        self.found = set()
+        self.missing = set()
+        self.timeout = timeout
+        self.gather_job_timeout = gather_job_timeout
+        self.reducer = reducer
+        self.value = initial
+        self.expect_minions = expect_minions
+        self.raw = raw
+        # The publication arguments, e.g. eauth, of the find_job jobs
+        self.kwargs = kwargs
+        self.queue = tornado.queues.Queue(maxsize=max_pending)
+        # The jids of the find_job jobs, and the minions they found running
+        # the job
+        self.jinfo_jids = set()
+        self.running = set()
+        self.finished = False
+        self.exhausted = False
+        self.error = None
+        self._timer = None
+        self._gathered = False
+        self._syndic_wait_at = time.time() + self.opts['syndic_wait']
+
+    def start(self):
+        '''
+        Start the timeout of the job
+        '''
+        log.debug(
+            'Streaming the returns of jid %s sent to %s with a timeout of %s '
+            'seconds', self.jid, self.minions, self.timeout
+        )
+        self._timer = self.io_loop.call_later(self.timeout, self._gather)
+
+    def __aiter__(self):
+        return self
+
+    @tornado.gen.coroutine
+    def __anext__(self):
+        ret = yield self.get()
+        if ret is None:
+            raise StopAsyncIteration  # pylint: disable=undefined-variable
+        raise tornado.gen.Return(ret)
+
+    @tornado.gen.coroutine
+    def get(self):
+        '''
+        Wait for the next return, and return it. Return None once all of the
+        returns were handed out.
+        '''
+        if self.exhausted:
+            ret = None
+        else:
+            ret = yield self.queue.get()
+        if ret is None:
+            self.exhausted = True
+            if self.error is not None:
+                raise self.error  # pylint: disable=E0702
+        raise tornado.gen.Return(ret)
+
+    @tornado.gen.coroutine
+    def wait(self):
+        '''
+        Wait for the job to finish, dropping the returns left in the queue,
+        and return the value folded by the reducer
+        '''
+        while True:
+            ret = yield self.get()
+            if ret is None:
+                break
+        raise tornado.gen.Return(self.value)
+
+    @tornado.gen.coroutine
+    def handle_event(self, raw):
+        '''
+        Handle an event of the job, or of one of its find_job jobs. The
+        returned future is done once the event is queued.
+        '''
+        if self.finished:
+            return
+        try:
+            if tag_jid(raw['tag']) in self.jinfo_jids:
+                self._handle_jinfo(raw['data'])
+            else:
+                yield self._handle_ret(raw)
+        except Exception as exc:
+            log.error('Unable to handle the event %s of jid %s', raw['tag'],
+                      self.jid, exc_info=True)
+            yield self.finish(error=exc)
+            return
+        yield self._check_done()
+
+    @tornado.gen.coroutine
+    def _handle_ret(self, raw):
+        data = raw['data']
+        if 'minions' in data:
+            self.minions.update(data['minions'])
+            if 'missing' in data:
+                self.missing.update(data['missing'])
+            return
+        if 'return' not in data:
+            return
+        self.found.add(data['id'])
+        if self.raw:
+            ret = raw
+        else:
+            ret = {data['id']: {'ret': data['return']}}
+            for key in ('out', 'retcode', 'jid'):
+                if key in data:
+                    ret[data['id']][key] = data[key]
+            log.debug('jid %s return from %s', self.jid, data['id'])
+        yield self._put(ret)
+
+    def _handle_jinfo(self, data):
+        '''
+        Track the minions still running the job from the returns of a
+        find_job job
+        '''
+        if 'minions' in data:
+            self.minions.update(data['minions'])
+            return
+        if 'syndic' in data:
+            self.minions.update(data['syndic'])
+            return
+        if 'return' not in data:
+            return
+        if data.get('retcode', 0) > 0:
+            log.error('saltutil returning errors on minion %s', data['id'])
+            self.minions.discard(data['id'])
+            return
+        # if the job isn't running there anymore... don't count
+        if data['return'] == {}:
+            return
+        if isinstance(data['return'], dict) and \
+                data['return'].get('return', None) == {}:
+            return
+        self.minions.add(data['id'])
+        self.running.add(data['id'])
+
+    @tornado.gen.coroutine
+    def _put(self, ret):
+        if self.reducer is None:
+            yield self.queue.put(ret)
+        else:
+            self.value = self.reducer(self.value, ret)
+
+    @tornado.gen.coroutine
+    def _check_done(self):
+        '''
+        Finish the stream once all of the minions returned
+        '''
+        if self.finished or len(self.found & self.minions) < len(self.minions):
+            return
+        if not self.opts['order_masters']:
+            log.debug('jid %s found all minions %s', self.jid, self.found)
+            yield self.finish()
+        elif self.found and time.time() > self._syndic_wait_at:
+            # Lower level masters could still report more minions up to
+            # syndic_wait
+            yield self.finish()
+        elif self._timer is None:
+            self._timer = self.io_loop.call_later(
+                self._syndic_wait_at - time.time(), self._check_done)
+
+    @tornado.gen.coroutine
+    def _gather(self):
+        '''
+        Ask the minions which did not return yet whether they are still
+        running the job, or finish the stream if none of them was found
+        running it by the last find_job job
+        '''
+        self._timer = None
+        if self.finished:
+            return
+        pending = self.minions - self.found
+        if not pending:
+            yield self._check_done()
+            return
+        if self._gathered and not self.running:
+            yield self.finish()
+            return
+        self._gathered = True
+        self.running = set()
+        log.debug('Checking whether jid %s is still running', self.jid)
+        # Dispatch the returns of the find_job job to this stream before it
+        # is published, so that the fastest ones are not dropped
+        jinfo_jid = salt.utils.jid.gen_jid(self.opts)
+        self.jinfo_jids.add(jinfo_jid)
+        yield self.client._add_stream(jinfo_jid, self)
+        try:
+            pub_data = yield self.client.run_job_async(
+                list(pending),
+                'saltutil.find_job',
+                arg=[self.jid],
+                tgt_type='list',
+                timeout=self.gather_job_timeout,
+                jid=jinfo_jid,
+                io_loop=self.io_loop,
+                **self.kwargs)
+        except SaltClientError as exc:
+            log.error('Unable to check whether jid %s is still running: %s',
+                      self.jid, exc)
+            pub_data = {}
+        # if no jid was assigned the master thinks there is nothing to wait
+        # for, and no minion is found running the job
+        if 'jid' not in pub_data:
+            self.jinfo_jids.discard(jinfo_jid)
+            self.client._remove_stream_jid(jinfo_jid)
+        wait = self.gather_job_timeout
+        if self.opts['order_masters']:
+            # if you are a syndic, wait a little longer
+            wait += self.opts.get('syndic_wait', 1)
+        if not self.finished:
+            self._timer = self.io_loop.call_later(wait, self._gather)
+
+    @tornado.gen.coroutine
+    def finish(self, error=None):
+        '''
+        Stop waiting for the returns of the job, report the minions which did
+        not return, and mark the end of the returns. If an ``error`` is
+        passed, it is raised by ``get`` at the end of the returns instead.
+        '''
+        if self.finished:
+            return
+        self.finished = True
+        self.error = error
+        if self._timer is not None:
+            self.io_loop.remove_timeout(self._timer)
+            self._timer = None
+        self.client._remove_stream(self)
+        if error is None:
+            failed = self.missing - self.found
+            if self.expect_minions:
+                failed.update(self.minions - self.found)
+            for minion in sorted(failed):
+                yield self._put({minion: {'failed': True}})
+        yield self.queue.put(None)
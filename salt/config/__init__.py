@@ -357,6 +357,12 @@ VALID_OPTS = {
     # Maximum number of concurrently active processes at any given point in time
     'process_count_max': int,
 
+    # The number of long lived processes running the published jobs, 0 forks a process per job
+    'job_worker_pool_size': int,
+
+    # The number of jobs after which a job worker process is replaced, 0 for no limit
+    'job_worker_max_jobs': int,
+
     # Whether or not the salt minion should run scheduled mine updates
     'mine_enabled': bool,
 
@@ -375,6 +381,9 @@ VALID_OPTS = {
     # The chunk size to use when streaming files with the file server
     'file_buffer_size': int,
 
+    # Have the master push all chunks of a file over a single request (TCP transport only)
+    'file_client_stream': bool,
+
     # The TCP port on which minion events should be published if ipc_mode is TCP
     'tcp_pub_port': int,
 
@@ -445,6 +454,9 @@ VALID_OPTS = {
     # Tell the loader to attempt to import *.zip archives
     'enable_zip_modules': bool,
 
+    # Tell the loader to keep the module file mappings and __virtual__ outcomes on disk
+    'loader_cache': bool,
+
     # Tell the client to show minions that have timed out
     'show_timeout': bool,
 
@@ -469,6 +481,13 @@ VALID_OPTS = {
     # When true, states run in the order defined in an SLS file, unless requisites re-order them
     'state_auto_order': bool,
 
+    # The number of worker processes rendering the SLS files of a highstate in parallel
+    'state_render_workers': int,
+
+    # Cache the rendering of SLS files, and reuse it while the SLS files, the templates they
+    # load, the grains and the pillar are unchanged
+    'state_render_cache': bool,
+
     # Fire events as state chunks are processed by the state compiler
     'state_events': bool,
 
@@ -541,6 +560,19 @@ VALID_OPTS = {
     # returner specified by 'event_return'
     'event_return_queue': int,
 
+    # The maximum number of events held in memory for the event returners, and what to do with the
+    # events arriving while the queue is full: 'block', 'drop_oldest' or 'spill' to a file
+    'event_return_queue_max_size': int,
+    'event_return_queue_overflow': six.string_types,
+
+    # Flush the queued events once the oldest of them is this many seconds old, even if fewer than
+    # 'event_return_queue' events are queued. 0 disables time based flushes.
+    'event_return_flush_interval': (int, float),
+
+    # The interval, in seconds, at which the event return queue statistics are published on the
+    # event bus. 0 disables the statistics events.
+    'event_return_stats_interval': int,
+
     # Only forward events to an event returner if it matches one of the tags in this list
     'event_return_whitelist': list,
 
@@ -550,6 +582,9 @@ VALID_OPTS = {
     # default match type for filtering events tags: startswith, endswith, find, regex, fnmatch
     'event_match_type': six.string_types,
 
+    # Have the event publisher only send LocalClient the events of its jobs
+    'local_client_event_filter': bool,
+
     # This pidfile to write out to when a daemon starts
     'pidfile': six.string_types,
 
@@ -730,6 +765,18 @@ VALID_OPTS = {
     # Pillar cache backend. Defaults to `disk` which stores caches in the master cache
     'pillar_cache_backend': six.string_types,
 
+    # Cache the rendering of each pillar SLS file, for as long as its inputs do not change
+    'pillar_sls_cache': bool,
+
+    # The number of seconds the rendered pillar SLS files are cached for, 0 for no limit
+    'pillar_sls_cache_ttl': int,
+
+    # The number of seconds the data of each ext_pillar module is cached for
+    'ext_pillar_cache_ttl': dict,
+
+    # Share the renderings of the pillar SLS files which read no minion data
+    'pillar_shared_render_cache': bool,
+
     'pillar_safe_render_error': bool,
 
     # When creating a pillar, there are several strategies to choose from when
@@ -837,6 +884,12 @@ VALID_OPTS = {
     # reply from executions.
     'minion_data_cache': bool,
 
+    # Keep an in-memory inverted index of the grains and pillar held in the minion data cache to
+    # resolve grain and pillar targets without fetching the data of every minion, and the
+    # number of seconds between synchronizations of the index with the cache.
+    'minion_data_cache_index': bool,
+    'minion_data_cache_index_interval': int,
+
     # The number of seconds between AES key rotations on the master
     'publish_session': int,
 
@@ -914,6 +967,15 @@ VALID_OPTS = {
     # The number of minutes between the minion refreshing its cache of grains
     'grains_refresh_every': int,
 
+    # The number of threads running the grains functions
+    'grains_workers': int,
+
+    # The number of seconds after which a grains function is given up, 0 for no limit
+    'grains_timeout': (int, float),
+
+    # The timeouts of specific grains functions, overriding grains_timeout
+    'grains_timeouts': dict,
+
     # Use lspci to gather system data for grains on a minion
     'enable_lspci': bool,
 
@@ -927,6 +989,9 @@ VALID_OPTS = {
     # Set Jinja environment options for sls templates
     'jinja_sls_env': dict,
 
+    # Persist the compiled jinja templates in the cachedir
+    'jinja_bytecode_cache': bool,
+
     # If this is set to True leading spaces and tabs are stripped from the start
     # of a line to a block.
     'jinja_lstrip_blocks': bool,
@@ -992,6 +1057,8 @@ VALID_OPTS = {
     'ssh_identities_only': bool,
     'ssh_log_file': six.string_types,
     'ssh_config_file': six.string_types,
+    'ssh_control_persist': int,
+    'ssh_thin_parts': bool,
 
     # Enable ioflo verbose logging. Warning! Very verbose!
     'ioflo_verbose': int,
@@ -1232,11 +1299,15 @@ DEFAULT_MINION_OPTS = {
     'grains_cache': False,
     'grains_cache_expiration': 300,
     'grains_deep_merge': False,
+    'grains_workers': 1,
+    'grains_timeout': 0,
+    'grains_timeouts': {},
     'conf_file': os.path.join(salt.syspaths.CONFIG_DIR, 'minion'),
     'sock_dir': os.path.join(salt.syspaths.SOCK_DIR, 'minion'),
     'sock_pool_size': 1,
     'backup_mode': '',
     'renderer': 'jinja|yaml',
+    'jinja_bytecode_cache': True,
     'renderer_whitelist': [],
     'renderer_blacklist': [],
     'random_startup_delay': 0,
@@ -1255,6 +1326,10 @@ DEFAULT_MINION_OPTS = {
     'pillar_cache': False,
     'pillar_cache_ttl': 3600,
     'pillar_cache_backend': 'disk',
+    'pillar_sls_cache': False,
+    'pillar_sls_cache_ttl': 0,
+    'ext_pillar_cache_ttl': {},
+    'pillar_shared_render_cache': False,
     'extension_modules': os.path.join(salt.syspaths.CACHE_DIR, 'minion', 'extmods'),
     'state_top': 'top.sls',
     'state_top_saltenv': None,
@@ -1359,6 +1434,8 @@ DEFAULT_MINION_OPTS = {
     'autosign_timeout': 120,
     'multiprocessing': True,
     'process_count_max': -1,
+    'job_worker_pool_size': 0,
+    'job_worker_max_jobs': 100,
     'mine_enabled': True,
     'mine_return_job': False,
     'mine_interval': 60,
@@ -1366,6 +1443,7 @@ DEFAULT_MINION_OPTS = {
     'ipc_write_buffer': _DFLT_IPC_WBUFFER,
     'ipv6': False,
     'file_buffer_size': 262144,
+    'file_client_stream': False,
     'tcp_pub_port': 4510,
     'tcp_pull_port': 4511,
     'tcp_authentication_retries': 5,
@@ -1385,10 +1463,13 @@ DEFAULT_MINION_OPTS = {
     'ext_job_cache': '',
     'cython_enable': False,
     'enable_zip_modules': False,
+    'loader_cache': False,
     'state_verbose': True,
     'state_output': 'full',
     'state_output_diff': False,
     'state_auto_order': True,
+    'state_render_workers': 1,
+    'state_render_cache': False,
     'state_events': False,
     'state_aggregate': False,
     'snapper_states': False,
@@ -1636,6 +1717,10 @@ DEFAULT_MASTER_OPTS = {
     'pillar_cache': False,
     'pillar_cache_ttl': 3600,
     'pillar_cache_backend': 'disk',
+    'pillar_sls_cache': False,
+    'pillar_sls_cache_ttl': 0,
+    'ext_pillar_cache_ttl': {},
+    'pillar_shared_render_cache': False,
     'ping_on_rotate': False,
     'peer': {},
     'preserve_minion_cache': False,
@@ -1689,6 +1774,8 @@ DEFAULT_MASTER_OPTS = {
     'master_job_cache': 'local_cache',
     'job_cache_store_endtime': False,
     'minion_data_cache': True,
+    'minion_data_cache_index': False,
+    'minion_data_cache_index_interval': 10,
     'enforce_mine_cache': False,
     'ipc_mode': _DFLT_IPC_MODE,
     'ipc_write_buffer': _DFLT_IPC_WBUFFER,
@@ -1717,9 +1804,14 @@ DEFAULT_MASTER_OPTS = {
     'engines': [],
     'event_return': '',
     'event_return_queue': 0,
+    'event_return_queue_max_size': 10000,
+    'event_return_queue_overflow': 'block',
+    'event_return_flush_interval': 0,
+    'event_return_stats_interval': 60,
     'event_return_whitelist': [],
     'event_return_blacklist': [],
     'event_match_type': 'startswith',
+    'local_client_event_filter': False,
     'runner_returns': True,
     'serial': 'msgpack',
     'test': False,
@@ -1735,6 +1827,7 @@ DEFAULT_MASTER_OPTS = {
     'ssh_list_nodegroups': {},
     'ssh_use_home_key': False,
     'cython_enable': False,
+    'loader_cache': False,
     'enable_gpu_grains': False,
     # XXX: Remove 'key_logfile' support in 2014.1.0
     'key_logfile': os.path.join(salt.syspaths.LOGS_DIR, 'key'),
@@ -1760,6 +1853,7 @@ DEFAULT_MASTER_OPTS = {
     'syndic_wait': 5,
     'jinja_env': {},
     'jinja_sls_env': {},
+    'jinja_bytecode_cache': True,
     'jinja_lstrip_blocks': False,
     'jinja_trim_blocks': False,
     'tcp_keepalive': True,
@@ -1784,6 +1878,8 @@ DEFAULT_MASTER_OPTS = {
     'ssh_identities_only': False,
     'ssh_log_file': os.path.join(salt.syspaths.LOGS_DIR, 'ssh'),
     'ssh_config_file': os.path.join(salt.syspaths.HOME_DIR, '.ssh', 'config'),
+    'ssh_control_persist': 60,
+    'ssh_thin_parts': False,
     'master_floscript': os.path.join(FLO_DIR, 'master.flo'),
     'worker_floscript': os.path.join(FLO_DIR, 'worker.flo'),
     'maintenance_floscript': os.path.join(FLO_DIR, 'maint.flo'),
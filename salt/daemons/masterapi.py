@@ -436,6 +436,7 @@ class RemoteFuncs(object):
         self._serve_file = fs_.serve_file
         self._file_find = fs_._find_file
         self._file_hash = fs_.file_hash
+        self._file_manifest = fs_.file_manifest
         self._file_list = fs_.file_list
         self._file_list_emptydirs = fs_.file_list_emptydirs
         self._dir_list = fs_.dir_list
@@ -713,9 +714,11 @@ class RemoteFuncs(object):
                 pillar_override=load.get('pillar_override', {}))
         data = pillar.compile_pillar()
         if self.opts.get('minion_data_cache', False):
+            minion_data = {'grains': load['grains'], 'pillar': data}
             self.cache.store('minions/{0}'.format(load['id']),
                              'data',
-                             {'grains': load['grains'], 'pillar': data})
+                             minion_data)
+            self.ckminions.update_data_index(load['id'], minion_data)
             if self.opts.get('minion_data_cache_events') is True:
                 self.event.fire_event({'comment': 'Minion data cache refresh'}, salt.utils.event.tagify(load['id'], 'refresh', 'minion'))
         return data
@@ -16,7 +16,7 @@ from tornado.httputil import parse_response_start_line, HTTPHeaders, HTTPInputEr
 
 # Import salt libs
 from salt.exceptions import (
-    CommandExecutionError, MinionError
+    CommandExecutionError, MinionError, SaltClientError, SaltReqTimeoutError
 )
 import salt.client
 import salt.crypt
@@ -235,15 +235,16 @@ class Client(object):
         )
         # go through the list of all files finding ones that are in
         # the target directory and caching them
+        paths = []
         for fn_ in self.file_list(saltenv):
             fn_ = sdecode(fn_)
             if fn_.strip() and fn_.startswith(path):
                 if salt.utils.stringutils.check_include_exclude(
                         fn_, include_pat, exclude_pat):
-                    fn_ = self.cache_file(
-                        salt.utils.url.create(fn_), saltenv, cachedir=cachedir)
-                    if fn_:
-                        ret.append(fn_)
+                    paths.append(salt.utils.url.create(fn_))
+        for fn_ in self.cache_files(paths, saltenv, cachedir=cachedir):
+            if fn_:
+                ret.append(fn_)
 
         if include_empty:
             # Break up the path into a list containing the bottom-level
@@ -1165,7 +1166,14 @@ class RemoteClient(Client):
         else:
             log.debug('No dest file found')
 
-        while True:
+        streamed = None
+        if self.opts.get('file_client_stream', False) \
+                and hasattr(self.channel, 'send_stream'):
+            streamed = self._stream_file(load, dest, fn_, saltenv, cachedir)
+            if streamed is not None:
+                dest, fn_ = streamed
+
+        while streamed is None:
             if not fn_:
                 load['loc'] = 0
             else:
@@ -1254,6 +1262,228 @@ class RemoteClient(Client):
 
         return dest
 
+    def _stream_file(self, load, dest, fn_, saltenv, cachedir):
+        '''
+        Fetch a file from the master in a single request, the master pushing
+        all of its chunks over the connection. Return the destination and the
+        file handle it was written to, or None if the file could not be
+        streamed and has to be fetched chunk by chunk.
+        '''
+        load = dict(load, cmd='_serve_file_stream', loc=0)
+        state = {'dest': dest, 'fn_': fn_}
+
+        def _write_chunk(data):
+            if six.PY3:
+                data = decode_dict_keys_to_str(data)
+            if state['fn_'] is None:
+                with self._cache_loc(
+                        data['dest'],
+                        saltenv,
+                        cachedir=cachedir) as cache_dest:
+                    # If a directory was formerly cached at this path, then
+                    # remove it to avoid a traceback trying to write the file
+                    if os.path.isdir(cache_dest):
+                        salt.utils.files.rm_rf(cache_dest)
+                    state['dest'] = cache_dest
+                    state['fn_'] = salt.utils.files.fopen(cache_dest, 'wb+')
+            if data.get('gzip', None):
+                chunk = salt.utils.gzip_util.uncompress(data['data'])
+            else:
+                chunk = data['data']
+            if six.PY3 and isinstance(chunk, str):
+                chunk = chunk.encode()
+            state['fn_'].seek(data['loc'])
+            state['fn_'].write(chunk)
+
+        try:
+            data = self.channel.send_stream(load, _write_chunk)
+            if six.PY3 and isinstance(data, dict):
+                data = decode_dict_keys_to_str(data)
+            if not isinstance(data, dict) or 'dest' not in data:
+                raise SaltClientError(
+                    'Master does not support streaming: {0}'.format(data)
+                )
+        except (SaltClientError, SaltReqTimeoutError,
+                IOError, OSError, KeyError, TypeError) as exc:
+            log.warning(
+                'Failed to stream \'%s\' from saltenv \'%s\', fetching it in '
+                'chunks: %s', load['path'], saltenv, exc
+            )
+            if state['fn_'] is not None and state['fn_'] is not fn_:
+                state['fn_'].close()
+            elif fn_ is not None:
+                fn_.seek(0)
+                fn_.truncate()
+            return None
+
+        if state['fn_'] is None and data['dest']:
+            # This is a 0 byte file on the master
+            with self._cache_loc(
+                    data['dest'],
+                    saltenv,
+                    cachedir=cachedir) as cache_dest:
+                state['dest'] = cache_dest
+                with salt.utils.files.fopen(cache_dest, 'wb+'):
+                    pass
+        return state['dest'], state['fn_']
+
+    def cache_files(self, paths, saltenv='base', cachedir=None):
+        '''
+        Download a list of files stored on the master and put them in the
+        minion file cache. The salt:// files of each saltenv are checked
+        against the master in a single request and only the files which
+        changed are downloaded, within that same request if the transport
+        supports streaming.
+        '''
+        if isinstance(paths, six.string_types):
+            paths = paths.split(',')
+        batches = {}
+        for idx, path in enumerate(paths):
+            if urlparse(path).scheme != 'salt':
+                continue
+            rel_path, senv = salt.utils.url.parse(path)
+            batches.setdefault(senv or saltenv, []).append((idx, rel_path))
+
+        cached = {}
+        for senv, items in six.iteritems(batches):
+            batch = self._cache_files_batch(
+                [rel_path for _, rel_path in items], senv, cachedir)
+            for idx, rel_path in items:
+                if rel_path in batch:
+                    cached[idx] = batch[rel_path]
+
+        ret = []
+        for idx, path in enumerate(paths):
+            if idx in cached:
+                ret.append(cached[idx])
+            else:
+                ret.append(self.cache_file(path, saltenv, cachedir=cachedir))
+        return ret
+
+    def _cache_files_batch(self, paths, saltenv, cachedir):
+        '''
+        Cache a batch of files of a saltenv using a single manifest request.
+        Return a dict mapping the paths which were resolved to their cache
+        location, or to False if they are missing on the master. The paths
+        left out have to be fetched one by one.
+        '''
+        hash_type = self.opts.get('hash_type', 'md5')
+        files = []
+        local = {}
+        for path in paths:
+            with self._cache_loc(path, saltenv, cachedir=cachedir) as cache_dest:
+                local[path] = cache_dest
+            if os.path.isfile(cache_dest):
+                hsum = salt.utils.hashutils.get_hash(cache_dest, hash_type)
+            else:
+                hsum = ''
+            files.append([path, hsum])
+        load = {'files': files,
+                'saltenv': saltenv,
+                'hash_type': hash_type,
+                'cmd': '_file_manifest'}
+
+        if self.opts.get('file_client_stream', False) \
+                and hasattr(self.channel, 'send_stream'):
+            manifest, streamed = self._stream_files(load, saltenv, cachedir)
+            if manifest is None:
+                # Files may have been partially written, leave them all to be
+                # checked again one by one
+                return {}
+        else:
+            manifest, streamed = self.channel.send(load), None
+        if not isinstance(manifest, dict) \
+                or not isinstance(manifest.get('files'), dict):
+            log.debug(
+                'Master does not support file manifests, caching the files of '
+                'saltenv \'%s\' one by one', saltenv
+            )
+            return {}
+
+        ret = {}
+        for path in paths:
+            entry = manifest['files'].get(path)
+            if entry is None:
+                continue
+            if not entry:
+                log.debug(
+                    'Could not find file \'%s\' in saltenv \'%s\'',
+                    path, saltenv
+                )
+                ret[path] = False
+            elif not entry['changed']:
+                ret[path] = local[path]
+            elif streamed is None:
+                continue
+            elif path in streamed:
+                ret[path] = streamed[path]
+            else:
+                # This is a 0 byte file on the master
+                with self._cache_loc(
+                        entry['dest'],
+                        saltenv,
+                        cachedir=cachedir) as cache_dest:
+                    if os.path.isdir(cache_dest):
+                        salt.utils.files.rm_rf(cache_dest)
+                    with salt.utils.files.fopen(cache_dest, 'wb+'):
+                        pass
+                ret[path] = cache_dest
+        return ret
+
+    def _stream_files(self, load, saltenv, cachedir):
+        '''
+        Fetch the files of a manifest request which changed, the master
+        pushing all of their chunks over the connection. Return the manifest,
+        or None if the batch could not be streamed, and a dict mapping the
+        paths written to their cache location.
+        '''
+        load = dict(load, cmd='_serve_files_stream')
+        handles = {}
+
+        def _write_chunk(data):
+            if six.PY3:
+                data = decode_dict_keys_to_str(data)
+            path = data['path']
+            if path not in handles:
+                with self._cache_loc(
+                        data['dest'],
+                        saltenv,
+                        cachedir=cachedir) as cache_dest:
+                    # If a directory was formerly cached at this path, then
+                    # remove it to avoid a traceback trying to write the file
+                    if os.path.isdir(cache_dest):
+                        salt.utils.files.rm_rf(cache_dest)
+                    handles[path] = (
+                        cache_dest, salt.utils.files.fopen(cache_dest, 'wb+'))
+            fn_ = handles[path][1]
+            if data.get('gzip', None):
+                chunk = salt.utils.gzip_util.uncompress(data['data'])
+            else:
+                chunk = data['data']
+            if six.PY3 and isinstance(chunk, str):
+                chunk = chunk.encode()
+            fn_.seek(data['loc'])
+            fn_.write(chunk)
+
+        try:
+            manifest = self.channel.send_stream(load, _write_chunk)
+            if not isinstance(manifest, dict) or 'files' not in manifest:
+                raise SaltClientError(
+                    'Master does not support streaming: {0}'.format(manifest)
+                )
+        except (SaltClientError, SaltReqTimeoutError,
+                IOError, OSError, KeyError, TypeError) as exc:
+            log.warning(
+                'Failed to stream the files of saltenv \'%s\', fetching '
+                'them in chunks: %s', saltenv, exc
+            )
+            manifest = None
+        finally:
+            for _, fn_ in six.itervalues(handles):
+                fn_.close()
+        return manifest, dict(
+            (path, dest) for path, (dest, _) in six.iteritems(handles))
+
     def file_list(self, saltenv='base', prefix=''):
         '''
         List the files on the master
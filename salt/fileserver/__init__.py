@@ -15,8 +15,11 @@ import time
 
 # Import salt libs
 import salt.loader
+import salt.payload
+import salt.utils.atomicfile
 import salt.utils.data
 import salt.utils.files
+import salt.utils.hashutils
 import salt.utils.path
 import salt.utils.url
 import salt.utils.versions
@@ -180,6 +183,130 @@ def check_env_cache(opts, env_cache):
     return None
 
 
+# Hash indexes loaded by this process, see get_hash_index()
+_HASH_INDEXES = {}
+
+
+def get_hash_index(opts, backend, saltenv):
+    '''
+    Return the :py:class:`HashIndex` of the files served by ``backend`` from
+    ``saltenv``, shared by all callers in this process
+    '''
+    key = (opts['cachedir'], backend, saltenv, opts['hash_type'])
+    if key not in _HASH_INDEXES:
+        _HASH_INDEXES[key] = HashIndex(opts, backend, saltenv)
+    return _HASH_INDEXES[key]
+
+
+class HashIndex(object):
+    '''
+    Persistent index of the hashes of the files of a fileserver backend
+    environment, keyed on the inode, mtime, ctime and size of each file.
+
+    The index is rewritten atomically by the backend's ``update`` function,
+    run by the FileserverUpdate process, and read without locking by the
+    master workers, which reload it whenever it was replaced. Files which
+    changed since the last update are hashed by the worker and the result
+    kept in memory until the index is reloaded.
+    '''
+    def __init__(self, opts, backend, saltenv):
+        self.opts = opts
+        self.hash_type = opts['hash_type']
+        self.path = os.path.join(opts['cachedir'],
+                                 backend,
+                                 'hash_index',
+                                 saltenv,
+                                 '{0}.p'.format(self.hash_type))
+        self.serial = salt.payload.Serial(opts)
+        self.entries = {}
+        self._stamp = None
+
+    @staticmethod
+    def _key(stat_result):
+        '''
+        Return the (inode, mtime, ctime, size) part of an os.stat result, as a
+        list. The times are the float ones, so that a file rewritten within
+        the same second is hashed again.
+        '''
+        return [stat_result.st_ino,
+                stat_result.st_mtime,
+                stat_result.st_ctime,
+                stat_result.st_size]
+
+    def load(self):
+        '''
+        Load the index from disk if it was written since it was last loaded
+        '''
+        try:
+            stat_result = os.stat(self.path)
+        except OSError:
+            return self.entries
+        stamp = (stat_result.st_ino, stat_result.st_mtime, stat_result.st_size)
+        if stamp == self._stamp:
+            return self.entries
+        try:
+            with salt.utils.files.fopen(self.path, 'rb') as fp_:
+                entries = salt.utils.data.decode(self.serial.load(fp_))
+        except Exception as exc:
+            log.warning('Unable to load fileserver hash index %s: %s', self.path, exc)
+            return self.entries
+        if isinstance(entries, dict):
+            self.entries = entries
+            self._stamp = stamp
+        return self.entries
+
+    def get(self, rel, path):
+        '''
+        Return the hash of the file at ``path``, served as ``rel``. The file is
+        only hashed if it changed since the hash was recorded.
+        '''
+        key = self._key(os.stat(path))
+        entry = self.load().get(rel)
+        if entry is not None and entry[:-1] == key:
+            return entry[-1]
+        hsum = salt.utils.hashutils.get_hash(path, self.hash_type)
+        self.entries[rel] = key + [hsum]
+        return hsum
+
+    def update(self, files):
+        '''
+        Rewrite the index for ``files``, a dict mapping the paths the files
+        are served as to their location on disk. Only files which changed
+        since the last update are hashed. Return the list of changed files.
+        '''
+        previous = self.load()
+        entries = {}
+        changed = []
+        for rel, path in six.iteritems(files):
+            try:
+                key = self._key(os.stat(path))
+            except OSError:
+                continue
+            entry = previous.get(rel)
+            if entry is not None and entry[:-1] == key:
+                entries[rel] = entry
+                continue
+            try:
+                entries[rel] = key + [salt.utils.hashutils.get_hash(path, self.hash_type)]
+            except (IOError, OSError) as exc:
+                log.debug('Unable to hash %s: %s', path, exc)
+                continue
+            changed.append(rel)
+        if not changed and len(entries) == len(previous) and os.path.isfile(self.path):
+            return changed
+        index_dir = os.path.dirname(self.path)
+        try:
+            os.makedirs(index_dir)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+        with salt.utils.atomicfile.atomic_open(self.path, 'wb') as fp_:
+            fp_.write(self.serial.dumps(entries))
+        self.entries = entries
+        self._stamp = None
+        return changed
+
+
 def generate_mtime_map(opts, path_map):
     '''
     Generate a dict of filename -> mtime
@@ -613,6 +740,57 @@ class Fileserver(object):
             return self.servers[fstr](load, fnd)
         return ret
 
+    def serve_file_stream(self, load):
+        '''
+        Serve up a whole file as a generator of chunks, the last one carrying
+        no data. Backends without a ``serve_file_stream`` function are read
+        through their ``serve_file`` function.
+        '''
+        ret = {'data': '',
+               'dest': ''}
+
+        if 'env' in load:
+            # "env" is not supported; Use "saltenv".
+            load.pop('env')
+
+        if 'path' not in load or 'saltenv' not in load:
+            return iter([ret])
+        if not isinstance(load['saltenv'], six.string_types):
+            load['saltenv'] = six.text_type(load['saltenv'])
+
+        fnd = self.find_file(load['path'], load['saltenv'])
+        if not fnd.get('back'):
+            return iter([ret])
+        return self.__serve_found_stream(load, fnd)
+
+    def __serve_found_stream(self, load, fnd):
+        '''
+        Common code for streaming a file already found in a backend
+        '''
+        fstr = '{0}.serve_file_stream'.format(fnd['back'])
+        if fstr in self.servers:
+            return self.servers[fstr](load, fnd)
+        fstr = '{0}.serve_file'.format(fnd['back'])
+        if fstr in self.servers:
+            return self._serve_file_chunks(self.servers[fstr], load, fnd)
+        return iter([{'data': '', 'dest': ''}])
+
+    def _serve_file_chunks(self, serve_file, load, fnd):
+        '''
+        Generate the chunks of a file by calling the ``serve_file`` function of
+        a backend with consecutive locations
+        '''
+        load = dict(load)
+        loc = load.get('loc', 0)
+        while True:
+            load['loc'] = loc
+            ret = serve_file(load, fnd)
+            ret['loc'] = loc
+            yield ret
+            if not ret.get('data'):
+                break
+            loc += self.opts['file_buffer_size']
+
     def __file_hash_and_stat(self, load):
         '''
         Common code for hashing and stating files
@@ -654,6 +832,85 @@ class Fileserver(object):
         except (IndexError, TypeError):
             return '', None
 
+    def __file_manifest(self, load):
+        '''
+        Common code for checking a batch of files against the hashes of the
+        copies cached by the minion. Generate a tuple of the requested path,
+        its manifest entry and, if the file changed, the result of find_file.
+        '''
+        if 'env' in load:
+            # "env" is not supported; Use "saltenv".
+            load.pop('env')
+
+        saltenv = load.get('saltenv', 'base')
+        if not isinstance(saltenv, six.string_types):
+            saltenv = six.text_type(saltenv)
+        hash_type = load.get('hash_type')
+
+        for item in load.get('files') or []:
+            try:
+                path, hsum = item
+            except (TypeError, ValueError):
+                continue
+            path = salt.utils.stringutils.to_unicode(path)
+            fnd = self.find_file(path, saltenv)
+            fstr = '{0}.file_hash'.format(fnd.get('back'))
+            if fstr not in self.servers:
+                yield path, {}, None
+                continue
+            hash_ret = self.servers[fstr](
+                {'path': path, 'saltenv': saltenv}, fnd)
+            if not isinstance(hash_ret, dict) or not hash_ret.get('hsum'):
+                yield path, {}, None
+                continue
+            try:
+                mode = fnd['stat'][0]
+            except (IndexError, KeyError, TypeError):
+                mode = None
+            changed = hash_ret['hash_type'] != hash_type \
+                or hash_ret['hsum'] != hsum
+            entry = {'hsum': hash_ret['hsum'],
+                     'hash_type': hash_ret['hash_type'],
+                     'dest': fnd['rel'],
+                     'mode': mode,
+                     'changed': changed}
+            yield path, entry, fnd if changed else None
+
+    def file_manifest(self, load):
+        '''
+        Check a batch of files against the hashes of the copies cached by the
+        minion, ``load['files']`` being a list of ``[path, hsum]`` pairs.
+        Return a dict mapping each path to its hash, hash type, destination,
+        mode and whether it changed, or to an empty dict if it is missing.
+        '''
+        ret = {}
+        for path, entry, _ in self.__file_manifest(load):
+            ret[path] = entry
+        return {'files': ret}
+
+    def serve_files_stream(self, load):
+        '''
+        Serve the files of a batch whose hashes do not match the copies cached
+        by the minion, as a generator of chunks tagged with the requested
+        path. The last item is the manifest returned by ``file_manifest``.
+        '''
+        manifest = {}
+        for path, entry, fnd in self.__file_manifest(load):
+            manifest[path] = entry
+            if fnd is None:
+                continue
+            file_load = {'path': path,
+                         'saltenv': load.get('saltenv', 'base'),
+                         'loc': 0}
+            if load.get('gzip'):
+                file_load['gzip'] = load['gzip']
+            for chunk in self.__serve_found_stream(file_load, fnd):
+                if not chunk.get('data'):
+                    break
+                chunk['path'] = path
+                yield chunk
+        yield {'files': manifest}
+
     def clear_file_list_cache(self, load):
         '''
         Deletes the file_lists cache files
@@ -19,7 +19,6 @@ from __future__ import absolute_import, print_function, unicode_literals
 
 # Import python libs
 import os
-import errno
 import logging
 
 # Import salt libs
@@ -27,7 +26,6 @@ import salt.fileserver
 import salt.utils.event
 import salt.utils.files
 import salt.utils.gzip_util
-import salt.utils.hashutils
 import salt.utils.path
 import salt.utils.platform
 import salt.utils.stringutils
@@ -138,18 +136,47 @@ def serve_file(load, fnd):
     return ret
 
 
+def serve_file_stream(load, fnd):
+    '''
+    Return a generator of consecutive chunks of a file, starting at ``loc``,
+    read from a single open file handle. The last item carries no data.
+    '''
+    if 'env' in load:
+        # "env" is not supported; Use "saltenv".
+        load.pop('env')
+
+    if 'path' not in load or 'saltenv' not in load or not fnd['path']:
+        yield {'data': '', 'dest': ''}
+        return
+    gzip = load.get('gzip', None)
+    loc = load.get('loc', 0)
+    fpath = os.path.normpath(fnd['path'])
+    with salt.utils.files.fopen(fpath, 'rb') as fp_:
+        fp_.seek(loc)
+        while True:
+            data = fp_.read(__opts__['file_buffer_size'])
+            if not data:
+                break
+            ret = {'data': data,
+                   'dest': fnd['rel'],
+                   'loc': loc}
+            loc += len(data)
+            if gzip:
+                ret['data'] = salt.utils.gzip_util.compress(data, gzip)
+                ret['gzip'] = gzip
+            yield ret
+    yield {'data': '', 'dest': fnd['rel'], 'loc': loc}
+
+
 def update():
     '''
     When we are asked to update (regular interval) lets reap the cache
     '''
-    try:
-        salt.fileserver.reap_fileserver_cache_dir(
-            os.path.join(__opts__['cachedir'], 'roots', 'hash'),
-            find_file
-        )
-    except (IOError, OSError):
-        # Hash file won't exist if no files have yet been served up
-        pass
+    # Hashes used to be cached in one file per served file, they are now kept
+    # in the hash index of each environment
+    legacy_hash_dir = os.path.join(__opts__['cachedir'], 'roots', 'hash')
+    if os.path.isdir(legacy_hash_dir):
+        salt.utils.files.rm_rf(legacy_hash_dir)
 
     mtime_map_path = os.path.join(__opts__['cachedir'], 'roots', 'mtime_map')
     # data to send on event
@@ -199,6 +226,11 @@ def update():
                 )
             )
 
+    try:
+        _update_hash_indexes()
+    except (IOError, OSError) as exc:
+        log.error('Unable to update the roots hash index: %s', exc)
+
     if __opts__.get('fileserver_events', False):
         # if there is a change, fire an event
         event = salt.utils.event.get_event(
@@ -230,61 +262,22 @@ def file_hash(load, fnd):
 
     # set the hash_type as it is determined by config-- so mechanism won't change that
     ret['hash_type'] = __opts__['hash_type']
+    hash_index = salt.fileserver.get_hash_index(__opts__, 'roots', load['saltenv'])
+    ret['hsum'] = hash_index.get(fnd['rel'], path)
+    return ret
 
-    # check if the hash is cached
-    # cache file's contents should be "hash:mtime"
-    cache_path = os.path.join(__opts__['cachedir'],
-                              'roots',
-                              'hash',
-                              load['saltenv'],
-                              '{0}.hash.{1}'.format(fnd['rel'],
-                              __opts__['hash_type']))
-    # if we have a cache, serve that if the mtime hasn't changed
-    if os.path.exists(cache_path):
-        try:
-            with salt.utils.files.fopen(cache_path, 'r') as fp_:
-                try:
-                    hsum, mtime = salt.utils.stringutils.to_unicode(fp_.read()).split(':')
-                except ValueError:
-                    log.debug('Fileserver attempted to read incomplete cache file. Retrying.')
-                    # Delete the file since its incomplete (either corrupted or incomplete)
-                    try:
-                        os.unlink(cache_path)
-                    except OSError:
-                        pass
-                    return file_hash(load, fnd)
-                if os.path.getmtime(path) == mtime:
-                    # check if mtime changed
-                    ret['hsum'] = hsum
-                    return ret
-        except (os.error, IOError):  # Can't use Python select() because we need Windows support
-            log.debug("Fileserver encountered lock when reading cache file. Retrying.")
-            # Delete the file since its incomplete (either corrupted or incomplete)
-            try:
-                os.unlink(cache_path)
-            except OSError:
-                pass
-            return file_hash(load, fnd)
 
-    # if we don't have a cache entry-- lets make one
-    ret['hsum'] = salt.utils.hashutils.get_hash(path, __opts__['hash_type'])
-    cache_dir = os.path.dirname(cache_path)
-    # make cache directory if it doesn't exist
-    if not os.path.exists(cache_dir):
-        try:
-            os.makedirs(cache_dir)
-        except OSError as err:
-            if err.errno == errno.EEXIST:
-                # rarely, the directory can be already concurrently created between
-                # the os.path.exists and the os.makedirs lines above
-                pass
-            else:
-                raise
-    # save the cache object "hash:mtime"
-    cache_object = '{0}:{1}'.format(ret['hsum'], os.path.getmtime(path))
-    with salt.utils.files.flopen(cache_path, 'w') as fp_:
-        fp_.write(cache_object)
-    return ret
+def _update_hash_indexes():
+    '''
+    Refresh the hash index of the files of each environment
+    '''
+    for saltenv in envs():
+        files = {}
+        for rel in file_list({'saltenv': saltenv}):
+            fnd = find_file(rel, saltenv)
+            if fnd['path']:
+                files[fnd['rel']] = fnd['path']
+        salt.fileserver.get_hash_index(__opts__, 'roots', saltenv).update(files)
 
 
 def _file_lists(load, form):
@@ -10,12 +10,14 @@ from __future__ import absolute_import, print_function, unicode_literals
 import os
 import sys
 import time
+import hashlib
 import logging
 import inspect
 import tempfile
 import functools
 import threading
 import types
+import collections
 from collections import MutableMapping
 from zipimport import zipimporter
 
@@ -26,11 +28,15 @@ import salt.utils.context
 import salt.utils.data
 import salt.utils.dictupdate
 import salt.utils.event
+import salt.utils.atomicfile
 import salt.utils.files
+import salt.utils.json
 import salt.utils.lazy
 import salt.utils.odict
 import salt.utils.platform
+import salt.utils.stringutils
 import salt.utils.versions
+import salt.version
 from salt.exceptions import LoaderError
 from salt.template import check_render_pipe_str
 from salt.utils.decorators import Depends
@@ -97,6 +103,22 @@ LIBCLOUD_FUNCS_NOT_SUPPORTED = (
 # Will be set to pyximport module at runtime if cython is enabled in config.
 pyximport = None
 
+# The file of the cachedir keeping the outcome of each grains function
+GRAINS_FUNCS_CACHE = 'grains.functions.p'
+
+# The opts, besides the grains, which the __virtual__ outcomes kept in the
+# loader cache are valid for
+LOADER_CACHE_OPTS = (
+    '__role',
+    'id',
+    'proxy',
+    'transport',
+    'file_client',
+    'master_type',
+    'use_superseded',
+    'extension_modules',
+)
+
 
 def static_loader(
         opts,
@@ -663,6 +685,108 @@ def _load_cached_grains(opts, cfn):
         return None
 
 
+def _load_grain_funcs_cache(opts):
+    '''
+    Return the outcome of each grains function the last time the grains were
+    loaded
+    '''
+    try:
+        serial = salt.payload.Serial(opts)
+        with salt.utils.files.fopen(
+                os.path.join(opts['cachedir'], GRAINS_FUNCS_CACHE), 'rb') as fp_:
+            cached = serial.load(fp_)
+    except Exception:
+        return {}
+    if not isinstance(cached, dict):
+        return {}
+    return salt.utils.data.decode(cached, preserve_tuples=True)
+
+
+def _call_grain_func(func, args):
+    '''
+    Call a grains function and time it
+    '''
+    start = time.time()
+    try:
+        return {'state': 'ok',
+                'ret': func(*args),
+                'duration': time.time() - start}
+    except Exception:
+        return {'state': 'failed',
+                'exc_info': sys.exc_info(),
+                'duration': time.time() - start}
+
+
+def _run_grain_funcs(opts, calls):
+    '''
+    Run the ``(key, func, args)`` calls of the grains functions and return
+    their outcome by key.
+
+    The functions are run concurrently by ``grains_workers`` threads, each of
+    them bounded by its timeout. The outcome of a function which timed out is
+    given up, a new thread replaces the one still running it.
+    '''
+    workers = max(int(opts.get('grains_workers', 1) or 1), 1)
+    default_timeout = opts.get('grains_timeout', 0) or 0
+    timeouts = opts.get('grains_timeouts') or {}
+
+    if workers == 1 and not default_timeout and not timeouts:
+        return dict(
+            (key, _call_grain_func(func, args)) for key, func, args in calls
+        )
+
+    tasks = collections.deque(calls)
+    started = {}
+    results = {}
+    cond = threading.Condition()
+
+    def _worker():
+        while True:
+            with cond:
+                if not tasks:
+                    return
+                key, func, args = tasks.popleft()
+                started[key] = time.time()
+            result = _call_grain_func(func, args)
+            with cond:
+                if key in results:
+                    # The function timed out and this thread was replaced
+                    return
+                results[key] = result
+                cond.notify()
+
+    def _spawn():
+        thread = threading.Thread(target=_worker, name='GrainsWorker')
+        thread.daemon = True
+        thread.start()
+
+    for _ in range(min(workers, len(calls))):
+        _spawn()
+
+    with cond:
+        while len(results) < len(calls):
+            now = time.time()
+            wait = None
+            for key, start in six.iteritems(started):
+                timeout = timeouts.get(key, default_timeout)
+                if key in results or not timeout:
+                    continue
+                if start + timeout <= now:
+                    log.warning(
+                        'Grains function %s timed out after %s seconds',
+                        key, timeout
+                    )
+                    results[key] = {'state': 'timeout',
+                                    'duration': now - start}
+                    if tasks:
+                        _spawn()
+                elif wait is None or start + timeout - now < wait:
+                    wait = start + timeout - now
+            if len(results) < len(calls):
+                cond.wait(wait)
+    return results
+
+
 def grains(opts, force_refresh=False, proxy=None):
     '''
     Return the functions for the dynamic grains and the values for the static
@@ -726,51 +850,74 @@ def grains(opts, force_refresh=False, proxy=None):
     funcs = grain_funcs(opts, proxy=proxy)
     if force_refresh:  # if we refresh, lets reload grain modules
         funcs.clear()
-    # Run core grains
-    for key in funcs:
-        if not key.startswith('core.'):
-            continue
-        log.trace('Loading %s grain', key)
-        ret = funcs[key]()
-        if not isinstance(ret, dict):
-            continue
-        if grains_deep_merge:
-            salt.utils.dictupdate.update(grains_data, ret)
-        else:
-            grains_data.update(ret)
 
-    # Run the rest of the grains
+    # The core grains are merged first, then the rest of the grains
+    calls = []
+    for key in funcs:
+        if key.startswith('core.'):
+            log.trace('Loading %s grain', key)
+            calls.append((key, funcs[key], ()))
     for key in funcs:
         if key.startswith('core.') or key == '_errors':
             continue
-        try:
-            # Grains are loaded too early to take advantage of the injected
-            # __proxy__ variable.  Pass an instance of that LazyLoader
-            # here instead to grains functions if the grains functions take
-            # one parameter.  Then the grains can have access to the
-            # proxymodule for retrieving information from the connected
-            # device.
-            log.trace('Loading %s grain', key)
-            if funcs[key].__code__.co_argcount == 1:
-                ret = funcs[key](proxy)
-            else:
-                ret = funcs[key]()
-        except Exception:
+        # Grains are loaded too early to take advantage of the injected
+        # __proxy__ variable.  Pass an instance of that LazyLoader
+        # here instead to grains functions if the grains functions take
+        # one parameter.  Then the grains can have access to the
+        # proxymodule for retrieving information from the connected
+        # device.
+        log.trace('Loading %s grain', key)
+        if funcs[key].__code__.co_argcount == 1:
+            calls.append((key, funcs[key], (proxy,)))
+        else:
+            calls.append((key, funcs[key], ()))
+
+    cached_funcs = _load_grain_funcs_cache(opts)
+    results = _run_grain_funcs(opts, calls)
+    funcs_cache = {}
+    for key, func, _ in calls:
+        result = results[key]
+        funcs_cache[key] = {'state': result['state'],
+                            'duration': result['duration']}
+        if result['state'] == 'timeout':
+            # Keep the grains of the function from the last time it returned
+            ret = cached_funcs.get(key, {}).get('ret')
+            if ret is None:
+                continue
+            log.info('Using the cached grains of %s', key)
+        elif result['state'] == 'failed':
+            if key.startswith('core.'):
+                six.reraise(*result['exc_info'])
             if salt.utils.platform.is_proxy():
                 log.info('The following CRITICAL message may not be an error; the proxy may not be completely established yet.')
             log.critical(
                 'Failed to load grains defined in grain file %s in '
-                'function %s, error:\n', key, funcs[key],
-                exc_info=True
+                'function %s, error:\n', key, func,
+                exc_info=result['exc_info']
             )
             continue
+        else:
+            ret = result['ret']
         if not isinstance(ret, dict):
             continue
+        funcs_cache[key]['ret'] = ret
         if grains_deep_merge:
             salt.utils.dictupdate.update(grains_data, ret)
         else:
             grains_data.update(ret)
 
+    # Keep the outcome of each grains function, for the timings report and
+    # for the functions timing out next time
+    with salt.utils.files.set_umask(0o077):
+        try:
+            serial = salt.payload.Serial(opts)
+            with salt.utils.files.fopen(
+                    os.path.join(opts['cachedir'], GRAINS_FUNCS_CACHE),
+                    'w+b') as fp_:
+                serial.dump(funcs_cache, fp_)
+        except Exception as exc:
+            log.debug('Unable to write the grains functions cache: %s', exc)
+
     if opts.get('proxy_merge_grains_in_module', True) and proxy:
         try:
             proxytype = proxy.opts['proxy']['proxytype']
@@ -1125,6 +1272,15 @@ class LazyLoader(salt.utils.lazy.LazyDict):
             )
         )
 
+        # The file mapping and the __virtual__ outcomes are kept on disk when
+        # the loader cache is enabled
+        self.cache_enabled = bool(
+            self.opts.get('loader_cache', False) and self.opts.get('cachedir')
+        )
+        self._file_mapping_key = None
+        self._virtual_cache = None
+        self._virtual_cache_dirty = False
+
         self._lock = threading.RLock()
         self._refresh_file_mapping()
 
@@ -1229,7 +1385,33 @@ class LazyLoader(salt.utils.lazy.LazyDict):
         # The files are added in order of priority, so order *must* be retained.
         self.file_mapping = salt.utils.odict.OrderedDict()
 
+        if self.cache_enabled:
+            map_key = _loader_cache_digest([
+                salt.version.__version__,
+                BIN_PRE_EXT,
+                self.tag,
+                self.module_dirs,
+                sorted(self.suffix_map),
+                sorted(self.disabled),
+            ])
+            if map_key != self._file_mapping_key:
+                # The __virtual__ outcomes are kept for a given file mapping
+                self._save_virtual_cache()
+                self._virtual_cache = None
+                self._file_mapping_key = map_key
+            if self._read_file_mapping_cache():
+                self._add_static_modules()
+                return
+
+        # The directories are stamped before they are listed, so that the
+        # cached mapping is not newer than its stamps
+        stamps = []
         for mod_dir in self.module_dirs:
+            stamps.extend(_path_stamps([mod_dir]))
+            if six.PY3:
+                stamps.extend(
+                    _path_stamps([os.path.join(mod_dir, '__pycache__')])
+                )
             try:
                 # Make sure we have a sorted listdir in order to have
                 # expectable override results
@@ -1269,6 +1451,7 @@ class LazyLoader(salt.utils.lazy.LazyDict):
                     # if its a directory, lets allow us to load that
                     if ext == '':
                         # is there something __init__?
+                        stamps.extend(_path_stamps([fpath]))
                         subfiles = os.listdir(fpath)
                         for suffix in suffix_order:
                             if '' == suffix:
@@ -1302,10 +1485,170 @@ class LazyLoader(salt.utils.lazy.LazyDict):
 
                 except OSError:
                     continue
+
+        if self.cache_enabled:
+            self._write_loader_cache('map', self._file_mapping_key, {
+                'stamps': stamps,
+                'mapping': [
+                    [name, fpath, ext]
+                    for name, (fpath, ext) in six.iteritems(self.file_mapping)
+                ],
+            })
+        self._add_static_modules()
+
+    def _add_static_modules(self):
+        '''
+        Add the static modules to the file mapping
+        '''
         for smod in self.static_modules:
             f_noext = smod.split('.')[-1]
             self.file_mapping[f_noext] = (smod, '.o')
 
+    def _loader_cache_path(self, kind, key):
+        '''
+        Return the path of a file of the loader cache
+        '''
+        return os.path.join(
+            self.opts['cachedir'],
+            'loader',
+            '{0}-{1}.{2}'.format(self.tag, key, kind)
+        )
+
+    def _read_loader_cache(self, kind, key):
+        '''
+        Return the data of a file of the loader cache, or None if the file is
+        missing or its stamps are out of date
+        '''
+        try:
+            with salt.utils.files.fopen(
+                    self._loader_cache_path(kind, key), 'r') as fp_:
+                data = salt.utils.json.load(fp_)
+        except (IOError, OSError, ValueError):
+            return None
+        try:
+            stamps = data['stamps']
+            if stamps != _path_stamps([path for path, _ in stamps]):
+                return None
+        except (KeyError, TypeError, ValueError):
+            return None
+        return data
+
+    def _write_loader_cache(self, kind, key, data):
+        '''
+        Write a file of the loader cache
+        '''
+        path = self._loader_cache_path(kind, key)
+        try:
+            try:
+                os.makedirs(os.path.dirname(path))
+            except OSError:
+                if not os.path.isdir(os.path.dirname(path)):
+                    raise
+            with salt.utils.atomicfile.atomic_open(path, 'w') as fp_:
+                salt.utils.json.dump(data, fp_)
+        except (IOError, OSError) as exc:
+            log.debug('Unable to write the loader cache %s: %s', path, exc)
+
+    def _read_file_mapping_cache(self):
+        '''
+        Fill the file mapping from the loader cache, return whether it was
+        up to date
+        '''
+        data = self._read_loader_cache('map', self._file_mapping_key)
+        if data is None:
+            return False
+        try:
+            for name, fpath, ext in data['mapping']:
+                self.file_mapping[name] = (fpath, ext)
+        except (KeyError, TypeError, ValueError):
+            self.file_mapping.clear()
+            return False
+        return True
+
+    def _virtual_cache_key(self):
+        '''
+        Return the key of the __virtual__ outcomes of the file mapping
+        '''
+        return _loader_cache_digest([
+            self._file_mapping_key,
+            self.virtual_funcs,
+            self.opts.get('grains', {}),
+            [self.opts.get(key) for key in LOADER_CACHE_OPTS],
+        ])
+
+    def _virtual_cache_stamps(self):
+        '''
+        Return the stamps of the directories holding the python libraries and
+        the executables, the __virtual__ functions mostly check for those
+        '''
+        paths = [path for path in sys.path if path]
+        paths.extend(
+            path for path in os.environ.get('PATH', '').split(os.pathsep)
+            if path
+        )
+        return _path_stamps(paths)
+
+    def _get_virtual_cache(self):
+        '''
+        Return the cached __virtual__ outcomes, by file name
+        '''
+        if self._virtual_cache is None:
+            data = self._read_loader_cache('virtual', self._virtual_cache_key())
+            if data is None or not isinstance(data.get('modules'), dict):
+                self._virtual_cache = {}
+            else:
+                self._virtual_cache = data['modules']
+        return self._virtual_cache
+
+    def _cached_virtual(self, name, fpath):
+        '''
+        Return the cached __virtual__ outcome of a file, if it is up to date
+        '''
+        if not self.cache_enabled or not self.virtual_enable or \
+                self.file_mapping[name][1] == '.o':
+            return None
+        entry = self._get_virtual_cache().get(name)
+        if not entry or entry.get('path') != fpath:
+            return None
+        try:
+            if entry.get('mtime') != os.stat(fpath).st_mtime:
+                return None
+        except OSError:
+            return None
+        return entry
+
+    def _cache_virtual(self, name, fpath, loaded, names, error=None):
+        '''
+        Keep the __virtual__ outcome of a file in the loader cache
+        '''
+        if not self.cache_enabled or not self.virtual_enable or \
+                self.file_mapping[name][1] == '.o':
+            return
+        try:
+            mtime = os.stat(fpath).st_mtime
+        except OSError:
+            return
+        self._get_virtual_cache()[name] = {
+            'path': fpath,
+            'mtime': mtime,
+            'loaded': loaded,
+            'names': names,
+            'error': None if error is None else six.text_type(error),
+        }
+        self._virtual_cache_dirty = True
+
+    def _save_virtual_cache(self):
+        '''
+        Write the new __virtual__ outcomes to the loader cache
+        '''
+        if not self._virtual_cache_dirty or self._virtual_cache is None:
+            return
+        self._virtual_cache_dirty = False
+        self._write_loader_cache('virtual', self._virtual_cache_key(), {
+            'stamps': self._virtual_cache_stamps(),
+            'modules': self._virtual_cache,
+        })
+
     def clear(self):
         '''
         Clear the dict
@@ -1347,6 +1690,15 @@ class LazyLoader(salt.utils.lazy.LazyDict):
         # do we have an exact match?
         if mod_name in self.file_mapping:
             yield mod_name
+        # do we have a file known to provide it?
+        elif self.cache_enabled and self.virtual_enable:
+            known = [
+                k for k, entry in six.iteritems(self._get_virtual_cache())
+                if entry.get('loaded') and mod_name in entry.get('names', ())
+            ]
+            for k in known:
+                if k in self.file_mapping:
+                    yield k
 
         # do we have a partial match?
         for k in self.file_mapping:
@@ -1375,6 +1727,17 @@ class LazyLoader(salt.utils.lazy.LazyDict):
         mod = None
         fpath, suffix = self.file_mapping[name]
         self.loaded_files.add(name)
+
+        cached = self._cached_virtual(name, fpath)
+        if cached is not None and not cached.get('loaded'):
+            # The __virtual__ function of this module rejected it last time,
+            # do not import it again
+            error = cached.get('error')
+            for module_name in cached.get('names') or [name]:
+                self.missing_modules[module_name] = error
+            self.missing_modules[name] = error
+            return False
+
         fpath_dirname = os.path.dirname(fpath)
         try:
             sys.path.append(fpath_dirname)
@@ -1536,7 +1899,11 @@ class LazyLoader(salt.utils.lazy.LazyDict):
                     # If a module has information about why it could not be loaded, record it
                     self.missing_modules[module_name] = virtual_err
                     self.missing_modules[name] = virtual_err
+                    self._cache_virtual(name, fpath, False, [module_name],
+                                        virtual_err)
                     return False
+            self._cache_virtual(name, fpath, True,
+                                [module_name] + list(virtual_aliases))
         else:
             virtual_aliases = ()
 
@@ -1658,6 +2025,7 @@ class LazyLoader(salt.utils.lazy.LazyDict):
                         self._refresh_file_mapping()
                         reloaded = True
                     continue
+            self._save_virtual_cache()
 
         return ret
 
@@ -1671,6 +2039,7 @@ class LazyLoader(salt.utils.lazy.LazyDict):
                     continue
                 self._load_module(name)
 
+            self._save_virtual_cache()
             self.loaded = True
 
     def reload_modules(self):
@@ -1815,6 +2184,31 @@ class LazyLoader(salt.utils.lazy.LazyDict):
         return (True, module_name, None, virtual_aliases)
 
 
+def _path_stamps(paths):
+    '''
+    Return the ``[path, mtime]`` pairs of the given paths, the mtime is None
+    for the paths which do not exist
+    '''
+    ret = []
+    for path in paths:
+        try:
+            ret.append([path, os.stat(path).st_mtime])
+        except OSError:
+            ret.append([path, None])
+    return ret
+
+
+def _loader_cache_digest(obj):
+    '''
+    Return the digest keying an entry of the loader cache
+    '''
+    return hashlib.sha256(
+        salt.utils.stringutils.to_bytes(
+            salt.utils.json.dumps(obj, sort_keys=True, default=repr)
+        )
+    ).hexdigest()
+
+
 def global_injector_decorator(inject_globals):
     '''
     Decorator used by the LazyLoader to inject globals into a function at
@@ -230,14 +230,20 @@ class Maintenance(salt.utils.process.SignalHandlingMultiprocessingProcess):
                 salt.daemons.masterapi.clean_old_jobs(self.opts)
                 salt.daemons.masterapi.clean_expired_tokens(self.opts)
                 salt.daemons.masterapi.clean_pub_auth(self.opts)
+                last = now
             self.handle_git_pillar()
             self.handle_schedule()
             self.handle_key_cache()
             self.handle_presence(old_present)
             self.handle_key_rotate(now)
             salt.utils.verify.check_max_open_files(self.opts)
-            last = now
-            time.sleep(self.loop_interval)
+            # Wake up for the next scheduled job if it is due before the end
+            # of the loop interval
+            sleep = self.loop_interval
+            due = self.schedule.seconds_until_due()
+            if due is not None:
+                sleep = max(min(sleep, due), 1)
+            time.sleep(sleep)
 
     def handle_key_cache(self):
         '''
@@ -305,8 +311,12 @@ class Maintenance(salt.utils.process.SignalHandlingMultiprocessingProcess):
         Update git pillar
         '''
         try:
+            changed = False
             for pillar in self.git_pillar:
-                pillar.fetch_remotes()
+                if pillar.fetch_remotes():
+                    changed = True
+            if changed:
+                salt.pillar.clear_shared_render_cache(self.opts)
         except Exception as exc:
             log.error('Exception caught while updating git_pillar',
                       exc_info=True)
@@ -1156,6 +1166,7 @@ class AESFuncs(object):
         self._file_find = self.fs_._find_file
         self._file_hash = self.fs_.file_hash
         self._file_hash_and_stat = self.fs_.file_hash_and_stat
+        self._file_manifest = self.fs_.file_manifest
         self._file_list = self.fs_.file_list
         self._file_list_emptydirs = self.fs_.file_list_emptydirs
         self._dir_list = self.fs_.dir_list
@@ -1404,6 +1415,36 @@ class AESFuncs(object):
         else:
             return self.masterapi._mine_flush(load, skip_verify=True)
 
+    def _serve_file_stream(self, load):
+        '''
+        Serve a whole file as a stream of chunks pushed over the connection of
+        the request, only supported by the TCP transport
+
+        :param dict load: Minion payload
+
+        :rtype: generator
+        :return: The chunks of the file, the last one carrying no data
+        '''
+        if self.opts.get('transport') != 'tcp':
+            return False
+        return self.fs_.serve_file_stream(load)
+
+    def _serve_files_stream(self, load):
+        '''
+        Serve the files of a batch which changed since the minion cached them,
+        as a stream of chunks pushed over the connection of the request, only
+        supported by the TCP transport
+
+        :param dict load: Minion payload
+
+        :rtype: generator
+        :return: The chunks of the changed files, the last item being the
+                 manifest of the whole batch
+        '''
+        if self.opts.get('transport') != 'tcp':
+            return False
+        return self.fs_.serve_files_stream(load)
+
     def _file_recv(self, load):
         '''
         Allows minions to send files to the master, files are sent to the
@@ -1514,10 +1555,11 @@ class AESFuncs(object):
         data = pillar.compile_pillar()
         self.fs_.update_opts()
         if self.opts.get('minion_data_cache', False):
+            minion_data = {'grains': load['grains'], 'pillar': data}
             self.masterapi.cache.store('minions/{0}'.format(load['id']),
                                        'data',
-                                       {'grains': load['grains'],
-                                        'pillar': data})
+                                       minion_data)
+            self.ckminions.update_data_index(load['id'], minion_data)
             if self.opts.get('minion_data_cache_events') is True:
                 self.event.fire_event({'Minion data cache refresh': load['id']}, tagify(load['id'], 'refresh', 'minion'))
         return data
@@ -1820,6 +1862,8 @@ class AESFuncs(object):
                 'returning False', func
             )
             return False, {'fun': 'send'}
+        if func in ('_serve_file_stream', '_serve_files_stream') and ret:
+            return ret, {'fun': 'send_stream'}
         # Don't encrypt the return value for the _return func
         # (we don't care about the return value, so why encrypt it?)
         if func == '_return':
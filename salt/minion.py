@@ -433,7 +433,7 @@ class MinionBase(object):
             log.error('Exception %s occurred in scheduled job', exc)
         return loop_interval
 
-    def process_beacons(self, functions):
+    def process_beacons(self, functions, ready_only=False):
         '''
         Evaluate all of the configured beacons, grab the config again in case
         the pillar or grains changed
@@ -441,7 +441,7 @@ class MinionBase(object):
         if 'config.merge' in functions:
             b_conf = functions['config.merge']('beacons', self.opts['beacons'], omit_opts=True)
             if b_conf:
-                return self.beacons.process(b_conf, self.opts['grains'])  # pylint: disable=no-member
+                return self.beacons.process(b_conf, self.opts['grains'], ready_only=ready_only)  # pylint: disable=no-member
         return []
 
     @tornado.gen.coroutine
@@ -1067,6 +1067,7 @@ class Minion(MinionBase):
 
         self._running = None
         self.win_proc = []
+        self.job_pool = None
         self.loaded_base_name = loaded_base_name
         self.connected = False
         self.restart = False
@@ -1449,6 +1450,15 @@ class Minion(MinionBase):
                 self.functions, self.returners, self.function_errors, self.executors = self._load_modules()
                 self.schedule.functions = self.functions
                 self.schedule.returners = self.returners
+                if self.job_pool is not None:
+                    self.job_pool.recycle()
+
+        job_pool = self._get_job_pool()
+        if job_pool is not None:
+            # The pool bounds the number of running jobs, queue the job
+            # instead of waiting for process_count_max
+            job_pool.dispatch(data)
+            return
 
         process_count_max = self.opts.get('process_count_max')
         if process_count_max > 0:
@@ -1495,6 +1505,24 @@ class Minion(MinionBase):
         else:
             self.win_proc.append(process)
 
+    def _get_job_pool(self):
+        '''
+        Return the pool of job workers, starting it on first use. Returns
+        None if the pool is disabled.
+        '''
+        if self.job_pool is None and self.opts.get('job_worker_pool_size', 0) > 0:
+            if not self.opts.get('multiprocessing', True) \
+                    or salt.utils.platform.is_windows():
+                # The workers are forked with the loaded modules
+                return None
+            log.debug('Starting %s job workers',
+                      self.opts['job_worker_pool_size'])
+            self.job_pool = salt.utils.minion.JobWorkerPool(
+                self,
+                self.opts['job_worker_pool_size'],
+                self.opts.get('job_worker_max_jobs', 0))
+        return self.job_pool
+
     def ctx(self):
         '''
         Return a single context manager for the minion's data
@@ -2087,13 +2115,21 @@ class Minion(MinionBase):
 
         self.schedule.functions = self.functions
         self.schedule.returners = self.returners
+        if self.job_pool is not None:
+            # The job workers have the previous modules loaded
+            self.job_pool.recycle()
 
     def beacons_refresh(self):
         '''
         Refresh the functions and returners.
         '''
         log.debug('Refreshing beacons.')
+        io_loop = self.beacons.io_loop
+        ready_callback = self.beacons.ready_callback
+        self.beacons.unwatch()
         self.beacons = salt.beacons.Beacon(self.opts, self.functions)
+        if io_loop is not None:
+            self.beacons.set_io_loop(io_loop, ready_callback)
 
     # TODO: only allow one future in flight at a time?
     @tornado.gen.coroutine
@@ -2446,6 +2482,10 @@ class Minion(MinionBase):
         # Add an extra fallback in case a forked process leaks through
         multiprocessing.active_children()
 
+        if self.job_pool is not None:
+            # Replace the exited job workers and run the queued jobs
+            self.job_pool.maintain()
+
         # Cleanup Windows threads
         if not salt.utils.platform.is_windows():
             return
@@ -2488,16 +2528,22 @@ class Minion(MinionBase):
         if 'beacons' not in self.periodic_callbacks:
             self.beacons = salt.beacons.Beacon(self.opts, self.functions)
 
-            def handle_beacons():
+            def handle_beacons(ready_only=False):
                 # Process Beacons
                 beacons = None
                 try:
-                    beacons = self.process_beacons(self.functions)
+                    beacons = self.process_beacons(self.functions,
+                                                   ready_only=ready_only)
                 except Exception:
                     log.critical('The beacon errored: ', exc_info=True)
                 if beacons and self.connected:
                     self._fire_master(events=beacons)
 
+            # The beacons able to tell when they have data are run as soon
+            # as their file descriptors are readable
+            self.beacons.set_io_loop(
+                self.io_loop, lambda: handle_beacons(ready_only=True))
+
 <<<<<<< HEAD
             new_periodic_callbacks['beacons'] = tornado.ioloop.PeriodicCallback(handle_beacons, loop_interval * 1000, io_loop=self.io_loop)
 =======
@@ -2720,6 +2766,9 @@ class Minion(MinionBase):
         if hasattr(self, 'periodic_callbacks'):
             for cb in six.itervalues(self.periodic_callbacks):
                 cb.stop()
+        if getattr(self, 'job_pool', None) is not None:
+            self.job_pool.stop()
+            self.job_pool = None
 
     def __del__(self):
         self.destroy()
@@ -42,6 +42,7 @@ import salt
 import salt.config
 import salt.client
 import salt.client.ssh.client
+import salt.loader
 import salt.payload
 import salt.runner
 import salt.state
@@ -52,6 +53,7 @@ import salt.utils.extmods
 import salt.utils.files
 import salt.utils.functools
 import salt.utils.minion
+import salt.utils.odict
 import salt.utils.path
 import salt.utils.process
 import salt.utils.url
@@ -389,6 +391,30 @@ def refresh_grains(**kwargs):
     return True
 
 
+def grains_timings():
+    '''
+    .. versionadded:: Fluorine
+
+    Return how long each grains function took, in seconds, the last time the
+    grains were loaded, and whether it returned, failed or timed out. The
+    slowest functions come first.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' saltutil.grains_timings
+    '''
+    cached = salt.loader._load_grain_funcs_cache(__opts__)
+    ret = salt.utils.odict.OrderedDict()
+    for key in sorted(cached,
+                      key=lambda x: cached[x].get('duration', 0),
+                      reverse=True):
+        ret[key] = {'duration': cached[key].get('duration'),
+                    'state': cached[key].get('state')}
+    return ret
+
+
 def sync_grains(saltenv=None, refresh=True, extmod_whitelist=None, extmod_blacklist=None):
     '''
     .. versionadded:: 0.10.0
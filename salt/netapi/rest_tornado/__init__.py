@@ -54,6 +54,7 @@ def get_application(opts):
         (r"/jobs/(.*)", saltnado.JobsSaltAPIHandler),
         (r"/jobs", saltnado.JobsSaltAPIHandler),
         (r"/run", saltnado.RunSaltAPIHandler),
+        (r"/stream", saltnado.StreamSaltAPIHandler),
         (r"/events", saltnado.EventsSaltAPIHandler),
         (r"/hook(/.*)?", saltnado.WebhookSaltAPIHandler),
     ]
@@ -247,6 +247,7 @@ import tornado.httpserver
 import tornado.ioloop
 import tornado.web
 import tornado.gen
+import tornado.queues
 from tornado.concurrent import Future
 <<<<<<< HEAD
 from zmq.eventloop import ioloop
@@ -266,6 +267,7 @@ import salt.ext.six as six
 import salt.netapi
 import salt.utils.args
 import salt.utils.event
+import salt.utils.jid
 import salt.utils.json
 import salt.utils.yaml
 <<<<<<< HEAD
@@ -369,6 +371,21 @@ class EventListener(object):
         # map of future -> timeout_callback
         self.timeout_map = {}
 
+        # (tag, matcher) -> list of queues, fed every matching event
+        self.queue_map = defaultdict(list)
+
+        # request_obj -> list of (tag, matcher, queue)
+        self.subscription_map = defaultdict(list)
+
+        # The (tag, matcher) keys are indexed so that an event is only
+        # checked against the keys it can match: the exact tags are looked
+        # up directly, the prefixes are stored in a trie, each node being a
+        # dict mapping the next character to the child node and None to
+        # True if a prefix ends at the node, and the keys with other
+        # matchers are all checked
+        self.prefix_trie = {}
+        self.matcher_keys = set()
+
         self.event.set_event_handler(self._handle_event_socket_recv)
 
     def clean_by_request(self, request):
@@ -387,6 +404,9 @@ class EventListener(object):
 
         del self.request_map[request]
 
+        for tag, matcher, queue in self.subscription_map.pop(request, ()):
+            self._remove_queue(tag, matcher, queue)
+
     @staticmethod
     def prefix_matcher(mtag, tag):
         if mtag is None or tag is None:
@@ -422,6 +442,7 @@ class EventListener(object):
                 tornado.ioloop.IOLoop.current().add_callback(callback, future)
             future.add_done_callback(handle_future)
         # add this tag and future to the callbacks
+        self._index(tag, matcher)
         self.tag_map[(tag, matcher)].append(future)
         self.request_map[request].append((tag, matcher, future))
 
@@ -442,48 +463,129 @@ class EventListener(object):
             self.tag_map[(tag, matcher)].remove(future)
         if len(self.tag_map[(tag, matcher)]) == 0:
             del self.tag_map[(tag, matcher)]
+            self._unindex(tag, matcher)
 
-    def _handle_event_socket_recv(self, raw):
+    def subscribe(self,
+                  request,
+                  tag='',
+                  matcher=prefix_matcher.__func__,
+                  ):
         '''
-        Callback for events on the event sub socket
+        Return a queue fed every event matching the tag, until the request
+        is done or ``unsubscribe`` is called. Unlike with ``get_event``, no
+        event is missed between two reads.
         '''
-        mtag, data = self.event.unpack(raw, self.event.serial)
+        queue = tornado.queues.Queue()
+        if request._finished:
+            return queue
+        self._index(tag, matcher)
+        self.queue_map[(tag, matcher)].append(queue)
+        self.subscription_map[request].append((tag, matcher, queue))
+        return queue
 
-        # see if we have any futures that need this info:
-        for (tag, matcher), futures in six.iteritems(self.tag_map):
+    def unsubscribe(self, request, queue):
+        '''
+        Stop feeding events to a queue returned by ``subscribe``
+        '''
+        for subscription in list(self.subscription_map.get(request, ())):
+            if subscription[2] is queue:
+                self.subscription_map[request].remove(subscription)
+                self._remove_queue(*subscription)
+        if not self.subscription_map.get(request, True):
+            del self.subscription_map[request]
+
+    def _remove_queue(self, tag, matcher, queue):
+        queues = self.queue_map.get((tag, matcher), [])
+        if queue in queues:
+            queues.remove(queue)
+        if not queues:
+            self.queue_map.pop((tag, matcher), None)
+            self._unindex(tag, matcher)
+
+    def _index(self, tag, matcher):
+        '''
+        Index a (tag, matcher) key before it is added
+        '''
+        if matcher is EventListener.exact_matcher:
+            return
+        if matcher is EventListener.prefix_matcher:
+            node = self.prefix_trie
+            for char in tag:
+                node = node.setdefault(char, {})
+            node[None] = True
+        else:
+            self.matcher_keys.add((tag, matcher))
+
+    def _unindex(self, tag, matcher):
+        '''
+        Drop a (tag, matcher) key from the index once it is no longer used
+        '''
+        if (tag, matcher) in self.tag_map or (tag, matcher) in self.queue_map:
+            return
+        if matcher is EventListener.exact_matcher:
+            return
+        if matcher is not EventListener.prefix_matcher:
+            self.matcher_keys.discard((tag, matcher))
+            return
+        path = [self.prefix_trie]
+        for char in tag:
+            node = path[-1].get(char)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].pop(None, None)
+        # Prune the nodes of the prefix which are no longer used
+        for depth in range(len(tag), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][tag[depth - 1]]
+
+    def _match_keys(self, mtag):
+        '''
+        Return the (tag, matcher) keys matching the tag of an event
+        '''
+        keys = []
+        key = (mtag, EventListener.exact_matcher)
+        if key in self.tag_map or key in self.queue_map:
+            keys.append(key)
+        node = self.prefix_trie
+        if None in node:
+            keys.append(('', EventListener.prefix_matcher))
+        for index, char in enumerate(mtag):
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                keys.append((mtag[:index + 1], EventListener.prefix_matcher))
+        for tag, matcher in self.matcher_keys:
             try:
                 is_matched = matcher(mtag, tag)
-<<<<<<< HEAD
-            except Exception as e:
-=======
             except Exception:
->>>>>>> upstream
                 log.error('Failed to run a matcher.', exc_info=True)
                 is_matched = False
+            if is_matched:
+                keys.append((tag, matcher))
+        return keys
 
-            if not is_matched:
-                continue
-<<<<<<< HEAD
-=======
+    def _handle_event_socket_recv(self, raw):
+        '''
+        Callback for events on the event sub socket
+        '''
+        mtag, data = self.event.unpack(raw, self.event.serial)
 
-            for future in futures:
+        # see if we have any futures that need this info:
+        for key in self._match_keys(mtag):
+            for future in list(self.tag_map.get(key, ())):
                 if future.done():
                     continue
                 future.set_result({'data': data, 'tag': mtag})
-                self.tag_map[(tag, matcher)].remove(future)
+                self.tag_map[key].remove(future)
                 if future in self.timeout_map:
                     tornado.ioloop.IOLoop.current().remove_timeout(self.timeout_map[future])
                     del self.timeout_map[future]
->>>>>>> upstream
 
-            for future in futures:
-                if future.done():
-                    continue
-                future.set_result({'data': data, 'tag': mtag})
-                self.tag_map[(tag, matcher)].remove(future)
-                if future in self.timeout_map:
-                    tornado.ioloop.IOLoop.current().remove_timeout(self.timeout_map[future])
-                    del self.timeout_map[future]
+            for queue in self.queue_map.get(key, ()):
+                queue.put_nowait({'data': data, 'tag': mtag})
 
 <<<<<<< HEAD
 
@@ -1670,6 +1772,110 @@ class RunSaltAPIHandler(SaltAPIHandler):  # pylint: disable=W0223
         self.disbatch()
 
 
+class StreamSaltAPIHandler(SaltAPIHandler):  # pylint: disable=W0223
+    '''
+    Endpoint streaming the returns of a job as they arrive
+    '''
+    @tornado.gen.coroutine
+    def post(self):
+        '''
+        Run a command and stream the return of each minion as it arrives
+
+        .. http:post:: /stream
+
+            A single ``local`` :term:`lowstate` must be sent in the request
+            body. The session token is used unless full Salt authentication
+            credentials are passed, like with :py:meth:`/run
+            <RunSaltAPIHandler.post>`.
+
+            The response is sent in chunks, one record per minion return:
+            one JSON object per line, or one YAML document per return.
+
+            :status 200: |200|
+            :status 400: |400|
+            :status 401: |401|
+            :status 406: |406|
+
+        **Example request:**
+
+        .. code-block:: bash
+
+            curl -NsS localhost:8000/stream \\
+                -H 'Accept: application/json' \\
+                -H 'X-Auth-Token: d40d1e1e' \\
+                -d client='local' \\
+                -d tgt='*' \\
+                -d fun='test.ping'
+
+        **Example response:**
+
+        .. code-block:: http
+
+            HTTP/1.1 200 OK
+            Transfer-Encoding: chunked
+            Content-Type: application/json
+
+            {"ms-1": true}
+            {"ms-0": true}
+        '''
+        if len(self.lowstate) != 1 or \
+                self.lowstate[0].get('client', 'local') != 'local':
+            self.send_error(400)
+            return
+        chunk = self.lowstate[0]
+        chunk['client'] = 'local'
+        if self.token is not None and 'token' not in chunk:
+            chunk['token'] = self.token
+        if not (('token' in chunk)
+                or ('username' in chunk and 'password' in chunk and 'eauth' in chunk)):
+            self.send_error(401)
+            return
+
+        # Subscribe the returns before firing the job, so that none is missed
+        chunk['jid'] = salt.utils.jid.gen_jid(self.application.opts)
+        tag = tagify([chunk['jid'], 'ret'], 'job') + '/'
+        returns = self.application.event_listener.subscribe(self, tag=tag)
+
+        f_call = self._format_call_run_job_async(chunk)
+        try:
+            pub_data = yield self.saltclients['local'](*f_call.get('args', ()), **f_call.get('kwargs', {}))
+        except (AuthenticationError, AuthorizationError, EauthAuthenticationError):
+            self.send_error(401)
+            return
+
+        self.set_header('Content-Type', self.content_type)
+        if 'jid' not in pub_data:
+            self.write(self.serialize({'return': 'No minions matched the target. '
+                                       'No command was sent, no jid was assigned.'}))
+            self.finish()
+            return
+
+        is_finished = Future()
+        job_not_running_future = self.job_not_running(pub_data['jid'],
+                                                      chunk['tgt'],
+                                                      f_call['kwargs']['tgt_type'],
+                                                      is_finished)
+        minions_remaining = set(pub_data['minions'])
+        while minions_remaining and not is_finished.done():
+            f = yield Any([returns.get(), is_finished])
+            if f is is_finished:
+                break
+            event = f.result()
+            minions_remaining.discard(event['data']['id'])
+            if self.content_type == 'application/x-yaml':
+                self.write('---\n')
+            self.write(self.dumper({event['data']['id']: event['data']['return']}))
+            self.write('\n')
+            # Wait for the record to be sent before handling the next one
+            yield self.flush()
+
+        if not is_finished.done():
+            is_finished.set_result(True)
+        yield job_not_running_future
+        self.application.event_listener.unsubscribe(self, returns)
+        self.finish()
+
+
 class EventsSaltAPIHandler(SaltAPIHandler):  # pylint: disable=W0223
     '''
     Expose the Salt event bus
@@ -7,9 +7,12 @@ Render the pillar data
 from __future__ import absolute_import, print_function, unicode_literals
 import copy
 import fnmatch
+import hashlib
 import os
 import collections
 import logging
+import pickle
+import time
 import tornado.gen
 import sys
 import traceback
@@ -20,12 +23,19 @@ import salt.loader
 import salt.fileclient
 import salt.minion
 import salt.crypt
+import salt.template
 import salt.transport
 import salt.utils.args
+import salt.utils.atomicfile
 import salt.utils.cache
 import salt.utils.crypt
 import salt.utils.data
 import salt.utils.dictupdate
+import salt.utils.files
+import salt.utils.hashutils
+import salt.utils.jinja
+import salt.utils.json
+import salt.utils.stringutils
 import salt.utils.url
 from salt.exceptions import SaltClientError
 from salt.template import compile_template
@@ -37,6 +47,7 @@ from salt.version import __version__
 from salt.utils.dictupdate import merge
 
 # Import 3rd-party libs
+import jinja2
 from salt.ext import six
 
 log = logging.getLogger(__name__)
@@ -85,6 +96,48 @@ def get_async_pillar(opts, grains, minion_id, saltenv=None, ext=None, funcs=None
                  extra_minion_data=extra_minion_data)
 
 
+# The renderers which only see the context passed to the pillar SLS files, see
+# Pillar._shared_render_key
+SHARED_RENDERERS = ('jinja', 'json', 'yaml', 'yamlex')
+
+# The context variables a pillar SLS file can read for its rendering to be
+# shared by all of the minions, besides the defaults passed by the includes
+SHARED_CONTEXT = frozenset((
+    'saltenv', 'sls', 'slspath', 'sls_path', 'slsdotpath', 'slscolonpath',
+    'tplpath', 'tplfile', 'tpldir', 'tpldot', 'odict', 'raise',
+    'range', 'dict', 'cycler', 'joiner', 'namespace',
+))
+
+# The jinja filters whose output is random or depends on the state of the
+# master at the time of the rendering
+UNSHARED_FILTERS = frozenset((
+    'date_format', 'dns_check', 'file_hashsum', 'gen_mac', 'get_uid',
+    'http_query', 'is_bin_file', 'is_empty', 'is_text_file', 'list_files',
+    'rand_str', 'random', 'random_hash', 'random_str', 'strftime', 'which',
+))
+
+
+def clear_shared_render_cache(opts):
+    '''
+    Remove the renderings of the pillar SLS files shared by the minions
+    '''
+    path = os.path.join(opts['cachedir'], 'pillar_shared')
+    if os.path.isdir(path):
+        log.debug('Clearing the shared pillar render cache')
+        salt.utils.files.rm_rf(path)
+
+
+def _fragment_digest(obj):
+    '''
+    Return the digest keying a pillar fragment in the cache
+    '''
+    return hashlib.sha256(
+        salt.utils.stringutils.to_bytes(
+            salt.utils.json.dumps(obj, sort_keys=True, default=repr)
+        )
+    ).hexdigest()
+
+
 class RemotePillarMixin(object):
     '''
     Common remote pillar functionality
@@ -389,6 +442,9 @@ class Pillar(object):
         if not isinstance(self.extra_minion_data, dict):
             self.extra_minion_data = {}
             log.error('Extra minion data must be a dictionary')
+        # The hash of the grains and pillar the SLS files are rendered with,
+        # see _sls_cache_key
+        self._sls_context = None
 
     def __valid_on_demand_ext_pillar(self, opts):
         '''
@@ -704,28 +760,53 @@ class Pillar(object):
                 # return state, mods, errors
                 return None, mods, errors
         state = None
-        try:
-            state = compile_template(fn_,
-                                     self.rend,
-                                     self.opts['renderer'],
-                                     self.opts['renderer_blacklist'],
-                                     self.opts['renderer_whitelist'],
-                                     saltenv,
-                                     sls,
-                                     _pillar_rend=True,
-                                     **defaults)
-        except Exception as exc:
-            msg = 'Rendering SLS \'{0}\' failed, render error:\n{1}'.format(
-                sls, exc
-            )
-            log.critical(msg, exc_info=True)
-            if self.opts.get('pillar_safe_render_error', True):
-                errors.append(
-                    'Rendering SLS \'{0}\' failed. Please see master log for '
-                    'details.'.format(sls)
+        cache_key = None
+        shared_key = self._shared_render_key(fn_, sls, saltenv, defaults)
+        if shared_key:
+            state = self._fragment_cache_get(
+                'shared', shared_key, 0, fn_, saltenv, sls, defaults)
+        if state is None:
+            cache_key = self._sls_cache_key(fn_, sls, saltenv, defaults)
+        if cache_key:
+            state = self._fragment_cache_get(
+                'sls', cache_key, self._sls_cache_ttl(),
+                saltenv, sls, defaults)
+        if state is None:
+            try:
+                with salt.utils.jinja.record_templates() as templates:
+                    state = compile_template(fn_,
+                                             self.rend,
+                                             self.opts['renderer'],
+                                             self.opts['renderer_blacklist'],
+                                             self.opts['renderer_whitelist'],
+                                             saltenv,
+                                             sls,
+                                             _pillar_rend=True,
+                                             **defaults)
+            except Exception as exc:
+                msg = 'Rendering SLS \'{0}\' failed, render error:\n{1}'.format(
+                    sls, exc
                 )
+                log.critical(msg, exc_info=True)
+                if self.opts.get('pillar_safe_render_error', True):
+                    errors.append(
+                        'Rendering SLS \'{0}\' failed. Please see master log for '
+                        'details.'.format(sls)
+                    )
+                else:
+                    errors.append(msg)
             else:
-                errors.append(msg)
+                if not isinstance(state, dict):
+                    pass
+                elif shared_key and self._is_shared_rendering(
+                        fn_, templates, defaults):
+                    self._fragment_cache_set(
+                        'shared', shared_key, state, templates,
+                        fn_, saltenv, sls, defaults)
+                elif cache_key:
+                    self._fragment_cache_set(
+                        'sls', cache_key, state, templates,
+                        saltenv, sls, defaults)
         mods.add(sls)
         nstate = None
         if state:
@@ -814,6 +895,8 @@ class Pillar(object):
         pillar = copy.copy(self.pillar_override)
         if errors is None:
             errors = []
+        # The pillar passed to the SLS files may have changed
+        self._sls_context = None
         for saltenv, pstates in six.iteritems(matches):
             pstatefiles = []
             mods = set()
@@ -857,6 +940,227 @@ class Pillar(object):
 
         return pillar, errors
 
+    def _sls_cache_ttl(self):
+        '''
+        Return the number of seconds the rendered pillar SLS files are cached
+        for, 0 for as long as their inputs do not change
+        '''
+        return self.opts.get('pillar_sls_cache_ttl', 0) or 0
+
+    def _sls_cache_key(self, fn_, sls, saltenv, defaults):
+        '''
+        Return the key of the cached rendering of a pillar SLS file. The key
+        covers the SLS file, the minion, its grains, the pillar passed to the
+        SLS files and the renderer settings.
+
+        Returns None if the cache is disabled or cannot be used.
+        '''
+        if not self.opts.get('pillar_sls_cache', False) or not fn_:
+            return None
+        if self._sls_context is None:
+            try:
+                self._sls_context = _fragment_digest(
+                    [self.minion_id,
+                     self.opts.get('grains', {}),
+                     self.opts.get('pillar', {}),
+                     self.opts['renderer'],
+                     self.opts['renderer_blacklist'],
+                     self.opts['renderer_whitelist']])
+            except (TypeError, ValueError) as exc:
+                log.debug('Disabling the pillar SLS cache, the grains and '
+                          'pillar cannot be hashed: %s', exc)
+                self._sls_context = ''
+        if not self._sls_context:
+            return None
+        try:
+            return _fragment_digest(
+                [saltenv, sls, defaults, self._sls_context,
+                 salt.utils.hashutils.get_hash(fn_)])
+        except (IOError, OSError, TypeError, ValueError):
+            return None
+
+    def _jinja_env_args(self):
+        '''
+        Return the jinja environment settings of the pillar SLS files
+        '''
+        env_args = {}
+        jinja_sls_env = self.opts.get('jinja_sls_env') or {}
+        if isinstance(jinja_sls_env, dict):
+            for key, val in six.iteritems(jinja_sls_env):
+                if hasattr(jinja2.defaults, key.upper()):
+                    env_args[key.lower()] = val
+        return env_args
+
+    def _shared_render_key(self, fn_, sls, saltenv, defaults):
+        '''
+        Return the key of the rendering of a pillar SLS file shared by all of
+        the minions. The key covers the SLS file and the renderer settings but
+        no minion data, so the templates the rendering was made from are
+        checked with _is_shared_rendering before it is shared.
+
+        Returns None if the shared cache is disabled or if the SLS file is
+        not rendered with renderers that only read their context.
+        '''
+        if not self.opts.get('pillar_shared_render_cache', False) or not fn_:
+            return None
+        try:
+            with salt.utils.files.fopen(fn_, 'r') as ifile:
+                line = salt.utils.stringutils.to_unicode(ifile.readline())
+            if line.startswith('#!') and not line.startswith('#!/'):
+                pipestr = line.strip()[2:]
+            else:
+                pipestr = self.opts['renderer']
+            pipestr = salt.template.OLD_STYLE_RENDERERS.get(pipestr, pipestr)
+            for part in pipestr.split('|'):
+                if part.strip().split(' ', 1)[0] not in SHARED_RENDERERS:
+                    return None
+            return _fragment_digest(
+                [fn_, saltenv, sls, defaults,
+                 self.opts['renderer'],
+                 self.opts['renderer_blacklist'],
+                 self.opts['renderer_whitelist'],
+                 self.opts.get('allow_undefined', False),
+                 self._jinja_env_args(),
+                 salt.utils.hashutils.get_hash(fn_)])
+        except (IOError, OSError, TypeError, ValueError):
+            return None
+
+    def _is_shared_rendering(self, fn_, templates, defaults):
+        '''
+        Return whether the templates a pillar SLS file was rendered from read
+        no grains, pillar, opts or execution modules and use no filter with a
+        random or host dependent output, so that the rendering can be shared
+        by all of the minions
+        '''
+        allowed = SHARED_CONTEXT.union(defaults)
+        env_args = self._jinja_env_args()
+        paths = [fn_]
+        for template_env, template in OrderedDict.fromkeys(templates):
+            paths.append(self.client.cache_file(
+                salt.utils.url.create(template), template_env))
+        for path in paths:
+            if not path:
+                return False
+            try:
+                with salt.utils.files.fopen(path, 'rb') as ifile:
+                    source = salt.utils.stringutils.to_unicode(ifile.read())
+            except (IOError, OSError, UnicodeDecodeError):
+                return False
+            names = salt.utils.jinja.find_context_names(source, **env_args)
+            if names is None:
+                return False
+            variables, filters = names
+            if variables - allowed or filters & UNSHARED_FILTERS:
+                log.trace('The rendering of %s reads %s and cannot be '
+                          'shared', path, sorted(variables - allowed) or
+                          sorted(filters & UNSHARED_FILTERS))
+                return False
+        return True
+
+    def _ext_pillar_cache_key(self, key, val, pillar):
+        '''
+        Return the key of the cached data of an external pillar, or None if
+        it is not cached. The key covers the minion, the configuration of the
+        external pillar and the pillar passed to it.
+        '''
+        if not self._ext_pillar_cache_ttl(key):
+            return None
+        try:
+            return _fragment_digest(
+                [self.minion_id, key, val, pillar, self.extra_minion_data])
+        except (TypeError, ValueError) as exc:
+            log.debug('Not caching ext_pillar %s, its input cannot be '
+                      'hashed: %s', key, exc)
+            return None
+
+    def _ext_pillar_cache_ttl(self, key):
+        '''
+        Return the number of seconds the data of an external pillar is cached
+        for, 0 if it is not cached
+        '''
+        ttls = self.opts.get('ext_pillar_cache_ttl') or {}
+        if not isinstance(ttls, dict):
+            return 0
+        return ttls.get(key, 0) or 0
+
+    def _fragment_cache_path(self, kind, *names):
+        '''
+        Return the path of a pillar fragment of the minion in the cache, or of
+        a rendering shared by all of the minions
+        '''
+        if kind == 'shared':
+            return os.path.join(
+                self.opts['cachedir'],
+                'pillar_shared',
+                '{0}.p'.format(_fragment_digest(names)))
+        return os.path.join(
+            self.opts['cachedir'],
+            'pillar_fragments',
+            self.minion_id,
+            kind,
+            '{0}.p'.format(_fragment_digest(names)))
+
+    def _template_hash(self, template, saltenv):
+        '''
+        Return the hash of a template loaded while rendering a pillar SLS
+        file, or None if it is not available
+        '''
+        dest = self.client.cache_file(salt.utils.url.create(template), saltenv)
+        if not dest:
+            return None
+        try:
+            return salt.utils.hashutils.get_hash(dest)
+        except (IOError, OSError):
+            return None
+
+    def _fragment_cache_get(self, kind, key, ttl, *names):
+        '''
+        Return a cached pillar fragment, or None if there is none, if it
+        expired or if one of the templates it was rendered from changed
+        '''
+        try:
+            with salt.utils.files.fopen(
+                    self._fragment_cache_path(kind, *names), 'rb') as fp_:
+                entry = pickle.load(fp_)
+        except (IOError, OSError):
+            return None
+        except Exception as exc:
+            log.debug('Could not read the cached pillar fragment %s: %s',
+                      names, exc)
+            return None
+        if entry.get('key') != key:
+            return None
+        if ttl and time.time() - entry.get('time', 0) > ttl:
+            return None
+        for template_env, template, template_hash in entry['templates']:
+            if self._template_hash(template, template_env) != template_hash:
+                return None
+        log.debug('Using the cached pillar %s fragment %s for minion %s',
+                  kind, names, self.minion_id)
+        return entry['data']
+
+    def _fragment_cache_set(self, kind, key, data, templates, *names):
+        '''
+        Cache a pillar fragment along with the hashes of the templates it was
+        rendered from
+        '''
+        entry = {'key': key, 'time': time.time(), 'templates': [], 'data': data}
+        for template_env, template in OrderedDict.fromkeys(templates):
+            template_hash = self._template_hash(template, template_env)
+            if template_hash is None:
+                return
+            entry['templates'].append((template_env, template, template_hash))
+        path = self._fragment_cache_path(kind, *names)
+        try:
+            with salt.utils.files.set_umask(0o077):
+                if not os.path.isdir(os.path.dirname(path)):
+                    os.makedirs(os.path.dirname(path))
+                with salt.utils.atomicfile.atomic_open(path, 'wb') as fp_:
+                    pickle.dump(entry, fp_, 2)
+        except Exception as exc:
+            log.debug('Could not cache the pillar fragment %s: %s',
+                      names, exc)
+
     def _external_pillar_data(self, pillar, val, key):
         '''
         Builds actual pillar data structure and updates the ``pillar`` variable
@@ -934,7 +1238,7 @@ class Pillar(object):
                 self.opts.get('renderer', 'yaml'),
                 self.opts.get('pillar_merge_lists', False))
 
-        for run in self.opts['ext_pillar']:
+        for index, run in enumerate(self.opts['ext_pillar']):
             if not isinstance(run, dict):
                 errors.append('The "ext_pillar" option is malformed')
                 log.critical(errors[-1])
@@ -948,10 +1252,20 @@ class Pillar(object):
                         key
                     )
                     continue
+                cache_key = self._ext_pillar_cache_key(key, val, pillar)
+                if cache_key:
+                    ext = self._fragment_cache_get(
+                        'ext', cache_key, self._ext_pillar_cache_ttl(key),
+                        index, key)
+                    if ext is not None:
+                        continue
                 try:
                     ext = self._external_pillar_data(pillar,
                                                      val,
                                                      key)
+                    if cache_key:
+                        self._fragment_cache_set(
+                            'ext', cache_key, ext, [], index, key)
                 except Exception as exc:
                     errors.append(
                         'Failed to load ext_pillar {0}: {1}'.format(
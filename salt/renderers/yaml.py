@@ -16,7 +16,7 @@ from yaml.constructor import ConstructorError
 
 # Import salt libs
 import salt.utils.url
-from salt.utils.yamlloader import SaltYamlSafeLoader, load
+from salt.utils.yamlloader import SaltYamlSafeLoader, fast_load
 from salt.utils.odict import OrderedDict
 from salt.exceptions import SaltRenderError
 from salt.ext import six
@@ -50,7 +50,7 @@ def render(yaml_data, saltenv='base', sls='', argline='', **kws):
         yaml_data = yaml_data.read()
     with warnings.catch_warnings(record=True) as warn_list:
         try:
-            data = load(yaml_data, Loader=get_yaml_loader(argline))
+            data = fast_load(yaml_data, dictclass=OrderedDict)
         except ScannerError as exc:
             err_type = _ERROR_MAP.get(exc.problem, exc.problem)
             line_num = exc.problem_mark.line + 1
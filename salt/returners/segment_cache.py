@@ -0,0 +1,521 @@
+# -*- coding: utf-8 -*-
+'''
+Return data to a local job cache made of time-bucketed, append-only segment
+files
+
+.. versionadded:: Fluorine
+
+The :mod:`local_cache <salt.returners.local_cache>` job cache creates a
+directory per job and another one per returning minion, so a busy master ends
+up with a huge tree of small files to walk when cleaning or listing jobs.
+This job cache instead appends the load, the minion list and the returns of
+all of the jobs started within the same time bucket to a single segment file.
+Each segment comes with a compact index of the records of its jobs, and old
+jobs are expired by unlinking whole segments.
+
+To use it as the master job cache, set the following in the master config:
+
+.. code-block:: yaml
+
+    master_job_cache: segment_cache
+
+Segments span one hour by default. This can be changed with the
+``segment_cache_interval`` option, in seconds:
+
+.. code-block:: yaml
+
+    segment_cache_interval: 3600
+
+A segment is removed once all of the jobs it can hold are older than
+:conf_master:`keep_jobs` hours.
+'''
+from __future__ import absolute_import, print_function, unicode_literals
+
+# Import python libs
+import bisect
+import logging
+import os
+import struct
+import time
+
+# Import salt libs
+import salt.payload
+import salt.utils.files
+import salt.utils.jid
+import salt.utils.minions
+import salt.exceptions
+
+# Import 3rd-party libs
+from salt.ext import six
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    # fcntl is not available on windows
+    HAS_FCNTL = False
+
+log = logging.getLogger(__name__)
+
+# the segment files hold the serialized records of the jobs
+SEGMENT_EXT = '.seg'
+# the index files hold a [jid, kind, minion, offset, size] entry per record
+INDEX_EXT = '.idx'
+# records are prefixed with their size in the index files
+HEADER = struct.Struct(str('>I'))
+
+# The indexes of the segments read by this process, by segment start time
+_INDEXES = {}
+
+
+class _SegmentIndex(object):
+    '''
+    The index of a segment, mapping each job id to the list of the
+    ``(kind, minion, offset, size)`` entries of its records. The index file is
+    read incrementally as records are appended to it.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.ino = None
+        self.pos = 0
+        self.jobs = {}
+
+    def refresh(self, serial):
+        '''
+        Read the entries appended to the index file since the last refresh
+        '''
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self.ino = None
+            self.pos = 0
+            self.jobs = {}
+            return
+        if stat.st_ino != self.ino or stat.st_size < self.pos:
+            # The segment was expired and created again
+            self.ino = stat.st_ino
+            self.pos = 0
+            self.jobs = {}
+        if stat.st_size == self.pos:
+            return
+        with salt.utils.files.fopen(self.path, 'rb') as ifile:
+            ifile.seek(self.pos)
+            data = ifile.read(stat.st_size - self.pos)
+        pos = 0
+        while pos + HEADER.size <= len(data):
+            size = HEADER.unpack_from(data, pos)[0]
+            if pos + HEADER.size + size > len(data):
+                # The entry is still being written
+                break
+            entry = serial.loads(data[pos + HEADER.size:pos + HEADER.size + size])
+            pos += HEADER.size + size
+            try:
+                jid, kind, minion, offset, rsize = entry
+            except (TypeError, ValueError):
+                log.error('Skipping corrupted entry in %s', self.path)
+                continue
+            self.jobs.setdefault(jid, []).append((kind, minion, offset, rsize))
+        self.pos += pos
+
+
+def _job_dir():
+    '''
+    Return root of the segments directory
+    '''
+    return os.path.join(__opts__['cachedir'], 'job_segments')
+
+
+def _interval():
+    '''
+    Return the time span of a segment, in seconds
+    '''
+    return max(int(__opts__.get('segment_cache_interval', 3600)), 1)
+
+
+def _segment_path(start, ext=SEGMENT_EXT):
+    return os.path.join(_job_dir(), '{0}{1}'.format(start, ext))
+
+
+def _segments():
+    '''
+    Return the sorted start times of the segments on disk
+    '''
+    try:
+        names = os.listdir(_job_dir())
+    except OSError:
+        return []
+    ret = []
+    for name in names:
+        start, ext = os.path.splitext(name)
+        if ext == SEGMENT_EXT and start.isdigit():
+            ret.append(int(start))
+    return sorted(ret)
+
+
+def _index(start, serial):
+    '''
+    Return the refreshed index of a segment
+    '''
+    if start not in _INDEXES:
+        _INDEXES[start] = _SegmentIndex(_segment_path(start, INDEX_EXT))
+    _INDEXES[start].refresh(serial)
+    return _INDEXES[start]
+
+
+def _jid_segment(jid, serial):
+    '''
+    Return the start time of the segment holding a job. This is read from the
+    job id when it is a timestamp, otherwise the segments are searched and the
+    job falls in the current segment if none holds it yet.
+    '''
+    if salt.utils.jid.is_jid(jid):
+        try:
+            stamp = int(time.mktime(time.strptime(jid[:14], '%Y%m%d%H%M%S')))
+            return stamp - stamp % _interval()
+        except (ValueError, OverflowError):
+            pass
+    for start in reversed(_segments()):
+        if jid in _index(start, serial).jobs:
+            return start
+    now = int(time.time())
+    return now - now % _interval()
+
+
+def _append(jid, kind, data, serial, minion=None, check=None):
+    '''
+    Append a record to the segment of a job and add it to the index of the
+    segment. The ``check`` function is passed the index entries of the job
+    while the segment is locked, and the record is only appended if it returns
+    True. Return whether the record was appended.
+    '''
+    start = _jid_segment(jid, serial)
+    try:
+        os.makedirs(_job_dir())
+    except OSError:
+        if not os.path.isdir(_job_dir()):
+            raise
+    record = serial.dumps(data)
+    with salt.utils.files.fopen(_segment_path(start), 'ab') as sfile:
+        if HAS_FCNTL:
+            fcntl.flock(sfile.fileno(), fcntl.LOCK_EX)
+        try:
+            if check is not None:
+                entries = _index(start, serial).jobs.get(jid, [])
+                if not check(entries):
+                    return False
+            sfile.seek(0, os.SEEK_END)
+            offset = sfile.tell()
+            sfile.write(record)
+            sfile.flush()
+            entry = serial.dumps([jid, kind, minion, offset, len(record)])
+            with salt.utils.files.fopen(
+                    _segment_path(start, INDEX_EXT), 'ab') as ifile:
+                ifile.write(HEADER.pack(len(entry)) + entry)
+        finally:
+            if HAS_FCNTL:
+                fcntl.flock(sfile.fileno(), fcntl.LOCK_UN)
+    return True
+
+
+def _read(start, entries, serial):
+    '''
+    Generate the ``(kind, minion, data)`` records of the given index entries
+    '''
+    try:
+        sfile = salt.utils.files.fopen(_segment_path(start), 'rb')  # pylint: disable=resource-leakage
+    except (IOError, OSError):
+        return
+    with sfile:
+        for kind, minion, offset, size in entries:
+            sfile.seek(offset)
+            try:
+                data = serial.loads(sfile.read(size))
+            except Exception:
+                log.exception(
+                    'Failed to deserialize the %s record at %s of %s',
+                    kind, offset, sfile.name
+                )
+                continue
+            yield kind, minion, data
+
+
+def _job(jid, kinds, serial):
+    '''
+    Return the start time of the segment of a job and the index entries of the
+    job matching the given kinds
+    '''
+    start = _jid_segment(jid, serial)
+    entries = _index(start, serial).jobs.get(jid, [])
+    return start, [entry for entry in entries if entry[0] in kinds]
+
+
+def _walk_through(serial):
+    '''
+    Walk through the segments and generate the job id and load of each job
+    '''
+    for start in _segments():
+        entries = {}
+        for jid, job_entries in six.iteritems(_index(start, serial).jobs):
+            for entry in job_entries:
+                if entry[0] == 'load':
+                    entries[jid] = entry
+        for _, _, data in _read(start, sorted(entries.values(),
+                                             key=lambda x: x[2]), serial):
+            if isinstance(data, dict) and 'jid' in data:
+                yield data['jid'], data
+
+
+def prep_jid(nocache=False, passed_jid=None, recurse_count=0):
+    '''
+    Return a job id and record it in the segment of the job
+
+    This is the function responsible for making sure jids don't collide (unless
+    it is passed a jid).
+    '''
+    if recurse_count >= 5:
+        err = 'prep_jid could not store a jid after {0} tries.'.format(recurse_count)
+        log.error(err)
+        raise salt.exceptions.SaltCacheError(err)
+    if passed_jid is None:  # this can be a None or an empty string.
+        jid = salt.utils.jid.gen_jid(__opts__)
+    else:
+        jid = passed_jid
+
+    def _check(entries):
+        return not any(entry[0] in ('jid', 'nocache') for entry in entries)
+
+    serial = salt.payload.Serial(__opts__)
+    try:
+        stored = _append(jid, 'nocache' if nocache else 'jid', jid, serial,
+                         check=_check)
+    except (IOError, OSError) as exc:
+        log.warning('Could not write out jid for job %s: %s', jid, exc)
+        time.sleep(0.1)
+        return prep_jid(passed_jid=passed_jid, nocache=nocache,
+                        recurse_count=recurse_count+1)
+    if not stored and passed_jid is None:
+        # Someone else is using this jid, we need a new one
+        time.sleep(0.001)
+        return prep_jid(nocache=nocache, recurse_count=recurse_count+1)
+    return jid
+
+
+def returner(load):
+    '''
+    Return data to the segment job cache
+    '''
+    serial = salt.payload.Serial(__opts__)
+
+    # if a minion is returning a standalone job, get a jobid
+    if load['jid'] == 'req':
+        load['jid'] = prep_jid(nocache=load.get('nocache', False))
+
+    state = {}
+
+    def _check(entries):
+        for kind, minion, _, _ in entries:
+            if kind == 'nocache':
+                state['nocache'] = True
+                return False
+            if kind == 'return' and minion == load['id']:
+                return False
+        return True
+
+    ret = dict((key, load[key]) for key in ['return', 'retcode', 'success', 'out'] if key in load)
+    if not _append(load['jid'], 'return', ret, serial, minion=load['id'],
+                   check=_check):
+        if state.get('nocache'):
+            return
+        # Minion has already returned this jid and it should be dropped
+        log.error(
+            'An extra return was detected from minion %s, please verify '
+            'the minion, this could be a replay attack', load['id']
+        )
+        return False
+
+
+def save_load(jid, clear_load, minions=None, recurse_count=0):
+    '''
+    Save the load to the specified jid
+
+    minions argument is to provide a pre-computed list of matched minions for
+    the job, for cases when this function can't compute that list itself (such
+    as for salt-ssh)
+    '''
+    if recurse_count >= 5:
+        err = ('save_load could not write job cache file after {0} retries.'
+               .format(recurse_count))
+        log.error(err)
+        raise salt.exceptions.SaltCacheError(err)
+
+    serial = salt.payload.Serial(__opts__)
+    try:
+        _append(jid, 'load', clear_load, serial)
+    except (IOError, OSError) as exc:
+        log.warning(
+            'Could not write job invocation cache file: %s', exc
+        )
+        time.sleep(0.1)
+        return save_load(jid=jid, clear_load=clear_load,
+                         recurse_count=recurse_count+1)
+
+    # if you have a tgt, save that for the UI etc
+    if 'tgt' in clear_load and clear_load['tgt'] != '':
+        if minions is None:
+            ckminions = salt.utils.minions.CkMinions(__opts__)
+            # Retrieve the minions list
+            _res = ckminions.check_minions(
+                    clear_load['tgt'],
+                    clear_load.get('tgt_type', 'glob')
+                    )
+            minions = _res['minions']
+        # save the minions to a cache so we can see in the UI
+        save_minions(jid, minions)
+
+
+def save_minions(jid, minions, syndic_id=None):
+    '''
+    Save/update the list of minions for a given job
+    '''
+    # Ensure we have a list for Python 3 compatability
+    minions = list(minions)
+
+    log.debug(
+        'Adding minions for job %s%s: %s',
+        jid,
+        ' from syndic master \'{0}\''.format(syndic_id) if syndic_id else '',
+        minions
+    )
+    serial = salt.payload.Serial(__opts__)
+    try:
+        _append(jid, 'minions', minions, serial, minion=syndic_id)
+    except (IOError, OSError) as exc:
+        log.error(
+            'Failed to write minion list %s of job %s to the job cache: %s',
+            minions, jid, exc
+        )
+
+
+def get_load(jid):
+    '''
+    Return the load data that marks a specified jid
+    '''
+    serial = salt.payload.Serial(__opts__)
+    start, entries = _job(jid, ('load', 'minions'), serial)
+    ret = {}
+    # The latest minion list of the master and of each syndic master
+    minion_lists = {}
+    for kind, syndic_id, data in _read(start, entries, serial):
+        if kind == 'load':
+            ret = data or {}
+        else:
+            minion_lists[syndic_id] = data
+    if not ret:
+        return {}
+
+    all_minions = set()
+    for minions in six.itervalues(minion_lists):
+        all_minions.update(minions)
+    if all_minions:
+        ret['Minions'] = sorted(all_minions)
+
+    return ret
+
+
+def get_jid(jid):
+    '''
+    Return the information returned when the specified job id was executed
+    '''
+    serial = salt.payload.Serial(__opts__)
+    start, entries = _job(jid, ('return',), serial)
+    ret = {}
+    for _, minion, data in _read(start, entries, serial):
+        ret[minion] = data
+    return ret
+
+
+def get_jids():
+    '''
+    Return a dict mapping all job ids to job information
+    '''
+    serial = salt.payload.Serial(__opts__)
+    ret = {}
+    for jid, job in _walk_through(serial):
+        ret[jid] = salt.utils.jid.format_jid_instance(jid, job)
+
+        if __opts__.get('job_cache_store_endtime'):
+            endtime = get_endtime(jid)
+            if endtime:
+                ret[jid]['EndTime'] = endtime
+
+    return ret
+
+
+def get_jids_filter(count, filter_find_job=True):
+    '''
+    Return a list of all jobs information filtered by the given criteria.
+    :param int count: show not more than the count of most recent jobs
+    :param bool filter_find_jobs: filter out 'saltutil.find_job' jobs
+    '''
+    serial = salt.payload.Serial(__opts__)
+    keys = []
+    ret = []
+    for jid, job in _walk_through(serial):
+        job = salt.utils.jid.format_jid_instance_ext(jid, job)
+        if filter_find_job and job['Function'] == 'saltutil.find_job':
+            continue
+        i = bisect.bisect(keys, jid)
+        if len(keys) == count and i == 0:
+            continue
+        keys.insert(i, jid)
+        ret.insert(i, job)
+        if len(keys) > count:
+            del keys[0]
+            del ret[0]
+    return ret
+
+
+def clean_old_jobs():
+    '''
+    Unlink the segments whose jobs are all older than keep_jobs
+    '''
+    if __opts__['keep_jobs'] != 0:
+        cutoff = time.time() - __opts__['keep_jobs'] * 3600
+        for start in _segments():
+            if start + _interval() > cutoff:
+                break
+            for ext in (SEGMENT_EXT, INDEX_EXT):
+                try:
+                    os.remove(_segment_path(start, ext))
+                except OSError as exc:
+                    if os.path.exists(_segment_path(start, ext)):
+                        log.error(
+                            'Failed to remove expired job cache segment '
+                            '%s: %s', _segment_path(start, ext), exc
+                        )
+            _INDEXES.pop(start, None)
+
+
+def update_endtime(jid, time):
+    '''
+    Update (or store) the end time for a given job
+    '''
+    serial = salt.payload.Serial(__opts__)
+    try:
+        _append(jid, 'endtime', time, serial)
+    except (IOError, OSError) as exc:
+        log.warning('Could not write job invocation cache file: %s', exc)
+
+
+def get_endtime(jid):
+    '''
+    Retrieve the stored endtime for a given job
+
+    Returns False if no endtime is present
+    '''
+    serial = salt.payload.Serial(__opts__)
+    start, entries = _job(jid, ('endtime',), serial)
+    endtime = False
+    for _, _, data in _read(start, entries[-1:], serial):
+        endtime = data
+    return endtime
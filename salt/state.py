@@ -19,8 +19,11 @@ import sys
 import copy
 import site
 import fnmatch
+import hashlib
 import logging
 import datetime
+import multiprocessing
+import pickle
 import traceback
 import re
 import time
@@ -32,14 +35,19 @@ import salt.minion
 import salt.pillar
 import salt.fileclient
 import salt.utils.args
+import salt.utils.atomicfile
 import salt.utils.crypt
 import salt.utils.decorators.state
 import salt.utils.dictupdate
 import salt.utils.event
 import salt.utils.files
+import salt.utils.hashutils
 import salt.utils.immutabletypes as immutabletypes
+import salt.utils.jinja
+import salt.utils.json
 import salt.utils.platform
 import salt.utils.process
+import salt.utils.stringutils
 import salt.utils.url
 import salt.syspaths as syspaths
 from salt.serializers.msgpack import serialize as msgpack_serialize, deserialize as msgpack_deserialize
@@ -353,6 +361,64 @@ class StateError(Exception):
     pass
 
 
+class ChunkIndex(object):
+    '''
+    An index of the low chunks of a state run by name, ID and SLS, to
+    resolve requisites without scanning all of the chunks for each of them
+    '''
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.size = len(chunks)
+        self._positions = {}
+        self._fields = {'name': {}, '__id__': {}, '__sls__': {}}
+        self._matches = {}
+        # Non string values can only be matched by scanning the chunks
+        self._exact = True
+        for pos, chunk in enumerate(chunks):
+            self._positions[id(chunk)] = pos
+            for field, index in six.iteritems(self._fields):
+                value = chunk.get(field)
+                if not isinstance(value, six.string_types):
+                    self._exact = False
+                    continue
+                index.setdefault(os.path.normcase(value), []).append(chunk)
+
+    def is_current(self, chunks):
+        '''
+        Return True if the index covers the given list of chunks
+        '''
+        return chunks is self.chunks and len(chunks) == self.size
+
+    def match(self, req_key, req_val):
+        '''
+        Return the chunks matched by a requisite, in the order of the chunks.
+        ``req_key`` is ``sls``, ``id`` or the state module of the requisite
+        and ``req_val`` is matched as a glob.
+        '''
+        key = (req_key, req_val)
+        if key in self._matches:
+            return self._matches[key]
+        fields = ('__sls__',) if req_key == 'sls' else ('name', '__id__')
+        if self._exact and isinstance(req_val, six.string_types) \
+                and not any(char in req_val for char in '*?['):
+            # Without wildcards, fnmatch only matches the same value
+            found = {}
+            for field in fields:
+                for chunk in self._fields[field].get(
+                        os.path.normcase(req_val), ()):
+                    found[id(chunk)] = chunk
+            matched = [found[pos] for pos in sorted(
+                found, key=lambda chunk_id: self._positions[chunk_id])]
+        else:
+            matched = [chunk for chunk in self.chunks
+                       if any(fnmatch.fnmatch(chunk[field], req_val)
+                              for field in fields)]
+        if req_key not in ('sls', 'id'):
+            matched = [chunk for chunk in matched if chunk['state'] == req_key]
+        self._matches[key] = matched
+        return matched
+
+
 class Compiler(object):
     '''
     Class used to compile and manage the High Data structure
@@ -739,6 +805,9 @@ class State(object):
         self.active = set()
         self.mod_init = set()
         self.pre = {}
+        self._chunk_index = None
+        # The number of parallel states not reconciled yet
+        self._running_procs = 0
         self.__run_num = 0
         self.jid = jid
         self.instance_id = six.text_type(id(self))
@@ -1781,6 +1850,7 @@ class State(object):
                 target=self._call_parallel_target,
                 args=(name, cdata, low))
         proc.start()
+        self._running_procs += 1
         ret = {'name': name,
                 'result': None,
                 'changes': {},
@@ -2204,6 +2274,9 @@ class State(object):
         '''
         Check the running dict for processes and resolve them
         '''
+        if not self._running_procs:
+            # There is no process to resolve, do not scan the running dict
+            return True
         retset = set()
         for tag in running:
             proc = running[tag].get('proc')
@@ -2225,10 +2298,20 @@ class State(object):
                                'changes': {}}
                     running[tag].update(ret)
                     running[tag].pop('proc')
+                    self._running_procs -= 1
                 else:
                     retset.add(False)
         return False not in retset
 
+    def _get_chunk_index(self, chunks):
+        '''
+        Return the ChunkIndex of the given list of chunks
+        '''
+        if self._chunk_index is None \
+                or not self._chunk_index.is_current(chunks):
+            self._chunk_index = ChunkIndex(chunks)
+        return self._chunk_index
+
     def check_requisite(self, low, running, chunks, pre=False):
         '''
         Look into the running data to check the status of all requisite
@@ -2283,46 +2366,36 @@ class State(object):
                 'onchanges_any': []}
         if pre:
             reqs['prerequired'] = []
+        index = self._get_chunk_index(chunks)
         for r_state in reqs:
             if r_state in low and low[r_state] is not None:
                 for req in low[r_state]:
                     if isinstance(req, six.string_types):
                         req = {'id': req}
                     req = trim_req(req)
-                    found = False
-                    for chunk in chunks:
+                    found = []
+                    if chunks:
                         req_key = next(iter(req))
                         req_val = req[req_key]
-                        if req_val is None:
-                            continue
-                        if req_key == 'sls':
-                            # Allow requisite tracking of entire sls files
-                            if fnmatch.fnmatch(chunk['__sls__'], req_val):
-                                found = True
-                                reqs[r_state].append(chunk)
-                            continue
+                    if not chunks or req_val is None:
+                        pass
+                    elif req_key == 'sls':
+                        # Allow requisite tracking of entire sls files
+                        found = index.match(req_key, req_val)
+                    elif not isinstance(req_val, six.string_types):
+                        raise SaltRenderError(
+                            'Could not locate requisite of [{0}] present in state with name [{1}]'.format(
+                                req_key, chunks[0]['name']))
+                    else:
                         try:
-                            if isinstance(req_val, six.string_types):
-                                if (fnmatch.fnmatch(chunk['name'], req_val) or
-                                    fnmatch.fnmatch(chunk['__id__'], req_val)):
-                                    if req_key == 'id' or chunk['state'] == req_key:
-                                        found = True
-                                        reqs[r_state].append(chunk)
-                            else:
-                                raise KeyError
-                        except KeyError as exc:
-                            raise SaltRenderError(
-                                'Could not locate requisite of [{0}] present in state with name [{1}]'.format(
-                                    req_key, chunk['name']))
-                        except TypeError:
-                            # On Python 2, the above req_val, being an OrderedDict, will raise a KeyError,
-                            # however on Python 3 it will raise a TypeError
-                            # This was found when running tests.unit.test_state.StateCompilerTestCase.test_render_error_on_invalid_requisite
+                            found = index.match(req_key, req_val)
+                        except (KeyError, TypeError):
                             raise SaltRenderError(
                                 'Could not locate requisite of [{0}] present in state with name [{1}]'.format(
-                                    req_key, chunk['name']))
+                                    req_key, chunks[0]['name']))
                     if not found:
                         return 'unmet', ()
+                    reqs[r_state].extend(found)
         fun_stats = set()
         for r_state, chunks in six.iteritems(reqs):
             req_stats = set()
@@ -2467,6 +2540,7 @@ class State(object):
         if status == 'unmet':
             lost = {}
             reqs = []
+            index = self._get_chunk_index(chunks)
             for requisite in requisites:
                 lost[requisite] = []
                 if requisite not in low:
@@ -2475,29 +2549,20 @@ class State(object):
                     if isinstance(req, six.string_types):
                         req = {'id': req}
                     req = trim_req(req)
-                    found = False
                     req_key = next(iter(req))
                     req_val = req[req_key]
-                    for chunk in chunks:
-                        if req_val is None:
-                            continue
-                        if req_key == 'sls':
-                            # Allow requisite tracking of entire sls files
-                            if fnmatch.fnmatch(chunk['__sls__'], req_val):
-                                if requisite == 'prereq':
-                                    chunk['__prereq__'] = True
-                                reqs.append(chunk)
-                                found = True
-                            continue
-                        if (fnmatch.fnmatch(chunk['name'], req_val) or
-                            fnmatch.fnmatch(chunk['__id__'], req_val)):
-                            if req_key == 'id' or chunk['state'] == req_key:
-                                if requisite == 'prereq':
-                                    chunk['__prereq__'] = True
-                                elif requisite == 'prerequired':
-                                    chunk['__prerequired__'] = True
-                                reqs.append(chunk)
-                                found = True
+                    if req_val is None or not chunks:
+                        found = []
+                    else:
+                        # Allow requisite tracking of entire sls files with
+                        # the sls key
+                        found = index.match(req_key, req_val)
+                    for chunk in found:
+                        if requisite == 'prereq':
+                            chunk['__prereq__'] = True
+                        elif requisite == 'prerequired' and req_key != 'sls':
+                            chunk['__prerequired__'] = True
+                        reqs.append(chunk)
                     if not found:
                         lost[requisite].append(req)
             if lost['require'] or lost['watch'] or lost['prereq'] \
@@ -2675,30 +2740,35 @@ class State(object):
         '''
         listeners = []
         crefs = {}
+        # The first chunk with a given ID or name
+        named = {}
         for chunk in chunks:
             crefs[(chunk['state'], chunk['__id__'], chunk['name'])] = chunk
+            for value in (chunk['__id__'], chunk['name']):
+                if ishashable(value):
+                    named.setdefault(value, chunk)
             if 'listen' in chunk:
                 listeners.append({(chunk['state'], chunk['__id__'], chunk['name']): chunk['listen']})
             if 'listen_in' in chunk:
                 for l_in in chunk['listen_in']:
                     for key, val in six.iteritems(l_in):
                         listeners.append({(key, val, 'lookup'): [{chunk['state']: chunk['__id__']}]})
+        # The chunk references by state module
+        state_crefs = {}
+        for cref in crefs:
+            state_crefs.setdefault(cref[0], []).append(cref)
         mod_watchers = []
         errors = {}
         for l_dict in listeners:
             for key, val in six.iteritems(l_dict):
                 for listen_to in val:
                     if not isinstance(listen_to, dict):
-                        found = False
-                        for chunk in chunks:
-                            if chunk['__id__'] == listen_to or \
-                               chunk['name'] == listen_to:
-                                listen_to = {chunk['state']: chunk['__id__']}
-                                found = True
-                        if not found:
+                        if not ishashable(listen_to) or listen_to not in named:
                             continue
+                        chunk = named[listen_to]
+                        listen_to = {chunk['state']: chunk['__id__']}
                     for lkey, lval in six.iteritems(listen_to):
-                        if not any(lkey == cref[0] and lval in cref for cref in crefs):
+                        if not any(lval in cref for cref in state_crefs.get(lkey, ())):
                             rerror = {_l_tag(lkey, lval):
                                       {
                                           'comment': 'Referenced state {0}: {1} does not exist'.format(lkey, lval),
@@ -2709,13 +2779,13 @@ class State(object):
                             errors.update(rerror)
                             continue
                         to_tags = [
-                            _gen_tag(data) for cref, data in six.iteritems(crefs) if lkey == cref[0] and lval in cref
+                            _gen_tag(crefs[cref]) for cref in state_crefs[lkey] if lval in cref
                         ]
                         for to_tag in to_tags:
                             if to_tag not in running:
                                 continue
                             if running[to_tag]['changes']:
-                                if not any(key[0] == cref[0] and key[1] in cref for cref in crefs):
+                                if not any(key[1] in cref for cref in state_crefs.get(key[0], ())):
                                     rerror = {_l_tag(key[0], key[1]):
                                                  {'comment': 'Referenced state {0}: {1} does not exist'.format(key[0], key[1]),
                                                   'name': 'listen_{0}:{1}'.format(key[0], key[1]),
@@ -2724,7 +2794,7 @@ class State(object):
                                     errors.update(rerror)
                                     continue
 
-                                new_chunks = [data for cref, data in six.iteritems(crefs) if key[0] == cref[0] and key[1] in cref]
+                                new_chunks = [crefs[cref] for cref in state_crefs[key[0]] if key[1] in cref]
                                 for chunk in new_chunks:
                                     low = chunk.copy()
                                     low['sfun'] = chunk['fun']
@@ -2903,6 +2973,29 @@ class State(object):
         return self.call_high(high)
 
 
+# The BaseHighState rendering SLS files in the forked worker processes of
+# BaseHighState.prerender_states
+_RENDER_HIGHSTATE = None
+
+
+def _render_worker_init():
+    '''
+    Prepare a forked SLS render worker
+    '''
+    # The connection to the master cannot be shared with the parent process
+    client = getattr(_RENDER_HIGHSTATE, 'client', None)
+    if hasattr(client, '_refresh_channel'):
+        client._refresh_channel()
+
+
+def _render_worker(unit):
+    '''
+    Render a matched SLS file, and its includes, in a render worker
+    '''
+    saltenv, sls, matches = unit
+    return _RENDER_HIGHSTATE.render_state_unit(sls, saltenv, matches)
+
+
 class BaseHighState(object):
     '''
     The BaseHighState is an abstract base class that is the foundation of
@@ -2917,6 +3010,10 @@ class BaseHighState(object):
         self.avail = self.__gather_avail()
         self.serial = salt.payload.Serial(self.opts)
         self.building_highstate = OrderedDict()
+        # Set while rendering in a render worker, see render_state_unit
+        self._iorder_trace = None
+        # The hash of the grains and pillar, see _render_cache_key
+        self._render_context = None
 
     def __gather_avail(self):
         '''
@@ -3450,16 +3547,26 @@ class BaseHighState(object):
                 'fileserver'.format(sls, saltenv)
             )
         state = None
+        cache_key = None
+        if not local:
+            cache_key = self._render_cache_key(fn_, sls, saltenv)
+            if cache_key:
+                state = self._render_cache_get(cache_key, sls, saltenv)
         try:
-            state = compile_template(fn_,
-                                     self.state.rend,
-                                     self.state.opts['renderer'],
-                                     self.state.opts['renderer_blacklist'],
-                                     self.state.opts['renderer_whitelist'],
-                                     saltenv,
-                                     sls,
-                                     rendered_sls=mods
-                                     )
+            if state is None:
+                with salt.utils.jinja.record_templates() as templates:
+                    state = compile_template(fn_,
+                                             self.state.rend,
+                                             self.state.opts['renderer'],
+                                             self.state.opts['renderer_blacklist'],
+                                             self.state.opts['renderer_whitelist'],
+                                             saltenv,
+                                             sls,
+                                             rendered_sls=mods
+                                             )
+                if cache_key:
+                    self._render_cache_set(
+                        cache_key, sls, saltenv, state, templates)
         except SaltRenderError as exc:
             msg = 'Rendering SLS \'{0}:{1}\' failed: {2}'.format(
                 saltenv, sls, exc
@@ -3603,20 +3710,213 @@ class BaseHighState(object):
                                             ', '.join(resolved_envs))
                         log.critical(msg)
                         errors.append(msg)
-                try:
-                    self._handle_iorder(state)
-                except TypeError:
-                    log.critical('Could not render SLS %s. Syntax error detected.', sls)
+                if self._iorder_trace is not None:
+                    # Rendering ahead in a render worker, the order is
+                    # applied once the state is merged into the highstate
+                    self._iorder_trace.append((sls, list(state)))
+                else:
+                    try:
+                        self._handle_iorder(state)
+                    except TypeError:
+                        log.critical('Could not render SLS %s. Syntax error detected.', sls)
         else:
             state = {}
         return state, errors
 
-    def _handle_iorder(self, state):
+    def _render_cache_key(self, fn_, sls, saltenv):
+        '''
+        Return the key of the cached rendering of an SLS file. The key covers
+        the SLS file, the grains, the pillar and the renderer settings.
+
+        Returns None if the render cache is disabled or cannot be used.
+        '''
+        if not self.opts.get('state_render_cache', False) or not fn_:
+            return None
+        if self._render_context is None:
+            try:
+                context = salt.utils.json.dumps(
+                    [self.state.opts.get('grains', {}),
+                     self.state.opts.get('pillar', {}),
+                     self.state.opts['renderer'],
+                     self.state.opts['renderer_blacklist'],
+                     self.state.opts['renderer_whitelist']],
+                    sort_keys=True,
+                    default=repr)
+            except (TypeError, ValueError) as exc:
+                log.debug('Disabling the SLS render cache, the grains and '
+                          'pillar cannot be hashed: %s', exc)
+                self._render_context = ''
+            else:
+                self._render_context = hashlib.sha256(
+                    salt.utils.stringutils.to_bytes(context)).hexdigest()
+        if not self._render_context:
+            return None
+        try:
+            source_hash = salt.utils.hashutils.get_hash(fn_)
+        except (IOError, OSError):
+            return None
+        return hashlib.sha256(salt.utils.stringutils.to_bytes(
+            '\n'.join([saltenv, sls, source_hash, self._render_context])
+        )).hexdigest()
+
+    def _render_cache_path(self, sls, saltenv):
+        '''
+        Return the path of the render cache entry of an SLS file
+        '''
+        name = hashlib.sha256(salt.utils.stringutils.to_bytes(
+            '{0}:{1}'.format(saltenv, sls))).hexdigest()
+        return os.path.join(
+            self.opts['cachedir'], 'state_render', '{0}.p'.format(name))
+
+    def _template_hash(self, template, saltenv):
+        '''
+        Return the hash of a template loaded while rendering an SLS file, or
+        None if it is not available
+        '''
+        dest = self.client.cache_file(salt.utils.url.create(template), saltenv)
+        if not dest:
+            return None
+        try:
+            return salt.utils.hashutils.get_hash(dest)
+        except (IOError, OSError):
+            return None
+
+    def _render_cache_get(self, key, sls, saltenv):
+        '''
+        Return the cached rendering of an SLS file, or None if there is none
+        or if the SLS file or one of the templates it loaded changed
+        '''
+        try:
+            with salt.utils.files.fopen(
+                    self._render_cache_path(sls, saltenv), 'rb') as fp_:
+                entry = pickle.load(fp_)
+        except (IOError, OSError):
+            return None
+        except Exception as exc:
+            log.debug('Could not read the cached rendering of SLS %s:%s: %s',
+                      saltenv, sls, exc)
+            return None
+        if entry.get('key') != key:
+            return None
+        for template_env, template, template_hash in entry['templates']:
+            if self._template_hash(template, template_env) != template_hash:
+                return None
+        log.debug('Using the cached rendering of SLS %s:%s', saltenv, sls)
+        return entry['state']
+
+    def _render_cache_set(self, key, sls, saltenv, state, templates):
+        '''
+        Cache the rendering of an SLS file along with the hashes of the
+        templates it loaded
+        '''
+        if not isinstance(state, dict):
+            return
+        entry = {'key': key, 'templates': [], 'state': state}
+        for template_env, template in OrderedDict.fromkeys(templates):
+            template_hash = self._template_hash(template, template_env)
+            if template_hash is None:
+                return
+            entry['templates'].append((template_env, template, template_hash))
+        path = self._render_cache_path(sls, saltenv)
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with salt.utils.atomicfile.atomic_open(path, 'wb') as fp_:
+                pickle.dump(entry, fp_, 2)
+        except Exception as exc:
+            log.debug('Could not cache the rendering of SLS %s:%s: %s',
+                      saltenv, sls, exc)
+
+    def render_state_unit(self, sls, saltenv, matches):
+        '''
+        Render a matched SLS file and its includes on their own, ahead of
+        render_highstate. The automatic ordering is recorded, to be applied
+        when the state is merged into the highstate.
+
+        Returns the state, the errors, the rendered SLS files and the
+        automatic ordering record.
+        '''
+        mods = set()
+        self._iorder_trace = []
+        try:
+            state, errors = self.render_state(sls, saltenv, mods, matches)
+            return state, errors, mods, self._iorder_trace
+        finally:
+            self._iorder_trace = None
+
+    def prerender_states(self, matches):
+        '''
+        Render the matched SLS files in a pool of ``state_render_workers``
+        worker processes.
+
+        Returns a dict of the render_state_unit results, keyed by saltenv and
+        SLS file.
+        '''
+        global _RENDER_HIGHSTATE
+        units = []
+        for saltenv, states in six.iteritems(matches):
+            if saltenv not in self.avail:
+                continue
+            for sls_match in states:
+                for sls in fnmatch.filter(self.avail[saltenv], sls_match) \
+                        or [sls_match]:
+                    if (saltenv, sls) not in units:
+                        units.append((saltenv, sls))
+        workers = min(self.opts.get('state_render_workers', 1), len(units))
+        if workers < 2 or salt.utils.platform.is_windows():
+            # The workers are forked to share the loaded renderers
+            return {}
+        log.debug('Rendering %s SLS files in %s workers', len(units), workers)
+        _RENDER_HIGHSTATE = self
+        pool = None
+        try:
+            pool = multiprocessing.Pool(workers, _render_worker_init)
+            rendered = pool.map(
+                _render_worker,
+                [(saltenv, sls, matches) for saltenv, sls in units])
+            pool.close()
+        except Exception as exc:
+            log.warning('Could not render the SLS files in workers, '
+                        'rendering them serially: %s', exc)
+            if pool is not None:
+                pool.terminate()
+            return {}
+        finally:
+            _RENDER_HIGHSTATE = None
+            if pool is not None:
+                pool.join()
+        return dict(zip(units, rendered))
+
+    def _render_matched_state(self, sls, saltenv, mods, matches, rendered):
+        '''
+        Render a matched SLS file, or use its rendering by a render worker if
+        it is the same as rendering it here
+        '''
+        unit = rendered.pop((saltenv, sls), None)
+        if unit is not None:
+            state, errors, unit_mods, iorder_trace = unit
+            # When an include was rendered already it is skipped here, but
+            # not by the worker
+            if not unit_mods & mods:
+                mods.update(unit_mods)
+                for trace_sls, names in iorder_trace:
+                    try:
+                        self._handle_iorder(state, names)
+                    except TypeError:
+                        log.critical('Could not render SLS %s. Syntax error '
+                                     'detected.', trace_sls)
+                return state, errors
+        return self.render_state(sls, saltenv, mods, matches)
+
+    def _handle_iorder(self, state, names=None):
         '''
-        Take a state and apply the iorder system
+        Take a state and apply the iorder system, to the given IDs of the
+        state if names is set
         '''
         if self.opts['state_auto_order']:
-            for name in state:
+            for name in (state if names is None else names):
+                if name not in state:
+                    continue
                 for s_dec in state[name]:
                     if not isinstance(s_dec, six.string_types):
                         # PyDSL OrderedDict?
@@ -3759,6 +4059,7 @@ class BaseHighState(object):
         all_errors = []
         mods = set()
         statefiles = []
+        rendered = self.prerender_states(matches)
         for saltenv, states in six.iteritems(matches):
             for sls_match in states:
                 try:
@@ -3779,8 +4080,8 @@ class BaseHighState(object):
                     r_env = '{0}:{1}'.format(saltenv, sls)
                     if r_env in mods:
                         continue
-                    state, errors = self.render_state(
-                        sls, saltenv, mods, matches)
+                    state, errors = self._render_matched_state(
+                        sls, saltenv, mods, matches, rendered)
                     if state:
                         self.merge_included_states(highstate, state, errors)
                     for i, error in enumerate(errors[:]):
@@ -513,6 +513,15 @@ class IPCMessagePublisher(object):
         self.io_loop = io_loop or IOLoop.current()
         self._closing = False
         self.streams = set()
+        # The streams which did not register any tag prefix and are sent
+        # every message
+        self.unfiltered_streams = set()
+        # The tag prefixes registered by the other streams, by stream
+        self.stream_prefixes = {}
+        # A trie of the registered tag prefixes, each node being a dict
+        # mapping the next character to the child node and None to the set of
+        # streams which registered the prefix ending at the node
+        self.prefix_trie = {}
 
     def start(self):
         '''
@@ -560,18 +569,95 @@ class IPCMessagePublisher(object):
                 stream.close()
             self.streams.discard(stream)
 
-    def publish(self, msg):
+    def publish(self, msg, tag=None):
         '''
-        Send message to all connected sockets
+        Send message to all connected sockets, or if a tag is passed, only to
+        the sockets which registered no tag prefix or a prefix of the tag
         '''
         if not len(self.streams):
             return
 
+        if tag is None or not self.stream_prefixes:
+            streams = self.streams
+        else:
+            streams = self.match_streams(tag)
+            if not streams:
+                return
+
         pack = salt.transport.frame.frame_msg_ipc(msg, raw_body=True)
 
-        for stream in self.streams:
+        for stream in streams:
             self.io_loop.spawn_callback(self._write, stream, pack)
 
+    def match_streams(self, tag):
+        '''
+        Return the streams a message with the given tag has to be sent to
+        '''
+        streams = set(self.unfiltered_streams)
+        node = self.prefix_trie
+        streams.update(node.get(None, ()))
+        for char in tag:
+            node = node.get(char)
+            if node is None:
+                break
+            streams.update(node.get(None, ()))
+        return streams
+
+    def set_prefixes(self, stream, prefixes):
+        '''
+        Register the tag prefixes of the messages to send to a stream, or
+        send it all of the messages if prefixes is None
+        '''
+        for prefix in self.stream_prefixes.pop(stream, ()):
+            path = [self.prefix_trie]
+            for char in prefix:
+                path.append(path[-1][char])
+            path[-1][None].discard(stream)
+            # Prune the nodes of the prefix which are no longer used
+            for depth in range(len(prefix), 0, -1):
+                node = path[depth]
+                if node.get(None) or any(key is not None for key in node):
+                    break
+                del path[depth - 1][prefix[depth - 1]]
+        self.unfiltered_streams.discard(stream)
+        if stream not in self.streams:
+            return
+        if prefixes is None:
+            self.unfiltered_streams.add(stream)
+            return
+        prefixes = set(prefixes)
+        self.stream_prefixes[stream] = prefixes
+        for prefix in prefixes:
+            node = self.prefix_trie
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node.setdefault(None, set()).add(stream)
+
+    @tornado.gen.coroutine
+    def _read_prefixes(self, stream):
+        '''
+        Read the tag prefixes registered by a subscriber
+        '''
+        if six.PY2:
+            encoding = None
+        else:
+            encoding = 'utf-8'
+        unpacker = msgpack.Unpacker(encoding=encoding)
+        while not stream.closed():
+            try:
+                wire_bytes = yield stream.read_bytes(4096, partial=True)
+                unpacker.feed(wire_bytes)
+                for framed_msg in unpacker:
+                    body = framed_msg['body']
+                    if isinstance(body, dict) and 'prefixes' in body:
+                        self.set_prefixes(stream, body['prefixes'])
+            except tornado.iostream.StreamClosedError:
+                break
+            except Exception as exc:
+                log.error('Exception occurred while reading the tag prefixes '
+                          'of a subscriber: %s', exc)
+                break
+
     def handle_connection(self, connection, address):
         log.trace('IPCServer: Handling connection to address: %s', address)
         try:
@@ -599,11 +685,14 @@ class IPCMessagePublisher(object):
 >>>>>>> upstream
                 )
             self.streams.add(stream)
+            self.unfiltered_streams.add(stream)
 
             def discard_after_closed():
                 self.streams.discard(stream)
+                self.set_prefixes(stream, None)
 
             stream.set_close_callback(discard_after_closed)
+            self.io_loop.spawn_callback(self._read_prefixes, stream)
         except Exception as exc:
             log.error('IPC streaming error: %s', exc)
 
@@ -619,6 +708,9 @@ class IPCMessagePublisher(object):
         for stream in self.streams:
             stream.close()
         self.streams.clear()
+        self.unfiltered_streams.clear()
+        self.stream_prefixes.clear()
+        self.prefix_trie.clear()
         if hasattr(self.sock, 'close'):
             self.sock.close()
 
@@ -667,6 +759,39 @@ class IPCMessageSubscriber(IPCClient):
         self._sync_ioloop_running = False
         self.saved_data = []
         self._sync_read_in_progress = Semaphore()
+        # The tag prefixes registered with the publisher, and the stream they
+        # were last sent on
+        self.tag_prefixes = None
+        self._prefixes_stream = None
+
+    def set_tag_prefixes(self, prefixes):
+        '''
+        Ask the publisher to only send the messages whose tag starts with one
+        of the given prefixes, or all of the messages if prefixes is None. The
+        prefixes are registered again whenever the subscriber reconnects.
+        '''
+        if prefixes is not None:
+            prefixes = sorted(set(prefixes))
+        self.tag_prefixes = prefixes
+        if self.connected():
+            self._send_tag_prefixes()
+
+    def _check_tag_prefixes(self):
+        '''
+        Register the tag prefixes with the publisher if they were not sent on
+        the current stream yet
+        '''
+        if self.tag_prefixes is not None \
+                and self._prefixes_stream is not self.stream:
+            self._send_tag_prefixes()
+
+    def _send_tag_prefixes(self):
+        self._prefixes_stream = self.stream
+        pack = salt.transport.frame.frame_msg_ipc(
+            {'prefixes': self.tag_prefixes}, raw_body=True)
+        future = self.stream.write(pack)
+        # A closed stream is reported by the next read
+        future.add_done_callback(lambda future: future.exception())
 
     @tornado.gen.coroutine
     def _read_sync(self, timeout):
@@ -675,6 +800,7 @@ class IPCMessageSubscriber(IPCClient):
         ret = None
 
         try:
+            self._check_tag_prefixes()
             while True:
                 if self._read_stream_future is None:
                     self._read_stream_future = self.stream.read_bytes(4096, partial=True)
@@ -749,8 +875,26 @@ class IPCMessageSubscriber(IPCClient):
         self._read_sync_future = None
         return ret_future.result()
 
+    @tornado.gen.coroutine
+    def read(self, timeout=None):
+        '''
+        Asynchronously read a single message from an IPC socket
+
+        The socket must already be connected.
+        The associated IO Loop must be running.
+        :param int timeout: Timeout when receiving message
+        :return: message data if successful. None if timed out. Will raise an
+                 exception for all other error conditions.
+        '''
+        if self.saved_data:
+            raise tornado.gen.Return(self.saved_data.pop(0))
+        ret = yield self._read_sync(timeout)
+        raise tornado.gen.Return(ret)
+
     @tornado.gen.coroutine
     def _read_async(self, callback):
+        if not self.stream.closed():
+            self._check_tag_prefixes()
         while not self.stream.closed():
             try:
                 self._read_stream_future = self.stream.read_bytes(4096, partial=True)
@@ -355,6 +355,44 @@ class AsyncTCPReqChannel(salt.transport.client.ReqChannel):
         ret = yield self.message_client.send(self._package_load(load), timeout=timeout)
         raise tornado.gen.Return(ret)
 
+    @tornado.gen.coroutine
+    def send_stream(self, load, callback, tries=3, timeout=60):
+        '''
+        Send a request answered with a stream of messages. ``callback`` is
+        called with every decrypted message of the stream as it arrives, the
+        returned future completes with the final reply. ``timeout`` applies to
+        the wait for each message.
+        '''
+        def _recv_stream(body):
+            data = self.auth.crypticle.loads(body)
+            if six.PY3:
+                data = salt.transport.frame.decode_embedded_strs(data)
+            callback(data)
+
+        @tornado.gen.coroutine
+        def _do_transfer():
+            data = yield self.message_client.send(self._package_load(self.auth.crypticle.dumps(load)),
+                                                  timeout=timeout,
+                                                  stream_callback=_recv_stream,
+                                                  )
+            if data:
+                data = self.auth.crypticle.loads(data)
+                if six.PY3:
+                    data = salt.transport.frame.decode_embedded_strs(data)
+            raise tornado.gen.Return(data)
+
+        if not self.auth.authenticated:
+            yield self.auth.authenticate()
+        try:
+            try:
+                ret = yield _do_transfer()
+            except salt.crypt.AuthenticationError:
+                yield self.auth.authenticate()
+                ret = yield _do_transfer()
+        except tornado.iostream.StreamClosedError:
+            raise SaltClientError('Connection to master lost')
+        raise tornado.gen.Return(ret)
+
     @tornado.gen.coroutine
     def send(self, load, tries=3, timeout=60, raw=False):
         '''
@@ -677,6 +715,8 @@ class TCPReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin, salt.tra
                                                              req_opts['key'],
                                                              req_opts['tgt'],
                                                              ), header=header))
+            elif req_fun == 'send_stream':
+                yield self._send_stream(stream, header, ret)
             else:
                 log.error('Unknown req_fun %s', req_fun)
                 # always attempt to return an error to the minion
@@ -695,6 +735,34 @@ class TCPReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin, salt.tra
 
         raise tornado.gen.Return()
 
+    @tornado.gen.coroutine
+    def _send_stream(self, stream, header, ret):
+        '''
+        Write every item of the iterable ``ret`` but the last as a stream
+        message and the last one as the reply to the request. Each write is
+        waited for, so that a slow reader does not make the chunks pile up in
+        memory while other requests are served.
+        '''
+        stream_header = dict(header, stream=True)
+        try:
+            try:
+                items = iter(ret)
+                item = next(items)
+                for next_item in items:
+                    yield stream.write(salt.transport.frame.frame_msg(
+                        self.crypticle.dumps(item), header=stream_header))
+                    item = next_item
+            except tornado.iostream.StreamClosedError:
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                log.error('Error streaming reply: %s', exc, exc_info=True)
+                item = ''
+            yield stream.write(salt.transport.frame.frame_msg(
+                self.crypticle.dumps(item), header=header))
+        finally:
+            if hasattr(ret, 'close'):
+                ret.close()
+
 
 class SaltMessageServer(tornado.tcpserver.TCPServer, object):
     '''
@@ -884,6 +952,9 @@ class SaltMessageClient(object):
         self.send_queue = []  # queue of messages to be sent
         self.send_future_map = {}  # mapping of request_id -> Future
         self.send_timeout_map = {}  # request_id -> timeout_callback
+        # request_id -> (stream_callback, timeout), or None once the stream
+        # was aborted and its remaining messages have to be dropped
+        self.send_stream_map = {}
 
         self._read_until_future = None
         self._on_recv = None
@@ -1021,7 +1092,12 @@ class SaltMessageClient(object):
                         body = framed_msg['body']
                         message_id = header.get('mid')
 
-                        if message_id in self.send_future_map:
+                        if header.get('stream'):
+                            self._stream_message(message_id, body)
+                        elif message_id in self.send_stream_map \
+                                and self.send_stream_map.pop(message_id) is None:
+                            log.trace('Dropping reply to aborted stream %s', message_id)
+                        elif message_id in self.send_future_map:
                             self.send_future_map.pop(message_id).set_result(body)
                             self.remove_message_timeout(message_id)
                         else:
@@ -1034,6 +1110,7 @@ class SaltMessageClient(object):
                     for future in six.itervalues(self.send_future_map):
                         future.set_exception(e)
                     self.send_future_map = {}
+                    self.send_stream_map = {}
                     if self._closing:
                         return
                     if self.disconnect_callback:
@@ -1054,6 +1131,7 @@ class SaltMessageClient(object):
                     for future in six.itervalues(self.send_future_map):
                         future.set_exception(e)
                     self.send_future_map = {}
+                    self.send_stream_map = {}
                     if self._closing:
                         return
                     if self.disconnect_callback:
@@ -1079,6 +1157,7 @@ class SaltMessageClient(object):
             except tornado.iostream.StreamClosedError as e:
                 if message_id in self.send_future_map:
                     self.send_future_map.pop(message_id).set_exception(e)
+                self.send_stream_map.pop(message_id, None)
                 self.remove_message_timeout(message_id)
                 del self.send_queue[0]
                 if self._closing:
@@ -1090,9 +1169,32 @@ class SaltMessageClient(object):
                     self._connecting_future = self.connect()
                 yield self._connecting_future
 
+    def _stream_message(self, message_id, body):
+        '''
+        Hand a message of a streamed reply to the callback of its request
+        '''
+        stream = self.send_stream_map.get(message_id)
+        if stream is None:
+            log.trace('Dropping stream message for message_id %s', message_id)
+            return
+        stream_callback, timeout = stream
+        if timeout is not None:
+            # The timeout applies to each message of the stream
+            self.remove_message_timeout(message_id)
+            self.send_timeout_map[message_id] = self.io_loop.call_later(
+                timeout, self.timeout_message, message_id)
+        try:
+            stream_callback(body)
+        except Exception as exc:  # pylint: disable=broad-except
+            log.error('Error handling stream message: %s', exc, exc_info=True)
+            self.send_stream_map[message_id] = None
+            self.remove_message_timeout(message_id)
+            if message_id in self.send_future_map:
+                self.send_future_map.pop(message_id).set_exception(exc)
+
     def _message_id(self):
         wrap = False
-        while self._mid in self.send_future_map:
+        while self._mid in self.send_future_map or self._mid in self.send_stream_map:
             if self._mid >= self._max_messages:
                 if wrap:
                     # this shouldn't ever happen, but just in case
@@ -1125,14 +1227,19 @@ class SaltMessageClient(object):
     def timeout_message(self, message_id):
         if message_id in self.send_timeout_map:
             del self.send_timeout_map[message_id]
+        if message_id in self.send_stream_map:
+            self.send_stream_map[message_id] = None
         if message_id in self.send_future_map:
             self.send_future_map.pop(message_id).set_exception(
                 SaltReqTimeoutError('Message timed out')
             )
 
-    def send(self, msg, timeout=None, callback=None, raw=False):
+    def send(self, msg, timeout=None, callback=None, raw=False, stream_callback=None):
         '''
         Send given message, and return a future
+
+        If ``stream_callback`` is passed, it is called with the body of each
+        stream message sent back for this message before the final reply.
         '''
         message_id = self._message_id()
         header = {'mid': message_id}
@@ -1153,6 +1260,9 @@ class SaltMessageClient(object):
             send_timeout = self.io_loop.call_later(timeout, self.timeout_message, message_id)
             self.send_timeout_map[message_id] = send_timeout
 
+        if stream_callback is not None:
+            self.send_stream_map[message_id] = (stream_callback, timeout)
+
         # if we don't have a send queue, we need to spawn the callback to do the sending
         if len(self.send_queue) == 0:
             self.io_loop.spawn_callback(self._stream_send)
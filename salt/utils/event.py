@@ -59,13 +59,17 @@ import fnmatch
 import hashlib
 import logging
 import datetime
+import struct
 import sys
+import threading
+import collections
 from collections import MutableMapping
 from multiprocessing.util import Finalize
 from salt.ext.six.moves import range
 
 # Import third party libs
 from salt.ext import six
+import tornado.gen
 import tornado.ioloop
 import tornado.iostream
 
@@ -207,6 +211,35 @@ def tagify(suffix='', prefix='', base=SALT):
     return TAGPARTER.join([part for part in parts if part])
 
 
+def tag_prefix(search_tag, match_type='startswith'):
+    '''
+    Return the longest prefix shared by all of the event tags matched by a
+    search tag, an empty string meaning any tag can match. The regex search
+    tags are searched anywhere in the tags, unless they are anchored with
+    ``^``.
+    '''
+    if match_type == 'startswith':
+        return search_tag
+    if match_type == 'regex':
+        if not search_tag.startswith('^') or '|' in search_tag:
+            return ''
+        search_tag = search_tag[1:]
+        specials = '.^$+[]()\\'
+        # Quantifiers make the preceding character optional
+        quantifiers = '?*{'
+    elif match_type == 'fnmatch':
+        specials = '*?['
+        quantifiers = ''
+    else:
+        return ''
+    for index, char in enumerate(search_tag):
+        if char in quantifiers:
+            return search_tag[:max(index - 1, 0)]
+        if char in specials:
+            return search_tag[:index]
+    return search_tag
+
+
 class SaltEvent(object):
     '''
     Warning! Use the get_event function or the code will not be
@@ -259,6 +292,9 @@ class SaltEvent(object):
         self.puburi, self.pulluri = self.__load_uri(sock_dir, node)
         self.pending_tags = []
         self.pending_events = []
+        # The prefixes of the tags the publisher sends to this listener, None
+        # meaning all of the events are sent
+        self.tag_prefixes = None
         self.__load_cache_regex()
         if listen and not self.cpub:
             # Only connect to the publisher at initialization time if
@@ -336,6 +372,9 @@ class SaltEvent(object):
             return
         match_func = self._get_match_func(match_type)
         self.pending_tags.append([tag, match_func])
+        if self.tag_prefixes is not None:
+            self.set_tag_prefixes(
+                self.tag_prefixes + [self._get_tag_prefix(tag, match_type)])
 
     def unsubscribe(self, tag, match_type=None):
         '''
@@ -346,6 +385,12 @@ class SaltEvent(object):
         match_func = self._get_match_func(match_type)
 
         self.pending_tags.remove([tag, match_func])
+        if self.tag_prefixes is not None:
+            prefixes = list(self.tag_prefixes)
+            prefix = self._get_tag_prefix(tag, match_type)
+            if prefix in prefixes:
+                prefixes.remove(prefix)
+            self.set_tag_prefixes(prefixes)
 
         old_events = self.pending_events
         self.pending_events = []
@@ -353,6 +398,27 @@ class SaltEvent(object):
             if any(pmatch_func(evt['tag'], ptag) for ptag, pmatch_func in self.pending_tags):
                 self.pending_events.append(evt)
 
+    def set_tag_prefixes(self, prefixes):
+        '''
+        Only receive the events whose tag starts with one of the passed
+        prefixes, the publisher not sending the other events to this listener
+        at all. Pass None to receive all of the events again.
+
+        While prefixes are set, subscribing to a tag adds a prefix of the tag
+        to them, so an empty list of prefixes makes the publisher send only
+        the events matching the subscriptions.
+        '''
+        if prefixes is not None:
+            prefixes = list(prefixes)
+        self.tag_prefixes = prefixes
+        if self.subscriber is not None:
+            self.subscriber.set_tag_prefixes(prefixes)
+
+    def _get_tag_prefix(self, tag, match_type=None):
+        if match_type is None:
+            match_type = self.opts['event_match_type']
+        return tag_prefix(tag, match_type)
+
     def connect_pub(self, timeout=None):
         '''
         Establish the publish connection
@@ -367,6 +433,8 @@ class SaltEvent(object):
                     self.puburi,
                     io_loop=self.io_loop
                 )
+                    if self.tag_prefixes is not None:
+                        self.subscriber.set_tag_prefixes(self.tag_prefixes)
                 try:
                     self.io_loop.run_sync(
                         lambda: self.subscriber.connect(timeout=timeout))
@@ -379,12 +447,25 @@ class SaltEvent(object):
                 self.puburi,
                 io_loop=self.io_loop
             )
+                if self.tag_prefixes is not None:
+                    self.subscriber.set_tag_prefixes(self.tag_prefixes)
 
             # For the async case, the connect will be defered to when
             # set_event_handler() is invoked.
             self.cpub = True
         return self.cpub
 
+    @tornado.gen.coroutine
+    def connect_pub_async(self, timeout=None):
+        '''
+        Establish the publish connection on the running io_loop
+        '''
+        assert not self._run_io_loop_sync
+
+        self.connect_pub()
+        if not self.subscriber.connected():
+            yield self.subscriber.connect(timeout=timeout)
+
     def close_pub(self):
         '''
         Close the publish connection (if established)
@@ -443,6 +524,16 @@ class SaltEvent(object):
             data = serial.loads(mdata, encoding='utf-8')
         return mtag, data
 
+    @staticmethod
+    def unpack_tag(raw):
+        '''
+        Return the tag of a raw event without unpacking its data
+        '''
+        if six.PY2:
+            return raw.partition(TAGEND)[0]
+        return salt.utils.stringutils.to_str(
+            raw.partition(salt.utils.stringutils.to_bytes(TAGEND))[0])
+
     def _get_match_func(self, match_type=None):
         if match_type is None:
             match_type = self.opts['event_match_type']
@@ -650,6 +741,25 @@ class SaltEvent(object):
         else:
             return ret['data']
 
+    @tornado.gen.coroutine
+    def get_event_async(self, wait=None):
+        '''
+        Get a single publication without blocking the running io_loop.
+        Wait for up to ``wait`` seconds, or forever if ``wait`` is None.
+        Return the full publication if one is available or ``None`` if no
+        publication is available.
+
+        Nothing else must read the publications of this object, e.g. through
+        set_event_handler(), and the subscriptions are not cached for later
+        calls.
+        '''
+        yield self.connect_pub_async(timeout=wait)
+        raw = yield self.subscriber.read(timeout=wait)
+        if raw is None:
+            raise tornado.gen.Return(None)
+        mtag, data = self.unpack(raw, self.serial)
+        raise tornado.gen.Return({'data': data, 'tag': mtag})
+
     def get_event_noblock(self):
         '''
         Get the raw event without blocking or any other niceties
@@ -1031,7 +1141,7 @@ class AsyncEventPublisher(object):
         Get something from epull, publish it out epub, and return the package (or None)
         '''
         try:
-            self.publisher.publish(package)
+            self.publisher.publish(package, tag=SaltEvent.unpack_tag(package))
             return package
         # Add an extra fallback in case a forked process leeks through
         except Exception:
@@ -1134,7 +1244,7 @@ class EventPublisher(salt.utils.process.SignalHandlingMultiprocessingProcess):
         Get something from epull, publish it out epub, and return the package (or None)
         '''
         try:
-            self.publisher.publish(package)
+            self.publisher.publish(package, tag=SaltEvent.unpack_tag(package))
             return package
         # Add an extra fallback in case a forked process leeks through
         except Exception:
@@ -1161,10 +1271,221 @@ class EventPublisher(salt.utils.process.SignalHandlingMultiprocessingProcess):
         self.close()
 
 
+class EventReturnQueue(object):
+    '''
+    The bounded queue of the events waiting to be flushed to the event
+    returners.
+
+    Events are held in memory, up to ``max_size`` of them. The ``overflow``
+    policy decides what happens to the events which arrive while the queue is
+    full:
+
+    block
+        Wait until a flush has made room in the queue
+
+    drop_oldest
+        Discard the oldest queued event
+
+    spill
+        Append the event to the ``spill_path`` file. Spilled events are read
+        back, in order, as the memory queue drains. Events left in the spill
+        file by a previous run are returned first.
+    '''
+    OVERFLOW_POLICIES = ('block', 'drop_oldest', 'spill')
+    SPILL_HEADER = struct.Struct(str('>I'))
+    SPILL_OFFSET = struct.Struct(str('>Q'))
+
+    def __init__(self, max_size, overflow='block', spill_path=None):
+        if overflow not in self.OVERFLOW_POLICIES \
+                or (overflow == 'spill' and not spill_path):
+            log.error('Invalid event return queue overflow policy \'%s\', '
+                      'falling back to \'block\'', overflow)
+            overflow = 'block'
+        self.max_size = max(int(max_size), 1)
+        self.overflow = overflow
+        self.spill_path = spill_path
+        self.serial = salt.payload.Serial({'serial': 'msgpack'})
+        self.events = collections.deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        # Counters of the events dropped and spilled since startup
+        self.dropped = 0
+        self.spilled = 0
+        # The number of spilled events not read back yet
+        self.spill_depth = 0
+        self._spill_offset = self.SPILL_OFFSET.size
+        if self.overflow == 'spill':
+            self._load_spill()
+
+    def __len__(self):
+        return len(self.events) + self.spill_depth
+
+    def _load_spill(self):
+        '''
+        Count the events left in the spill file by a previous run
+        '''
+        try:
+            with salt.utils.files.fopen(self.spill_path, 'rb') as fh_:
+                size = os.fstat(fh_.fileno()).st_size
+                header = fh_.read(self.SPILL_OFFSET.size)
+                if len(header) < self.SPILL_OFFSET.size:
+                    return
+                self._spill_offset = self.SPILL_OFFSET.unpack(header)[0]
+                fh_.seek(self._spill_offset)
+                while True:
+                    header = fh_.read(self.SPILL_HEADER.size)
+                    if len(header) < self.SPILL_HEADER.size:
+                        break
+                    offset = fh_.tell() + self.SPILL_HEADER.unpack(header)[0]
+                    if offset > size:
+                        break
+                    fh_.seek(offset)
+                    self.spill_depth += 1
+        except (IOError, OSError):
+            return
+        if self.spill_depth:
+            log.info('Found %s spilled events to return in %s',
+                     self.spill_depth, self.spill_path)
+
+    def _spill(self, event):
+        '''
+        Append an event to the spill file
+        '''
+        payload = self.serial.dumps([time.time(), event])
+        try:
+            with salt.utils.files.fopen(self.spill_path, 'ab') as fh_:
+                if not self.spill_depth:
+                    # A new spill file starts with the offset of the first
+                    # event which has not been read back
+                    self._spill_offset = self.SPILL_OFFSET.size
+                    fh_.truncate(0)
+                    fh_.write(self.SPILL_OFFSET.pack(self._spill_offset))
+                fh_.write(self.SPILL_HEADER.pack(len(payload)) + payload)
+        except (IOError, OSError) as exc:
+            log.error('Could not spill an event to %s: %s',
+                      self.spill_path, exc)
+            return False
+        self.spill_depth += 1
+        self.spilled += 1
+        return True
+
+    def _unspill(self):
+        '''
+        Read spilled events back into the memory queue, as long as there is
+        room for them
+        '''
+        room = self.max_size - len(self.events)
+        try:
+            with salt.utils.files.fopen(self.spill_path, 'r+b') as fh_:
+                fh_.seek(self._spill_offset)
+                while room > 0 and self.spill_depth:
+                    header = fh_.read(self.SPILL_HEADER.size)
+                    if len(header) < self.SPILL_HEADER.size:
+                        raise IOError('truncated spill file')
+                    size = self.SPILL_HEADER.unpack(header)[0]
+                    payload = fh_.read(size)
+                    if len(payload) < size:
+                        raise IOError('truncated spill file')
+                    self.events.append(tuple(self.serial.loads(payload)))
+                    self.spill_depth -= 1
+                    room -= 1
+                self._spill_offset = fh_.tell()
+                # Record the progress, a restart does not return the events
+                # read back again
+                fh_.seek(0)
+                fh_.write(self.SPILL_OFFSET.pack(self._spill_offset))
+        except (IOError, OSError) as exc:
+            log.error('Could not read the spilled events from %s, dropping '
+                      '%s events: %s', self.spill_path, self.spill_depth, exc)
+            self.dropped += self.spill_depth
+            self.spill_depth = 0
+        if not self.spill_depth:
+            try:
+                os.remove(self.spill_path)
+            except OSError:
+                pass
+
+    def put(self, event):
+        '''
+        Queue an event, applying the overflow policy if the queue is full.
+
+        Returns False if the event was dropped.
+        '''
+        with self.cond:
+            if self.overflow == 'spill' \
+                    and (self.spill_depth or len(self.events) >= self.max_size):
+                # Keep the events in order, everything goes to the spill file
+                # until the spilled events have been read back
+                if self._spill(event):
+                    self.cond.notify_all()
+                    return True
+                self.dropped += 1
+                return False
+            if len(self.events) >= self.max_size:
+                if self.overflow == 'drop_oldest':
+                    self.events.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self.events) >= self.max_size \
+                            and not self.closed:
+                        self.cond.wait(1)
+            self.events.append((time.time(), event))
+            self.cond.notify_all()
+            return True
+
+    def get(self, batch_size, max_age=0):
+        '''
+        Wait for a batch of at most ``batch_size`` events and return it.
+
+        The batch is returned once ``batch_size`` events are queued, once the
+        oldest queued event is ``max_age`` seconds old (if ``max_age`` is set)
+        or once the queue is closed. An empty list is returned when the queue
+        is closed and drained.
+        '''
+        batch_size = min(max(batch_size, 1), self.max_size)
+        with self.cond:
+            while True:
+                if not self.events and self.spill_depth:
+                    self._unspill()
+                if self.events:
+                    if self.closed or len(self) >= batch_size:
+                        break
+                    if max_age:
+                        age = time.time() - self.events[0][0]
+                        if age >= max_age:
+                            break
+                        self.cond.wait(max_age - age)
+                        continue
+                elif self.closed:
+                    return []
+                self.cond.wait()
+            batch = []
+            while self.events and len(batch) < batch_size:
+                batch.append(self.events.popleft()[1])
+            if self.spill_depth:
+                self._unspill()
+            # Wake up the producers waiting for room
+            self.cond.notify_all()
+            return batch
+
+    def close(self):
+        '''
+        Stop waiting for batches to fill, the remaining events are returned
+        as they are
+        '''
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
 class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
     '''
     A dedicated process which listens to the master event bus and queues
     and forwards events to the specified returner.
+
+    The events are queued in an :class:`EventReturnQueue` and flushed in
+    batches by a separate thread, so that a slow returner does not stall the
+    reading of the event bus.
     '''
     def __new__(cls, *args, **kwargs):
         if sys.platform.startswith('win'):
@@ -1186,10 +1507,23 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
 
         self.opts = opts
         self.event_return_queue = self.opts['event_return_queue']
+        self.flush_interval = self.opts['event_return_flush_interval']
+        self.stats_interval = self.opts['event_return_stats_interval']
         local_minion_opts = self.opts.copy()
         local_minion_opts['file_client'] = 'local'
         self.minion = salt.minion.MasterMinion(local_minion_opts)
-        self.event_queue = []
+        self.queue = EventReturnQueue(
+            self.opts['event_return_queue_max_size'],
+            self.opts['event_return_queue_overflow'],
+            os.path.join(self.opts['cachedir'], 'event_return.spill'))
+        self.stats = {
+            'flushes': 0,
+            'flushed_events': 0,
+            'flush_errors': 0,
+            'flush_latency_last': 0,
+            'flush_latency_max': 0,
+            'flush_latency_total': 0,
+        }
         self.stop = False
 
     # __setstate__ and __getstate__ are only used on Windows.
@@ -1211,19 +1545,23 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
         }
 
     def _handle_signals(self, signum, sigframe):
-        # Flush and terminate
-        if self.event_queue:
-            self.flush_events()
+        # Flush and terminate, the flusher thread drains the queue once it is
+        # closed
         self.stop = True
+        self.queue.close()
         super(EventReturn, self)._handle_signals(signum, sigframe)
 
-    def flush_events(self):
+    def flush_events(self, events):
+        '''
+        Send a batch of events to the configured event returners
+        '''
+        start = time.time()
         if isinstance(self.opts['event_return'], list):
             # Multiple event returners
             for r in self.opts['event_return']:
                 log.debug('Calling event returner {0}, one of many.'.format(r))
                 event_return = '{0}.event_return'.format(r)
-                self._flush_event_single(event_return)
+                self._flush_event_single(event_return, events)
         else:
             # Only a single event returner
             log.debug('Calling event returner {0}, only one '
@@ -1231,46 +1569,96 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
             event_return = '{0}.event_return'.format(
                 self.opts['event_return']
                 )
-            self._flush_event_single(event_return)
-        del self.event_queue[:]
-
-    def _flush_event_single(self, event_return):
+            self._flush_event_single(event_return, events)
+        latency = time.time() - start
+        self.stats['flushes'] += 1
+        self.stats['flushed_events'] += len(events)
+        self.stats['flush_latency_last'] = latency
+        self.stats['flush_latency_total'] += latency
+        self.stats['flush_latency_max'] = max(
+            self.stats['flush_latency_max'], latency)
+
+    def _flush_event_single(self, event_return, events):
         if event_return in self.minion.returners:
             try:
-                self.minion.returners[event_return](self.event_queue)
+                self.minion.returners[event_return](events)
             except Exception as exc:
+                self.stats['flush_errors'] += 1
                 log.error('Could not store events - returner \'{0}\' raised '
                           'exception: {1}'.format(event_return, exc))
                 # don't waste processing power unnecessarily on converting a
                 # potentially huge dataset to a string
                 if log.level <= logging.DEBUG:
                     log.debug('Event data that caused an exception: {0}'.format(
-                        self.event_queue))
+                        events))
         else:
+            self.stats['flush_errors'] += 1
             log.error('Could not store return for event(s) - returner '
                       '\'%s\' not found.', event_return)
 
+    def _flush_loop(self):
+        '''
+        Flush batches of queued events until the queue is closed and drained
+        '''
+        batch_size = max(self.event_return_queue, 1)
+        while True:
+            events = self.queue.get(batch_size, self.flush_interval)
+            if not events:
+                break
+            self.flush_events(events)
+
+    def get_stats(self):
+        '''
+        Return the queue and flush statistics. The maximum flush latency is
+        reset on every call, it covers the time since the previous call.
+        '''
+        flushes = self.stats['flushes']
+        ret = {
+            'queue_depth': len(self.queue),
+            'queue_max_size': self.queue.max_size,
+            'overflow': self.queue.overflow,
+            'dropped': self.queue.dropped,
+            'spilled': self.queue.spilled,
+            'spill_depth': self.queue.spill_depth,
+            'flushes': flushes,
+            'flushed_events': self.stats['flushed_events'],
+            'flush_errors': self.stats['flush_errors'],
+            'flush_latency_last': self.stats['flush_latency_last'],
+            'flush_latency_max': self.stats['flush_latency_max'],
+            'flush_latency_avg':
+                self.stats['flush_latency_total'] / flushes if flushes else 0,
+        }
+        self.stats['flush_latency_max'] = 0
+        return ret
+
     def run(self):
         '''
         Spin up the multiprocess event returner
         '''
         salt.utils.process.appendproctitle(self.__class__.__name__)
         self.event = get_event('master', opts=self.opts, listen=True)
-        events = self.event.iter_events(full=True)
         self.event.fire_event({}, 'salt/event_listen/start')
+        flusher = threading.Thread(target=self._flush_loop)
+        flusher.daemon = True
+        flusher.start()
+        next_stats = time.time() + self.stats_interval
         try:
-            for event in events:
-                if event['tag'] == 'salt/event/exit':
-                    self.stop = True
-                if self._filter(event):
-                    self.event_queue.append(event)
-                if len(self.event_queue) >= self.event_return_queue:
-                    self.flush_events()
-                if self.stop:
-                    break
+            while not self.stop:
+                # Do not block on the event bus for long, the statistics are
+                # published even while it is idle
+                event = self.event.get_event(wait=1, full=True)
+                if event is not None:
+                    if event['tag'] == 'salt/event/exit':
+                        self.stop = True
+                    if self._filter(event):
+                        self.queue.put(event)
+                if self.stats_interval and time.time() >= next_stats:
+                    self.event.fire_event(self.get_stats(),
+                                          'salt/event_return/stats')
+                    next_stats = time.time() + self.stats_interval
         finally:  # flush all we have at this moment
-            if self.event_queue:
-                self.flush_events()
+            self.queue.close()
+            flusher.join()
 
     def _filter(self, event):
         '''
@@ -6,6 +6,7 @@ Jinja loading utils to enable a more powerful backend for jinja templates
 # Import python libs
 from __future__ import absolute_import, unicode_literals
 import collections
+import contextlib
 import logging
 import os.path
 import pipes
@@ -18,6 +19,8 @@ from xml.etree.ElementTree import Element, SubElement, tostring
 
 # Import third party libs
 import jinja2
+import jinja2.bccache
+import jinja2.meta
 from salt.ext import six
 from jinja2 import BaseLoader, Markup, TemplateNotFound, nodes
 from jinja2.environment import TemplateModule
@@ -27,12 +30,14 @@ from jinja2.ext import Extension
 # Import salt libs
 from salt.exceptions import TemplateError
 import salt.fileclient
+import salt.utils.atomicfile
 import salt.utils.data
 import salt.utils.files
 import salt.utils.json
 import salt.utils.stringutils
 import salt.utils.url
 import salt.utils.yaml
+import salt.version
 from salt.utils.decorators.jinja import jinja_filter, jinja_test, jinja_global
 from salt.utils.odict import OrderedDict
 
@@ -46,6 +51,44 @@ __all__ = [
 GLOBAL_UUID = uuid.UUID('91633EBF-1C86-5E33-935A-28061F4B480E')
 
 
+@contextlib.contextmanager
+def record_templates():
+    '''
+    Record the templates loaded by the SaltCacheLoader instances within the
+    context, as a list of ``(saltenv, template)`` tuples.
+    '''
+    loaded = []
+    SaltCacheLoader.recorders.append(loaded)
+    try:
+        yield loaded
+    finally:
+        SaltCacheLoader.recorders.remove(loaded)
+
+
+def find_context_names(source, **env_args):
+    '''
+    Parse a jinja template and return the names of the variables it reads
+    from its context and the names of the filters it uses, as two sets. The
+    ``env_args`` are passed to the jinja environment used to parse the
+    template, so that custom delimiters are honored.
+
+    Returns None if the template cannot be parsed.
+    '''
+    extensions = []
+    for name in ('with_', 'do', 'loopcontrols'):
+        if hasattr(jinja2.ext, name):
+            extensions.append('jinja2.ext.{0}'.format(name))
+    extensions.append(SerializerExtension)
+    try:
+        env = jinja2.Environment(extensions=extensions, **env_args)
+        ast = env.parse(source)
+    except Exception as exc:
+        log.debug('Could not parse the jinja template: %s', exc)
+        return None
+    filters = set(node.name for node in ast.find_all(nodes.Filter))
+    return set(jinja2.meta.find_undeclared_variables(ast)), filters
+
+
 class SaltCacheLoader(BaseLoader):
     '''
     A special jinja Template Loader for salt.
@@ -54,6 +97,9 @@ class SaltCacheLoader(BaseLoader):
     Templates are cached like regular salt states
     and only loaded once per loader instance.
     '''
+    # The lists recording the loaded templates, see record_templates
+    recorders = []
+
     def __init__(self, opts, saltenv='base', encoding='utf-8',
                  pillar_rend=False):
         self.opts = opts
@@ -107,6 +153,8 @@ class SaltCacheLoader(BaseLoader):
             raise TemplateNotFound(template)
 
         self.check_cache(template)
+        for recorder in self.recorders:
+            recorder.append((self.saltenv, template))
 
         if environment and template:
             tpldir = os.path.dirname(template).replace('\\', '/')
@@ -140,6 +188,126 @@ class SaltCacheLoader(BaseLoader):
         raise TemplateNotFound(template)
 
 
+class SaltBytecodeCache(jinja2.FileSystemBytecodeCache):
+    '''
+    A jinja bytecode cache persisted in the ``jinja`` directory of the
+    cachedir, so that the templates, and the macro libraries they import, are
+    compiled once instead of on every render.
+
+    The compiled templates are looked up by the signature of the environment
+    which compiled them and by the versions of Salt and Jinja, and are
+    compiled again when the checksum of their source changed. The bytecode is
+    also kept in memory for the next renders of the process.
+
+    At most ``max_files`` templates are kept in the directory, the least
+    recently used ones are removed when a new template is dumped.
+    '''
+    # The bytecode loaded or dumped by this process, by cache key
+    memory = {}
+    max_memory = 1000
+    max_files = 1000
+
+    def __init__(self, opts, signature=''):
+        directory = os.path.join(opts['cachedir'], 'jinja')
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory, 0o700)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+        super(SaltBytecodeCache, self).__init__(directory,
+                                                '__salt_jinja_%s.cache')
+        self.signature = '{0}|{1}|{2}'.format(
+            salt.version.__version__, jinja2.__version__, signature)
+
+    def get_cache_key(self, name, filename=None):
+        return super(SaltBytecodeCache, self).get_cache_key(
+            '{0}|{1}'.format(self.signature, name), filename)
+
+    def load_bytecode(self, bucket):
+        data = self.memory.get(bucket.key)
+        try:
+            if data is not None:
+                bucket.bytecode_from_string(data)
+                return
+            super(SaltBytecodeCache, self).load_bytecode(bucket)
+        except Exception:
+            # A corrupted cache file, compile the template again
+            log.debug('Unable to load the bytecode of %s', bucket.key,
+                      exc_info=True)
+            bucket.reset()
+            return
+        if bucket.code is not None:
+            self._remember(bucket)
+            try:
+                # Keep the template from being pruned as least recently used
+                os.utime(self._get_cache_filename(bucket), None)
+            except OSError:
+                pass
+
+    def dump_bytecode(self, bucket):
+        self._remember(bucket)
+        try:
+            with salt.utils.atomicfile.atomic_open(
+                    self._get_cache_filename(bucket), 'wb') as fp_:
+                bucket.write_bytecode(fp_)
+        except (IOError, OSError) as exc:
+            log.debug('Unable to write the bytecode of %s: %s', bucket.key, exc)
+            return
+        self._prune()
+
+    def _prune(self):
+        '''
+        Remove the least recently used templates above max_files
+        '''
+        prefix, suffix = self.pattern.split('%s', 1)
+        try:
+            fnames = [fname for fname in os.listdir(self.directory)
+                      if fname.startswith(prefix) and fname.endswith(suffix)]
+        except OSError:
+            return
+        if len(fnames) <= self.max_files:
+            return
+        mtimes = []
+        for fname in fnames:
+            path = os.path.join(self.directory, fname)
+            try:
+                mtimes.append((os.stat(path).st_mtime, path))
+            except OSError:
+                continue
+        mtimes.sort()
+        for _, path in mtimes[:len(mtimes) - self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _remember(self, bucket):
+        if len(self.memory) >= self.max_memory:
+            self.memory.clear()
+        self.memory[bucket.key] = bucket.bytecode_to_string()
+
+
+def from_string(environment, source, name=None):
+    '''
+    Load a template from a string like ``environment.from_string``, through
+    the bytecode cache of the environment if it has one. The template is
+    cached under its ``name``, e.g. its path, and the checksum of its source.
+    '''
+    cache = environment.bytecode_cache
+    if cache is None:
+        return environment.from_string(source)
+    checksum = cache.get_source_checksum(source)
+    key = cache.get_cache_key('{0}|{1}'.format(name or '<template>', checksum))
+    bucket = jinja2.bccache.Bucket(environment, key, checksum)
+    cache.load_bytecode(bucket)
+    if bucket.code is None:
+        bucket.code = environment.compile(source)
+        cache.set_bucket(bucket)
+    return environment.template_class.from_code(
+        environment, bucket.code, environment.make_globals(None), None)
+
+
 class PrintableDict(OrderedDict):
     '''
     Ensures that dict str() and repr() are YAML friendly.
@@ -8,6 +8,8 @@ from __future__ import absolute_import, unicode_literals
 import os
 import logging
 import threading
+import collections
+import multiprocessing
 
 # Import Salt Libs
 import salt.payload
@@ -15,6 +17,10 @@ import salt.utils.files
 import salt.utils.platform
 import salt.utils.process
 
+# Import 3rd-party libs
+from salt.ext import six
+from salt.ext.six.moves import queue  # pylint: disable=import-error
+
 log = logging.getLogger(__name__)
 
 
@@ -144,3 +150,181 @@ def _check_cmdline(data):
                 return True
     except (OSError, IOError):
         return False
+
+
+class JobWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
+    '''
+    A long lived process running the jobs published to a minion, forked
+    with the modules of the minion already loaded.
+
+    Jobs are received on the ``jobs`` connection, and the PID of the worker
+    is put on the ``done`` queue when a job is finished.
+    '''
+    def __init__(self, minion, jobs, done, **kwargs):
+        super(JobWorker, self).__init__(**kwargs)
+        self.minion = minion
+        self.jobs = jobs
+        self.done = done
+
+    def run(self):
+        salt.utils.process.appendproctitle(self.__class__.__name__)
+        # The jobs run in this process the way they run in the threads of a
+        # minion without multiprocessing, they do not daemonize
+        opts = dict(self.minion.opts, multiprocessing=False)
+        while True:
+            try:
+                job = self.jobs.recv()
+            except EOFError:
+                break
+            if job is None:
+                break
+            data, self.minion.connected = job
+            self._run_job(opts, data)
+            self.done.put(os.getpid())
+
+    def _run_job(self, opts, data):
+        '''
+        Run a single job
+        '''
+        if salt.utils.process.HAS_SETPROCTITLE:
+            title = salt.utils.process.setproctitle.getproctitle()
+        try:
+            self.minion._target(self.minion, opts, data, self.minion.connected)
+        except Exception:
+            log.exception('Job %s failed in the job worker', data.get('jid'))
+        finally:
+            # The job is over, even if it could not be returned
+            try:
+                os.remove(os.path.join(self.minion.proc_dir, data['jid']))
+            except (OSError, IOError):
+                pass
+            if salt.utils.process.HAS_SETPROCTITLE:
+                salt.utils.process.setproctitle.setproctitle(title)
+
+
+class JobWorkerPool(object):
+    '''
+    A pool of JobWorker processes running the jobs published to a minion.
+
+    A job is sent to an idle worker, or queued until one is idle, so the
+    number of jobs running at once is bounded by the size of the pool.
+    Workers are replaced after running ``max_jobs`` jobs, and once they are
+    idle after a call to ``recycle``.
+    '''
+    def __init__(self, minion, size, max_jobs=0):
+        self.minion = minion
+        self.size = size
+        self.max_jobs = max_jobs
+        self.done = multiprocessing.Queue()
+        self.pending = collections.deque()
+        self.generation = 0
+        # The workers by PID
+        self.workers = {}
+        self.retired = []
+
+    def dispatch(self, data):
+        '''
+        Run a job in the pool
+        '''
+        self.pending.append(data)
+        self.maintain()
+
+    def recycle(self):
+        '''
+        Replace all of the workers, once they are done with their current
+        job. Used when the modules, grains or pillar of the minion changed.
+        '''
+        self.generation += 1
+        self.maintain()
+
+    def maintain(self):
+        '''
+        Reap the exited workers, replace the retired ones and send the
+        queued jobs to the idle workers
+        '''
+        while True:
+            try:
+                pid = self.done.get_nowait()
+            except queue.Empty:
+                break
+            if pid in self.workers:
+                self.workers[pid]['busy'] = False
+
+        self.retired = [proc for proc in self.retired if proc.is_alive()]
+        for pid, worker in list(six.iteritems(self.workers)):
+            if not worker['process'].is_alive():
+                if worker['busy']:
+                    log.warning('Job worker %s exited while running a job', pid)
+                self._remove(pid)
+            elif not worker['busy'] and (
+                    worker['generation'] != self.generation
+                    or (self.max_jobs and worker['jobs'] >= self.max_jobs)):
+                self._retire(pid)
+
+        while len(self.workers) < self.size:
+            self._spawn()
+
+        for pid, worker in list(six.iteritems(self.workers)):
+            if not self.pending:
+                break
+            if worker['busy']:
+                continue
+            try:
+                worker['conn'].send((self.pending[0], self.minion.connected))
+            except (IOError, OSError, EOFError) as exc:
+                log.warning('Could not send a job to job worker %s: %s',
+                            pid, exc)
+                self._remove(pid)
+                continue
+            self.pending.popleft()
+            worker['busy'] = True
+            worker['jobs'] += 1
+
+        if self.pending:
+            log.debug('%s jobs are waiting for an idle job worker',
+                      len(self.pending))
+
+    def _spawn(self):
+        '''
+        Start a new worker
+        '''
+        conn, worker_conn = multiprocessing.Pipe()
+        process = JobWorker(self.minion, worker_conn, self.done)
+        process.start()
+        worker_conn.close()
+        log.debug('Started job worker %s', process.pid)
+        self.workers[process.pid] = {
+            'process': process,
+            'conn': conn,
+            'busy': False,
+            'jobs': 0,
+            'generation': self.generation,
+        }
+
+    def _retire(self, pid):
+        '''
+        Stop an idle worker
+        '''
+        worker = self.workers.pop(pid)
+        try:
+            worker['conn'].send(None)
+        except (IOError, OSError, EOFError):
+            pass
+        worker['conn'].close()
+        self.retired.append(worker['process'])
+
+    def _remove(self, pid):
+        '''
+        Forget about an exited worker
+        '''
+        worker = self.workers.pop(pid)
+        worker['conn'].close()
+        worker['process'].join(0)
+
+    def stop(self):
+        '''
+        Stop the workers once they are done with their current job
+        '''
+        for pid in list(self.workers):
+            self._retire(pid)
+        self.pending.clear()
@@ -9,6 +9,7 @@ from __future__ import absolute_import, unicode_literals
 import os
 import fnmatch
 import re
+import time
 import logging
 
 # Import salt libs
@@ -182,6 +183,395 @@ def nodegroup_comp(nodegroup, nodegroups, skip=None, first_call=True):
         return ret
 
 
+# Parsed compound targets, keyed by the tuple of words of the expression
+_COMPOUND_CACHE = {}
+_COMPOUND_CACHE_SIZE = 1024
+
+
+class _CompoundParser(object):
+    '''
+    Recursive descent parser turning the words of a compound target into a
+    tree of tuples:
+
+    - ``('or', left, right)``
+    - ``('and', left, right)``
+    - ``('not', operand)``
+    - ``('target', engine, pattern, delimiter)``
+
+    ``and`` binds tighter than ``or``, ``not`` applies to the next target or
+    parenthesized group and implies an ``and`` when it directly follows a
+    target. Parentheses left open at the end of the expression are closed.
+    '''
+    def __init__(self, words):
+        self.words = words
+        self.pos = 0
+
+    def parse(self):
+        if not self.words:
+            raise ValueError('empty expression')
+        tree = self._or()
+        if self.pos != len(self.words):
+            raise ValueError(
+                'unexpected "{0}"'.format(self.words[self.pos])
+            )
+        return tree
+
+    def _peek(self):
+        if self.pos < len(self.words):
+            return self.words[self.pos]
+        return None
+
+    def _or(self):
+        tree = self._and()
+        while self._peek() == 'or':
+            self.pos += 1
+            tree = ('or', tree, self._and())
+        return tree
+
+    def _and(self):
+        tree = self._not()
+        while self._peek() in ('and', 'not'):
+            if self._peek() == 'and':
+                self.pos += 1
+            tree = ('and', tree, self._not())
+        return tree
+
+    def _not(self):
+        if self._peek() == 'not':
+            self.pos += 1
+            if self._peek() == 'not':
+                raise ValueError('unexpected "not" after "not"')
+            return ('not', self._primary())
+        return self._primary()
+
+    def _primary(self):
+        word = self._peek()
+        if word is None:
+            raise ValueError('unexpected end of expression')
+        self.pos += 1
+        if word == '(':
+            tree = self._or()
+            if self._peek() == ')':
+                self.pos += 1
+            return tree
+        if word in ('and', 'or', ')'):
+            raise ValueError('unexpected "{0}"'.format(word))
+        target_info = parse_target(word)
+        if target_info['engine'] == 'N':
+            # Nodegroups should already be expanded/resolved to other engines
+            raise ValueError(
+                'detected nodegroup expansion failure of "{0}"'.format(word)
+            )
+        return ('target',
+                target_info['engine'],
+                target_info['pattern'],
+                target_info['delimiter'])
+
+
+def compile_compound(expr):
+    '''
+    Parse the compound target ``expr`` (a string or a list of words, as
+    returned by :py:func:`nodegroup_comp`) into the tree evaluated by
+    :py:meth:`CkMinions._check_compound_minions`. Parsed expressions are
+    cached, ``None`` is returned for invalid expressions.
+    '''
+    if isinstance(expr, six.string_types):
+        words = tuple(expr.split())
+    else:
+        words = tuple(six.text_type(word) for word in expr)
+    try:
+        return _COMPOUND_CACHE[words]
+    except KeyError:
+        pass
+    try:
+        tree = _CompoundParser(words).parse()
+    except ValueError as exc:
+        log.error('Invalid compound target: %s (%s)', expr, exc)
+        tree = None
+    if len(_COMPOUND_CACHE) >= _COMPOUND_CACHE_SIZE:
+        _COMPOUND_CACHE.clear()
+    _COMPOUND_CACHE[words] = tree
+    return tree
+
+
+_INDEX_SCALARS = (six.string_types, six.integer_types, float, bool, type(None))
+
+# Per-process registry of minion data indexes, keyed by cache driver and
+# cachedir so that every CkMinions instance in a worker shares one index.
+_DATA_INDEXES = {}
+
+
+def get_minion_data_index(opts, cache=None):
+    '''
+    Return the minion data index shared by this process for the cache
+    configured in ``opts``
+    '''
+    key = (opts.get('cache', 'localfs'), opts.get('cachedir'))
+    if key not in _DATA_INDEXES:
+        _DATA_INDEXES[key] = MinionDataIndex(opts, cache=cache)
+    return _DATA_INDEXES[key]
+
+
+class MinionDataIndex(object):
+    '''
+    In-memory inverted index over the grains and pillar stored in the minion
+    data cache.
+
+    For every key path reached through nested dicts the index maps the
+    lowercased text of each scalar value (or scalar list member) to the set of
+    minion ids holding it, and the keys of every dict to the minions having
+    them. Grain and pillar targeting therefore becomes a set lookup for exact
+    values, and glob/regex patterns only have to be compared against the
+    distinct values seen at a path instead of against every minion.
+
+    Data shapes the index cannot answer exactly (lists holding dicts or other
+    lists, and paths traversing into lists) are remembered per path, and the
+    minions concerned are matched with :py:func:`salt.utils.data.subdict_match`
+    against their cached data.
+    '''
+    def __init__(self, opts, cache=None):
+        self.opts = opts
+        self.cache = cache if cache is not None else salt.cache.factory(opts)
+        self.interval = opts.get('minion_data_cache_index_interval', 10)
+        self._last_refresh = None
+        self._stamps = {}
+        # minion id -> list of (table, search type, path, item) it is part of
+        self._entries = {}
+        # search type -> path -> lowercased value -> minion ids
+        self._values = {}
+        # search type -> path -> dict key -> minion ids
+        self._keys = {}
+        # search type -> path -> minion ids with a list at the path
+        self._lists = {}
+        # search type -> path -> minion ids with a non-scalar list member
+        self._complex = {}
+
+    @property
+    def minions(self):
+        '''
+        The set of minion ids which have data in the index
+        '''
+        return set(self._entries)
+
+    def refresh(self, force=False):
+        '''
+        Synchronize the index with the minion data cache. Only entries whose
+        last update time changed are fetched again. Unless ``force`` is set,
+        this is done at most once per ``minion_data_cache_index_interval``
+        seconds.
+        '''
+        now = time.time()
+        if not force and self._last_refresh is not None \
+                and now - self._last_refresh < self.interval:
+            return
+        self._last_refresh = now
+        cached = set(self.cache.list('minions') or [])
+        for id_ in set(self._stamps) - cached:
+            self.remove(id_)
+        for id_ in cached:
+            bank = 'minions/{0}'.format(id_)
+            try:
+                stamp = self.cache.updated(bank, 'data')
+            except SaltCacheError:
+                continue
+            if stamp is not None and id_ in self._stamps \
+                    and stamp == self._stamps[id_]:
+                continue
+            try:
+                data = self.cache.fetch(bank, 'data')
+            except SaltCacheError:
+                continue
+            self.update(id_, data, stamp=stamp, now=now)
+
+    def update(self, minion_id, data, stamp=None, now=None):
+        '''
+        Replace the indexed data of ``minion_id`` with ``data``, the dict
+        holding the ``grains`` and ``pillar`` stored in the minion data cache
+        '''
+        self.remove(minion_id)
+        if now is None:
+            now = time.time()
+        # Cache drivers report the update time with a one second resolution,
+        # a stamp from the current second could hide a later write to the same
+        # entry, so have it fetched again on the next refresh.
+        if stamp is not None and stamp >= int(now):
+            stamp = None
+        self._stamps[minion_id] = stamp
+        if data is None:
+            return
+        entries = self._entries[minion_id] = []
+        for search_type in ('grains', 'pillar'):
+            search_data = data.get(search_type)
+            if isinstance(search_data, dict):
+                self._add(entries, minion_id, search_type, (), search_data)
+
+    def remove(self, minion_id):
+        '''
+        Drop ``minion_id`` from the index
+        '''
+        self._stamps.pop(minion_id, None)
+        for table, search_type, path, item in self._entries.pop(minion_id, ()):
+            paths = table[search_type]
+            if item is None:
+                paths[path].discard(minion_id)
+                if not paths[path]:
+                    del paths[path]
+                continue
+            items = paths[path]
+            items[item].discard(minion_id)
+            if not items[item]:
+                del items[item]
+            if not items:
+                del paths[path]
+
+    def _add(self, entries, minion_id, search_type, path, node):
+        '''
+        Recursively index ``node`` found at ``path``
+        '''
+        if isinstance(node, dict):
+            for key, value in six.iteritems(node):
+                if not isinstance(key, six.string_types):
+                    continue
+                self._add_item(entries, minion_id, self._keys, search_type, path, key)
+                self._add(entries, minion_id, search_type, path + (key,), value)
+        elif isinstance(node, (list, tuple)):
+            self._add_item(entries, minion_id, self._lists, search_type, path)
+            if all(isinstance(item, _INDEX_SCALARS) for item in node):
+                for item in node:
+                    self._add_item(entries,
+                                   minion_id,
+                                   self._values,
+                                   search_type,
+                                   path,
+                                   six.text_type(item).lower())
+            else:
+                self._add_item(entries, minion_id, self._complex, search_type, path)
+        else:
+            self._add_item(entries,
+                           minion_id,
+                           self._values,
+                           search_type,
+                           path,
+                           six.text_type(node).lower())
+
+    @staticmethod
+    def _add_item(entries, minion_id, table, search_type, path, item=None):
+        paths = table.setdefault(search_type, {})
+        if item is None:
+            ids = paths.setdefault(path, set())
+        else:
+            ids = paths.setdefault(path, {}).setdefault(item, set())
+        if minion_id not in ids:
+            ids.add(minion_id)
+            entries.append((table, search_type, path, item))
+
+    def match(self,
+              search_type,
+              expr,
+              delimiter=DEFAULT_TARGET_DELIM,
+              regex_match=False,
+              exact_match=False):
+        '''
+        Return the set of indexed minions for which
+        :py:func:`salt.utils.data.subdict_match` would match ``expr`` against
+        their ``search_type`` data
+        '''
+        matched = set()
+        fallback = set()
+        self._match(search_type,
+                    (),
+                    expr,
+                    delimiter,
+                    regex_match,
+                    exact_match,
+                    matched,
+                    fallback)
+        for id_ in fallback - matched:
+            try:
+                data = self.cache.fetch('minions/{0}'.format(id_), 'data')
+            except SaltCacheError:
+                continue
+            if data is None:
+                continue
+            if salt.utils.data.subdict_match(data.get(search_type),
+                                             expr,
+                                             delimiter=delimiter,
+                                             regex_match=regex_match,
+                                             exact_match=exact_match):
+                matched.add(id_)
+        return matched
+
+    def _match(self,
+               search_type,
+               base,
+               expr,
+               delimiter,
+               regex_match,
+               exact_match,
+               matched,
+               fallback):
+        '''
+        Mirror the key/pattern splitting done by ``subdict_match`` below the
+        key path ``base``, adding exact results to ``matched`` and the minions
+        which have to be checked against their data to ``fallback``
+        '''
+        splits = expr.split(delimiter)
+        lists = self._lists.get(search_type, {})
+        complex_ = self._complex.get(search_type, {})
+        values = self._values.get(search_type, {})
+        keys = self._keys.get(search_type, {})
+        for idx in range(1, len(splits)):
+            path = base + tuple(splits[:idx])
+            pattern = delimiter.join(splits[idx:])
+            # Minions holding a list on the way to the path are traversed by
+            # list index or embedded dicts, leave those to subdict_match
+            for depth in range(len(path)):
+                fallback.update(lists.get(path[:depth], ()))
+            fallback.update(complex_.get(path, ()))
+            if path in values:
+                for value in self._match_values(values[path],
+                                                pattern,
+                                                regex_match,
+                                                exact_match):
+                    matched.update(values[path][value])
+            if path in keys:
+                if pattern.startswith('*:'):
+                    for entries in six.itervalues(keys[path]):
+                        fallback.update(entries)
+                    continue
+                if pattern == '*':
+                    for entries in six.itervalues(keys[path]):
+                        matched.update(entries)
+                    continue
+                matched.update(keys[path].get(pattern, ()))
+                if DEFAULT_TARGET_DELIM in pattern:
+                    self._match(search_type,
+                                path,
+                                pattern,
+                                DEFAULT_TARGET_DELIM,
+                                regex_match,
+                                exact_match,
+                                matched,
+                                fallback)
+
+    @staticmethod
+    def _match_values(values, pattern, regex_match, exact_match):
+        '''
+        Return the distinct indexed values matched by ``pattern``
+        '''
+        pattern = pattern.lower()
+        if regex_match:
+            try:
+                regex = re.compile(pattern)
+            except Exception:
+                log.error('Invalid regex \'%s\' in match', pattern)
+                return []
+            return [value for value in values if regex.match(value)]
+        if exact_match or not any(char in pattern for char in '*?['):
+            return [pattern] if pattern in values else []
+        return fnmatch.filter(values, pattern)
+
+
 class CkMinions(object):
     '''
     Used to check what minions should respond from a target
@@ -201,6 +591,15 @@ class CkMinions(object):
         else:
             self.acc = 'accepted'
 
+    def update_data_index(self, minion_id, data):
+        '''
+        Update the minion data index, when enabled, with the data which was
+        just stored in the minion data cache for ``minion_id``
+        '''
+        if self.opts.get('minion_data_cache', False) \
+                and self.opts.get('minion_data_cache_index', False):
+            get_minion_data_index(self.opts, self.cache).update(minion_id, data)
+
     def _check_nodegroup_minions(self, expr, greedy):  # pylint: disable=unused-argument
         '''
         Return minions found by looking at nodegroups
@@ -290,7 +689,21 @@ class CkMinions(object):
             return {'minions': [],
                     'missing': []}
 
-        if cache_enabled:
+        if cache_enabled and self.opts.get('minion_data_cache_index', False):
+            index = get_minion_data_index(self.opts, self.cache)
+            index.refresh()
+            matched = index.match(search_type,
+                                  expr,
+                                  delimiter=delimiter,
+                                  regex_match=regex_match,
+                                  exact_match=exact_match)
+            if greedy:
+                indexed = index.minions
+                minions = [id_ for id_ in minions
+                           if id_ in matched or id_ not in indexed]
+            else:
+                minions = list(matched)
+        elif cache_enabled:
             if greedy:
                 cminions = list_cached_minions()
             else:
@@ -476,12 +889,15 @@ class CkMinions(object):
         log.debug('minions: %s', minions)
 
         if self.opts.get('minion_data_cache', False):
+            tree = compile_compound(expr)
+            if tree is None:
+                return {'minions': [], 'missing': []}
+
             ref = {'G': self._check_grain_minions,
                    'P': self._check_grain_pcre_minions,
                    'I': self._check_pillar_minions,
                    'J': self._check_pillar_pcre_minions,
                    'L': self._check_list_minions,
-                   'N': None,    # nodegroups should already be expanded
                    'S': self._check_ipcidr_minions,
                    'E': self._check_pcre_minions,
                    'R': self._all_minions}
@@ -489,123 +905,46 @@ class CkMinions(object):
                 ref['I'] = self._check_pillar_exact_minions
                 ref['J'] = self._check_pillar_exact_minions
 
-            results = []
-            unmatched = []
-            opers = ['and', 'or', 'not', '(', ')']
             missing = []
-
-            if isinstance(expr, six.string_types):
-                words = expr.split()
-            else:
-                words = expr
-
-            for word in words:
-                target_info = parse_target(word)
-
-                # Easy check first
-                if word in opers:
-                    if results:
-                        if results[-1] == '(' and word in ('and', 'or'):
-                            log.error('Invalid beginning operator after "(": %s', word)
-                            return {'minions': [], 'missing': []}
-                        if word == 'not':
-                            if not results[-1] in ('&', '|', '('):
-                                results.append('&')
-                            results.append('(')
-                            results.append(six.text_type(set(minions)))
-                            results.append('-')
-                            unmatched.append('-')
-                        elif word == 'and':
-                            results.append('&')
-                        elif word == 'or':
-                            results.append('|')
-                        elif word == '(':
-                            results.append(word)
-                            unmatched.append(word)
-                        elif word == ')':
-                            if not unmatched or unmatched[-1] != '(':
-                                log.error('Invalid compound expr (unexpected '
-                                          'right parenthesis): %s',
-                                          expr)
-                                return {'minions': [], 'missing': []}
-                            results.append(word)
-                            unmatched.pop()
-                            if unmatched and unmatched[-1] == '-':
-                                results.append(')')
-                                unmatched.pop()
-                        else:  # Won't get here, unless oper is added
-                            log.error('Unhandled oper in compound expr: %s',
-                                      expr)
-                            return {'minions': [], 'missing': []}
-                    else:
-                        # seq start with oper, fail
-                        if word == 'not':
-                            results.append('(')
-                            results.append(six.text_type(set(minions)))
-                            results.append('-')
-                            unmatched.append('-')
-                        elif word == '(':
-                            results.append(word)
-                            unmatched.append(word)
-                        else:
-                            log.error(
-                                'Expression may begin with'
-                                ' binary operator: %s', word
-                            )
-                            return {'minions': [], 'missing': []}
-
-                elif target_info and target_info['engine']:
-                    if 'N' == target_info['engine']:
-                        # Nodegroups should already be expanded/resolved to other engines
-                        log.error('Detected nodegroup expansion failure of "%s"', word)
-                        return {'minions': [], 'missing': []}
-                    engine = ref.get(target_info['engine'])
-                    if not engine:
-                        # If an unknown engine is called at any time, fail out
-                        log.error(
-                            'Unrecognized target engine "%s" for'
-                            ' target expression "%s"',
-                            target_info['engine'],
-                            word,
-                        )
-                        return {'minions': [], 'missing': []}
-
-                    engine_args = [target_info['pattern']]
-                    if target_info['engine'] in ('G', 'P', 'I', 'J'):
-                        engine_args.append(target_info['delimiter'] or ':')
-                    engine_args.append(greedy)
-
-                    _results = engine(*engine_args)
-                    results.append(six.text_type(set(_results['minions'])))
-                    missing.extend(_results['missing'])
-                    if unmatched and unmatched[-1] == '-':
-                        results.append(')')
-                        unmatched.pop()
-
-                else:
-                    # The match is not explicitly defined, evaluate as a glob
-                    _results = self._check_glob_minions(word, True)
-                    results.append(six.text_type(set(_results['minions'])))
-                    if unmatched and unmatched[-1] == '-':
-                        results.append(')')
-                        unmatched.pop()
-
-            # Add a closing ')' for each item left in unmatched
-            results.extend([')' for item in unmatched])
-
-            results = ' '.join(results)
-            log.debug('Evaluating final compound matching expr: %s',
-                      results)
-            try:
-                minions = list(eval(results))  # pylint: disable=W0123
-                return {'minions': minions, 'missing': missing}
-            except Exception:
-                log.error('Invalid compound target: %s', expr)
-                return {'minions': [], 'missing': []}
+            minions = self._eval_compound(tree, ref, greedy, minions, missing, {})
+            return {'minions': list(minions), 'missing': missing}
 
         return {'minions': list(minions),
                 'missing': []}
 
+    def _eval_compound(self, tree, ref, greedy, minions, missing, results):
+        '''
+        Evaluate a tree returned by :py:func:`compile_compound` with set
+        operations over the minions matched by each target. ``minions`` is the
+        set of all minions, ``not`` matches its difference with the operand.
+        Results of targets appearing more than once are taken from
+        ``results``.
+        '''
+        oper = tree[0]
+        if oper == 'or':
+            return self._eval_compound(tree[1], ref, greedy, minions, missing, results) | \
+                self._eval_compound(tree[2], ref, greedy, minions, missing, results)
+        if oper == 'and':
+            return self._eval_compound(tree[1], ref, greedy, minions, missing, results) & \
+                self._eval_compound(tree[2], ref, greedy, minions, missing, results)
+        if oper == 'not':
+            return minions - self._eval_compound(tree[1], ref, greedy, minions, missing, results)
+
+        if tree not in results:
+            _, engine, pattern, delimiter = tree
+            if engine is None:
+                # The match is not explicitly defined, evaluate as a glob
+                _results = self._check_glob_minions(pattern, True)
+            else:
+                engine_args = [pattern]
+                if engine in ('G', 'P', 'I', 'J'):
+                    engine_args.append(delimiter or ':')
+                engine_args.append(greedy)
+                _results = ref[engine](*engine_args)
+            missing.extend(_results['missing'])
+            results[tree] = set(_results['minions'])
+        return results[tree]
+
     def connected_ids(self, subset=None, show_ipv4=False, include_localhost=False):
         '''
         Return a set of all connected minion ids, optionally within a subset
@@ -2928,6 +2928,17 @@ class SaltSSHOptionParser(six.with_metaclass(OptionParserMeta,
                  'time to manage connections, the more running processes the '
                  'faster communication should be. Default: %default.'
         )
+        self.add_option(
+            '--max-sessions',
+            dest='ssh_max_sessions',
+            default=256,
+            type=int,
+            help='Set the number of concurrent ssh sessions driven through '
+                 'non-blocking pipes. The minions which need a password, a '
+                 'tty or a wrapper function are communicated with by the '
+                 'processes limited by --max-procs instead. '
+                 'Default: %default.'
+        )
         self.add_option(
             '--extra-filerefs',
             dest='extra_filerefs',
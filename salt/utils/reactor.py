@@ -137,6 +137,20 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
                     reactors.extend(val)
         return reactors
 
+    def tag_prefixes(self):
+        '''
+        Return the prefixes of the tags of the events the reactor handles, or
+        None if the reactor map is read from a file at every event
+        '''
+        if isinstance(self.opts['reactor'], six.string_types):
+            return None
+        prefixes = ['salt/reactors/manage/']
+        for ropt in self.opts['reactor']:
+            if isinstance(ropt, dict) and len(ropt) == 1:
+                prefixes.append(salt.utils.event.tag_prefix(
+                    next(six.iterkeys(ropt)), 'fnmatch'))
+        return prefixes
+
     def list_all(self):
         '''
         Return a list of the reactors
@@ -241,6 +255,8 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
                 opts=self.opts,
                 listen=True)
         self.wrap = ReactWrap(self.opts)
+        # Have the publisher only send the events the reactor handles
+        self.event.set_tag_prefixes(self.tag_prefixes())
 
         for data in self.event.iter_events(full=True):
             # skip all events fired by ourselves
@@ -249,12 +265,14 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
             if data['tag'].endswith('salt/reactors/manage/add'):
                 _data = data['data']
                 res = self.add_reactor(_data['event'], _data['reactors'])
+                self.event.set_tag_prefixes(self.tag_prefixes())
                 self.event.fire_event({'reactors': self.list_all(),
                                        'result': res},
                                       'salt/reactors/manage/add-complete')
             elif data['tag'].endswith('salt/reactors/manage/delete'):
                 _data = data['data']
                 res = self.delete_reactor(_data['event'])
+                self.event.set_tag_prefixes(self.tag_prefixes())
                 self.event.fire_event({'reactors': self.list_all(),
                                        'result': res},
                                       'salt/reactors/manage/delete-complete')
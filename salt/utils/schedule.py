@@ -22,6 +22,7 @@ import itertools
 import threading
 import logging
 import errno
+import heapq
 import random
 import weakref
 
@@ -148,6 +149,12 @@ class Schedule(object):
         self.schedule_returner = self.option('schedule_returner')
         # Keep track of the lowest loop interval needed in this variable
         self.loop_interval = six.MAXSIZE
+        # The jobs are only evaluated again once their next fire time is due,
+        # see _due_jobs and _push_fire_time
+        self._fire_heap = []
+        self._fire_times = {}
+        self._fire_token = None
+        self._fire_last = None
         if not self.standalone:
             clean_proc_dir(opts)
         if cleanup:
@@ -289,6 +296,7 @@ class Schedule(object):
         # remove from self.intervals
         if name in self.intervals:
             del self.intervals[name]
+        self._fire_times.pop(name, None)
 
         if persist:
             self.persist()
@@ -302,6 +310,7 @@ class Schedule(object):
         self.enabled = True
         self.splay = None
         self.opts['schedule'] = {}
+        self._reset_fire_times()
 
     def delete_job_prefix(self, name, persist=True):
         '''
@@ -325,6 +334,9 @@ class Schedule(object):
         for job in list(self.intervals.keys()):
             if job.startswith(name):
                 del self.intervals[job]
+        for job in list(self._fire_times):
+            if job.startswith(name):
+                del self._fire_times[job]
 
         if persist:
             self.persist()
@@ -361,6 +373,7 @@ class Schedule(object):
         else:
             log.info('Added new job %s to scheduler', new_job)
             self.opts['schedule'].update(data)
+        self._fire_times.pop(new_job, None)
 
         # Fire the complete event back along with updated list of schedule
         evt = salt.utils.event.get_event('minion', opts=self.opts, listen=False)
@@ -378,6 +391,7 @@ class Schedule(object):
         # ensure job exists, then enable it
         if name in self.opts['schedule']:
             self.opts['schedule'][name]['enabled'] = True
+            self._fire_times.pop(name, None)
             log.info('Enabling job %s in scheduler', name)
         elif name in self._get_schedule(include_opts=False):
             log.warning("Cannot modify job %s, it's in the pillar!", name)
@@ -398,6 +412,7 @@ class Schedule(object):
         # ensure job exists, then disable it
         if name in self.opts['schedule']:
             self.opts['schedule'][name]['enabled'] = False
+            self._fire_times.pop(name, None)
             log.info('Disabling job %s in scheduler', name)
         elif name in self._get_schedule(include_opts=False):
             log.warning("Cannot modify job %s, it's in the pillar!", name)
@@ -423,6 +438,7 @@ class Schedule(object):
             return
 
         self.opts['schedule'][name] = schedule
+        self._fire_times.pop(name, None)
 
         if persist:
             self.persist()
@@ -490,6 +506,7 @@ class Schedule(object):
         '''
         # Remove all jobs from self.intervals
         self.intervals = {}
+        self._reset_fire_times()
 
         if 'schedule' in schedule:
             schedule = schedule['schedule']
@@ -542,6 +559,7 @@ class Schedule(object):
                 self.opts['schedule'][name]['run_explicit'] = []
             self.opts['schedule'][name]['run_explicit'].append({'time': new_time,
                                                                 'time_fmt': time_fmt})
+            self._fire_times.pop(name, None)
 
         elif name in self._get_schedule(include_opts=False):
             log.warning("Cannot modify job %s, it's in the pillar!", name)
@@ -566,6 +584,7 @@ class Schedule(object):
                 self.opts['schedule'][name]['skip_explicit'] = []
             self.opts['schedule'][name]['skip_explicit'].append({'time': time,
                                                                  'time_fmt': time_fmt})
+            self._fire_times.pop(name, None)
 
         elif name in self._get_schedule(include_opts=False):
             log.warning("Cannot modify job %s, it's in the pillar!", name)
@@ -601,6 +620,61 @@ class Schedule(object):
         schedule = self._get_schedule()
         return schedule.get(name, {})
 
+    def seconds_until_due(self, now=None):
+        '''
+        Return the number of seconds until the next fire time of the jobs, or
+        None if no job has a fire time in the future
+        '''
+        while self._fire_heap:
+            deadline, name = self._fire_heap[0]
+            if self._fire_times.get(name, (None,))[0] == deadline:
+                if now is None:
+                    now = datetime.datetime.now()
+                return max((deadline - now).total_seconds(), 0)
+            # The job was evaluated or modified since
+            heapq.heappop(self._fire_heap)
+        return None
+
+    def _reset_fire_times(self):
+        '''
+        Have all of the jobs evaluated on the next call to eval
+        '''
+        self._fire_heap = []
+        self._fire_times = {}
+
+    def _due_jobs(self, now, token):
+        '''
+        Pop and return the names of the jobs whose next fire time is due. All
+        of the jobs are evaluated again if the global settings of the schedule
+        changed or if the clock went back.
+        '''
+        if token != self._fire_token or \
+                self._fire_last is not None and now < self._fire_last:
+            self._reset_fire_times()
+            self._fire_token = token
+        self._fire_last = now
+        due = set()
+        while self._fire_heap and self._fire_heap[0][0] <= now:
+            deadline, name = heapq.heappop(self._fire_heap)
+            if self._fire_times.get(name, (None,))[0] == deadline:
+                due.add(name)
+        return due
+
+    def _push_fire_time(self, name, data, now):
+        '''
+        Record when an evaluated job has to be evaluated again. A job whose
+        next fire time is in the future is kept in the heap and skipped until
+        then, as long as its data is not replaced or modified through the
+        Schedule methods. The other jobs are evaluated on each call to eval.
+        '''
+        deadline = data.get('_splay') or data.get('_next_fire_time')
+        if data.get('_run_on_start') or 'run_explicit' in data or \
+                not isinstance(deadline, datetime.datetime) or deadline <= now:
+            deadline = None
+        self._fire_times[name] = (deadline, data)
+        if deadline is not None:
+            heapq.heappush(self._fire_heap, (deadline, name))
+
     def handle_func(self, multiprocessing_enabled, func, data):
         '''
         Execute this method in a multiprocess or thread
@@ -1324,12 +1398,31 @@ class Schedule(object):
                    'skip_function',
                    'skip_during_range',
                    'splay']
+
+        if not now:
+            now = datetime.datetime.now()
+
+        # The "when" jobs can be looked up in the pillar and grains
+        due = self._due_jobs(now, (loop_interval,
+                                   self.enabled,
+                                   self.splay,
+                                   self.skip_function,
+                                   self.skip_during_range,
+                                   id(self.opts.get('pillar')),
+                                   id(self.opts.get('grains'))))
         for job, data in six.iteritems(schedule):
 
             # Skip anything that is a global setting
             if job in _hidden:
                 continue
 
+            # Skip the jobs which are not due yet
+            fire_time = self._fire_times.pop(job, None)
+            if fire_time is not None and fire_time[1] is data and \
+                    fire_time[0] is not None and job not in due:
+                self._fire_times[job] = fire_time
+                continue
+
             # Clear these out between runs
             for item in ['_continue',
                          '_error',
@@ -1374,9 +1467,6 @@ class Schedule(object):
                     '_run_on_start' not in data:
                 data['_run_on_start'] = True
 
-            if not now:
-                now = datetime.datetime.now()
-
             # Used for quick lookups when detecting invalid option
             # combinations.
             schedule_keys = set(data.keys())
@@ -1600,6 +1690,7 @@ class Schedule(object):
                     data['_splay'] = None
                 if '_seconds' in data:
                     data['_next_fire_time'] = now + datetime.timedelta(seconds=data['_seconds'])
+                self._push_fire_time(job, data, now)
 
     def _run_job(self, func, data):
         job_dry_run = data.get('dry_run', False)
@@ -10,6 +10,7 @@ import codecs
 import os
 import logging
 import tempfile
+import threading
 import traceback
 import sys
 
@@ -54,6 +55,10 @@ TEMPLATE_DIRNAME = os.path.join(saltpath[0], 'templates')
 SLS_ENCODING = 'utf-8'  # this one has no BOM.
 SLS_ENCODER = codecs.getencoder(SLS_ENCODING)
 
+# The jinja environments reused by the renders of each thread
+JINJA_ENVS = threading.local()
+JINJA_ENVS_MAX = 32
+
 
 class AliasedLoader(object):
     '''
@@ -288,10 +293,85 @@ def _get_jinja_error(trace, context=None):
     return line, out
 
 
+def _get_jinja_env(opts, saltenv, tmplpath, context, env_args):
+    '''
+    Return the jinja environment rendering a template, reused by the renders
+    of this thread with the same loader and environment options, so that the
+    templates and the macro libraries they import are compiled once.
+    '''
+    pillar_rend = context.get('_pillar_rend', False)
+    # The compiled templates only depend on the environment options, the
+    # environments also on what their loader reads the templates from
+    code_signature = repr(sorted(six.iteritems(env_args)))
+    signature = repr((
+        code_signature,
+        saltenv,
+        None if saltenv or not tmplpath else os.path.dirname(tmplpath),
+        pillar_rend,
+        [opts.get(key) for key in ('cachedir', 'file_client', 'master',
+                                   'file_roots', 'pillar_roots')],
+        opts.get('file_roots') is opts.get('pillar_roots'),
+    ))
+    cache = bool(opts.get('jinja_bytecode_cache', False) and 'cachedir' in opts)
+    envs = JINJA_ENVS.__dict__.setdefault('envs', {})
+    busy = JINJA_ENVS.__dict__.setdefault('busy', set())
+    key = (signature, cache)
+    if key not in envs or key in busy:
+        loader = None
+        if not saltenv:
+            if tmplpath:
+                loader = jinja2.FileSystemLoader(os.path.dirname(tmplpath))
+        else:
+            loader = salt.utils.jinja.SaltCacheLoader(opts, saltenv, pillar_rend=pillar_rend)
+        jinja_env = jinja2.Environment(loader=loader, **env_args)
+        if cache:
+            jinja_env.bytecode_cache = salt.utils.jinja.SaltBytecodeCache(
+                opts, salt.utils.hashutils.sha256_digest(code_signature))
+
+        jinja_env.tests.update(JinjaTest.salt_jinja_tests)
+        jinja_env.filters.update(JinjaFilter.salt_jinja_filters)
+        jinja_env.globals.update(JinjaGlobal.salt_jinja_globals)
+
+        # globals
+        jinja_env.globals['odict'] = OrderedDict
+        jinja_env.globals['show_full_context'] = salt.utils.jinja.show_full_context
+
+        jinja_env.tests['list'] = salt.utils.data.is_list
+
+        if key in busy:
+            # A template rendered while rendering another template, e.g. by
+            # slsutil.renderer, must not reset the environment of the latter
+            return jinja_env
+        if len(envs) >= JINJA_ENVS_MAX:
+            envs.clear()
+        envs[key] = (jinja_env, dict(jinja_env.globals))
+
+    jinja_env, env_globals = envs[key]
+    busy.add(key)
+    jinja_env.salt_env_key = key
+    # Drop the globals set by the previous render, e.g. tplfile, and load the
+    # templates again so that the fileclient fetches their updates
+    jinja_env.globals.clear()
+    jinja_env.globals.update(env_globals)
+    if jinja_env.cache is not None:
+        jinja_env.cache.clear()
+    if isinstance(jinja_env.loader, salt.utils.jinja.SaltCacheLoader):
+        jinja_env.loader.cached = []
+    return jinja_env
+
+
+def _release_jinja_env(jinja_env):
+    '''
+    Let the next render reuse the jinja environment
+    '''
+    key = getattr(jinja_env, 'salt_env_key', None)
+    if key is not None:
+        JINJA_ENVS.busy.discard(key)
+
+
 def render_jinja_tmpl(tmplstr, context, tmplpath=None):
     opts = context['opts']
     saltenv = context['saltenv']
-    loader = None
     newline = False
 
     if tmplstr and not isinstance(tmplstr, six.text_type):
@@ -301,13 +381,7 @@ def render_jinja_tmpl(tmplstr, context, tmplpath=None):
     if tmplstr.endswith(os.linesep):
         newline = True
 
-    if not saltenv:
-        if tmplpath:
-            loader = jinja2.FileSystemLoader(os.path.dirname(tmplpath))
-    else:
-        loader = salt.utils.jinja.SaltCacheLoader(opts, saltenv, pillar_rend=context.get('_pillar_rend', False))
-
-    env_args = {'extensions': [], 'loader': loader}
+    env_args = {'extensions': []}
 
     if hasattr(jinja2.ext, 'with_'):
         env_args['extensions'].append('jinja2.ext.with_')
@@ -352,21 +426,8 @@ def render_jinja_tmpl(tmplstr, context, tmplpath=None):
     else:
         opt_jinja_env_helper(opt_jinja_env, 'jinja_env')
 
-    if opts.get('allow_undefined', False):
-        jinja_env = jinja2.Environment(**env_args)
-    else:
-        jinja_env = jinja2.Environment(undefined=jinja2.StrictUndefined,
-                                       **env_args)
-
-    jinja_env.tests.update(JinjaTest.salt_jinja_tests)
-    jinja_env.filters.update(JinjaFilter.salt_jinja_filters)
-    jinja_env.globals.update(JinjaGlobal.salt_jinja_globals)
-
-    # globals
-    jinja_env.globals['odict'] = OrderedDict
-    jinja_env.globals['show_full_context'] = salt.utils.jinja.show_full_context
-
-    jinja_env.tests['list'] = salt.utils.data.is_list
+    if not opts.get('allow_undefined', False):
+        env_args['undefined'] = jinja2.StrictUndefined
 
     decoded_context = {}
     for key, value in six.iteritems(context):
@@ -383,8 +444,9 @@ def render_jinja_tmpl(tmplstr, context, tmplpath=None):
             )
             decoded_context[key] = salt.utils.locales.sdecode(value)
 
+    jinja_env = _get_jinja_env(opts, saltenv, tmplpath, context, env_args)
     try:
-        template = jinja_env.from_string(tmplstr)
+        template = salt.utils.jinja.from_string(jinja_env, tmplstr, tmplpath)
         template.globals.update(decoded_context)
         output = template.render(**decoded_context)
     except jinja2.exceptions.UndefinedError as exc:
@@ -436,6 +498,8 @@ def render_jinja_tmpl(tmplstr, context, tmplpath=None):
                               line,
                               tmplstr,
                               trace=tracestr)
+    finally:
+        _release_jinja_env(jinja_env)
 
     # Workaround a bug in Jinja that removes the final newline
     # (https://github.com/mitsuhiko/jinja2/issues/75)
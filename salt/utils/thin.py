@@ -9,6 +9,7 @@ from __future__ import absolute_import, print_function, unicode_literals
 import os
 import sys
 import copy
+import hashlib
 import shutil
 import tarfile
 import zipfile
@@ -80,6 +81,11 @@ import salt.version
 
 log = logging.getLogger(__name__)
 
+# The checksum of the thin tarball, keyed by its path, hash form and stat
+_THIN_SUMS = {}
+# The manifest of the thin parts, keyed by its path and stat
+_THIN_PARTS = {}
+
 
 def _get_salt_call(*dirs, **namespaces):
     '''
@@ -315,64 +321,12 @@ def _get_supported_py_config(tops, extended_cfg):
     return salt.utils.stringutils.to_bytes(os.linesep.join(pymap))
 
 
-def gen_thin(cachedir, extra_mods='', overwrite=False, so_mods='',
-             python2_bin='python2', python3_bin='python3', absonly=True,
-             compress='gzip', extended_cfg=None):
+def _get_tops_py_version_mapping(extra_mods='', so_mods='',
+                                 python2_bin='python2', python3_bin='python3'):
     '''
-    Generate the salt-thin tarball and print the location of the tarball
-    Optional additional mods to include (e.g. mako) can be supplied as a comma
-    delimited string.  Permits forcing an overwrite of the output file as well.
-
-    CLI Example:
-
-    .. code-block:: bash
-
-        salt-run thin.generate
-        salt-run thin.generate mako
-        salt-run thin.generate mako,wempy 1
-        salt-run thin.generate overwrite=1
+    Return the tops to pack in the thin for each major Python version, the
+    ones of the other Python version are collected by running its binary
     '''
-    if sys.version_info < (2, 6):
-        raise salt.exceptions.SaltSystemExit('The minimum required python version to run salt-ssh is "2.6".')
-    if compress not in ['gzip', 'zip']:
-        log.warning('Unknown compression type: "%s". Falling back to "gzip" compression.', compress)
-        compress = 'gzip'
-
-    thindir = os.path.join(cachedir, 'thin')
-    if not os.path.isdir(thindir):
-        os.makedirs(thindir)
-    thintar = os.path.join(thindir, 'thin.' + (compress == 'gzip' and 'tgz' or 'zip'))
-    thinver = os.path.join(thindir, 'version')
-    pythinver = os.path.join(thindir, '.thin-gen-py-version')
-    salt_call = os.path.join(thindir, 'salt-call')
-    pymap_cfg = os.path.join(thindir, 'supported-versions')
-    code_checksum = os.path.join(thindir, 'code-checksum')
-    digest_collector = salt.utils.hashutils.DigestCollector()
-
-    with salt.utils.files.fopen(salt_call, 'wb') as fp_:
-        fp_.write(_get_salt_call('pyall', **_get_ext_namespaces(extended_cfg)))
-
-    if os.path.isfile(thintar):
-        if not overwrite:
-            if os.path.isfile(thinver):
-                with salt.utils.files.fopen(thinver) as fh_:
-                    overwrite = fh_.read() != salt.version.__version__
-                if overwrite is False and os.path.isfile(pythinver):
-                    with salt.utils.files.fopen(pythinver) as fh_:
-                        overwrite = fh_.read() != str(sys.version_info[0])  # future lint: disable=blacklisted-function
-            else:
-                overwrite = True
-
-        if overwrite:
-            try:
-                log.debug('Removing %s archive file', thintar)
-                os.remove(thintar)
-            except OSError as exc:
-                log.error('Error while removing %s file: %s', thintar, exc)
-                if os.path.exists(thintar):
-                    raise salt.exceptions.SaltSystemExit('Unable to remove %s file. See logs for details.', thintar)
-        else:
-            return thintar
     if _six.PY3:
         # Let's check for the minimum python 2 version requirement, 2.6
         py_shell_cmd = "{} -c 'import sys;sys.stdout.write(\"%s.%s\\n\" % sys.version_info[:2]);'".format(python2_bin)
@@ -430,6 +384,70 @@ def gen_thin(cachedir, extra_mods='', overwrite=False, so_mods='',
             log.error(tops_failure_msg, 'collecting', python2_bin)
             log.debug(stderr)
 
+    return tops_py_version_mapping
+
+
+def gen_thin(cachedir, extra_mods='', overwrite=False, so_mods='',
+             python2_bin='python2', python3_bin='python3', absonly=True,
+             compress='gzip', extended_cfg=None):
+    '''
+    Generate the salt-thin tarball and print the location of the tarball
+    Optional additional mods to include (e.g. mako) can be supplied as a comma
+    delimited string.  Permits forcing an overwrite of the output file as well.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt-run thin.generate
+        salt-run thin.generate mako
+        salt-run thin.generate mako,wempy 1
+        salt-run thin.generate overwrite=1
+    '''
+    if sys.version_info < (2, 6):
+        raise salt.exceptions.SaltSystemExit('The minimum required python version to run salt-ssh is "2.6".')
+    if compress not in ['gzip', 'zip']:
+        log.warning('Unknown compression type: "%s". Falling back to "gzip" compression.', compress)
+        compress = 'gzip'
+
+    thindir = os.path.join(cachedir, 'thin')
+    if not os.path.isdir(thindir):
+        os.makedirs(thindir)
+    thintar = os.path.join(thindir, 'thin.' + (compress == 'gzip' and 'tgz' or 'zip'))
+    thinver = os.path.join(thindir, 'version')
+    pythinver = os.path.join(thindir, '.thin-gen-py-version')
+    salt_call = os.path.join(thindir, 'salt-call')
+    pymap_cfg = os.path.join(thindir, 'supported-versions')
+    code_checksum = os.path.join(thindir, 'code-checksum')
+    digest_collector = salt.utils.hashutils.DigestCollector()
+
+    with salt.utils.files.fopen(salt_call, 'wb') as fp_:
+        fp_.write(_get_salt_call('pyall', **_get_ext_namespaces(extended_cfg)))
+
+    if os.path.isfile(thintar):
+        if not overwrite:
+            if os.path.isfile(thinver):
+                with salt.utils.files.fopen(thinver) as fh_:
+                    overwrite = fh_.read() != salt.version.__version__
+                if overwrite is False and os.path.isfile(pythinver):
+                    with salt.utils.files.fopen(pythinver) as fh_:
+                        overwrite = fh_.read() != str(sys.version_info[0])  # future lint: disable=blacklisted-function
+            else:
+                overwrite = True
+
+        if overwrite:
+            try:
+                log.debug('Removing %s archive file', thintar)
+                os.remove(thintar)
+            except OSError as exc:
+                log.error('Error while removing %s file: %s', thintar, exc)
+                if os.path.exists(thintar):
+                    raise salt.exceptions.SaltSystemExit('Unable to remove %s file. See logs for details.', thintar)
+        else:
+            return thintar
+    tops_py_version_mapping = _get_tops_py_version_mapping(
+        extra_mods, so_mods, python2_bin, python3_bin)
+
     with salt.utils.files.fopen(pymap_cfg, 'wb') as fp_:
         fp_.write(_get_supported_py_config(tops=tops_py_version_mapping, extended_cfg=extended_cfg))
 
@@ -551,7 +569,198 @@ def thin_sum(cachedir, form='sha1'):
     else:
         code_checksum = "'0'"
 
-    return code_checksum, salt.utils.hashutils.get_hash(thintar, form)
+    # Hash the tarball once for all of the targets of a run, and again only
+    # once it is regenerated
+    stat = os.stat(thintar)
+    key = (thintar, form, stat.st_mtime, stat.st_size)
+    if key not in _THIN_SUMS:
+        _THIN_SUMS.clear()
+        _THIN_SUMS[key] = salt.utils.hashutils.get_hash(thintar, form)
+    return code_checksum, _THIN_SUMS[key]
+
+
+def _pack_part(partsdir, members):
+    '''
+    Pack the files, a list of (path, arcname), into the part named after the
+    digest of their names and content, unless it was packed already, and
+    return the digest
+    '''
+    members = sorted(members, key=lambda member: member[1])
+    hash_obj = hashlib.sha1()
+    for path, arcname in members:
+        hash_obj.update(salt.utils.stringutils.to_bytes(arcname))
+        hash_obj.update(salt.utils.stringutils.to_bytes(
+            salt.utils.hashutils.get_hash(path, 'sha1')))
+    digest = hash_obj.hexdigest()
+    part = os.path.join(partsdir, '{0}.tgz'.format(digest))
+    if os.path.isfile(part):
+        return digest
+    log.debug('Packing the thin part %s', part)
+    tmp_part = '{0}.tmp'.format(part)
+    tfp = tarfile.open(tmp_part, 'w:gz', dereference=True)
+    try:
+        for path, arcname in members:
+            tfp.add(path, arcname=arcname)
+    finally:
+        tfp.close()
+    os.rename(tmp_part, part)
+    return digest
+
+
+def _pack_top_part(partsdir, root, top):
+    '''
+    Pack a top module into the part unpacked under ``root`` and return the
+    digest of the part, or None if the top module does not exist
+    '''
+    base = os.path.basename(top)
+    top_dirname = os.path.dirname(top)
+    tempdir = None
+    if not os.path.isdir(top_dirname):
+        # This is likely a compressed python .egg
+        tempdir = tempfile.mkdtemp()
+        egg = zipfile.ZipFile(top_dirname)
+        egg.extractall(tempdir)
+        top_dirname = tempdir
+        top = os.path.join(tempdir, base)
+    try:
+        if os.path.isdir(top):
+            paths = []
+            for dirpath, dirs, files in salt.utils.path.os_walk(top, followlinks=True):
+                paths.extend([os.path.join(dirpath, name) for name in files
+                              if not name.endswith(('.pyc', '.pyo'))])
+        elif os.path.exists(top):
+            # top is a single file module
+            paths = [top]
+        else:
+            return None
+        arcdir = os.path.dirname(root)
+        return _pack_part(
+            partsdir,
+            [(path, os.path.join(arcdir, os.path.relpath(path, top_dirname)))
+             for path in paths])
+    finally:
+        if tempdir is not None:
+            shutil.rmtree(tempdir)
+
+
+def gen_thin_parts(cachedir, extra_mods='', overwrite=False, so_mods='',
+                   python2_bin='python2', python3_bin='python3', absonly=True,
+                   extended_cfg=None):
+    '''
+    Generate the salt-thin as a set of gzipped tarballs, the parts: one for
+    each top module and one for the salt-call script and the version files.
+    Return the manifest of the parts, which maps the digest of each part to
+    the path it is unpacked under, its ``root``, and to the checksum of its
+    tarball, its ``sum``.
+
+    A part is named after the digest of its content: when the thin is
+    generated again, only the parts of the top modules which changed are
+    packed, and salt-ssh deploys only the parts a target lacks, see the
+    ``ssh_thin_parts`` option.
+    '''
+    if sys.version_info < (2, 6):
+        raise salt.exceptions.SaltSystemExit('The minimum required python version to run salt-ssh is "2.6".')
+
+    partsdir = os.path.join(cachedir, 'thin', 'parts')
+    metadir = os.path.join(partsdir, 'meta')
+    if not os.path.isdir(metadir):
+        os.makedirs(metadir)
+    manifest_path = os.path.join(partsdir, 'manifest.json')
+    if not overwrite and os.path.isfile(manifest_path):
+        with salt.utils.files.fopen(manifest_path) as fh_:
+            manifest = salt.utils.json.load(fh_)
+        if manifest.get('version') == salt.version.__version__ \
+                and manifest.get('py') == sys.version_info.major:
+            return manifest
+
+    tops_py_version_mapping = _get_tops_py_version_mapping(
+        extra_mods, so_mods, python2_bin, python3_bin)
+
+    # The path each top module is unpacked under, shareable modules once
+    roots = []
+    for py_ver, tops in _six.iteritems(tops_py_version_mapping):
+        for top in tops:
+            if absonly and not os.path.isabs(top):
+                continue
+            base = os.path.basename(top)
+            site_pkg_dir = _is_shareable(base) and 'pyall' or 'py{0}'.format(py_ver)
+            roots.append((os.path.join(site_pkg_dir, base), top))
+    for ns, cfg in _six.iteritems(get_ext_tops(extended_cfg)):
+        py_ver_major = cfg.get('py-version')[0]
+        for top in [cfg.get('path')] + cfg.get('dependencies'):
+            base = os.path.basename(top)
+            site_pkg_dir = _is_shareable(base) and 'pyall' or 'py{0}'.format(py_ver_major)
+            roots.append((os.path.join(ns, site_pkg_dir, base), top))
+
+    parts = {}
+    packed = set()
+    for root, top in roots:
+        if root in packed:
+            continue
+        packed.add(root)
+        digest = _pack_top_part(partsdir, root, top)
+        if digest is not None:
+            parts[digest] = root
+
+    meta = {
+        'version': salt.version.__version__,
+        '.thin-gen-py-version': str(sys.version_info.major),  # future lint: disable=blacklisted-function
+        'salt-call': _get_salt_call('pyall', **_get_ext_namespaces(extended_cfg)),
+        'supported-versions': _get_supported_py_config(tops=tops_py_version_mapping,
+                                                       extended_cfg=extended_cfg),
+        'code-checksum': hashlib.sha256(
+            salt.utils.stringutils.to_bytes(''.join(sorted(parts)))).hexdigest() + os.linesep,
+    }
+    for fname, data in _six.iteritems(meta):
+        with salt.utils.files.fopen(os.path.join(metadir, fname), 'wb') as fp_:
+            fp_.write(salt.utils.stringutils.to_bytes(data))
+    digest = _pack_part(partsdir,
+                        [(os.path.join(metadir, fname), fname) for fname in meta])
+    parts[digest] = ''
+
+    manifest = {'version': salt.version.__version__,
+                'py': sys.version_info.major,
+                'parts': {}}
+    for fname in os.listdir(partsdir):
+        digest, ext = os.path.splitext(fname)
+        if ext == '.tmp':
+            # Left over by an interrupted generation
+            os.remove(os.path.join(partsdir, fname))
+            continue
+        if ext != '.tgz':
+            continue
+        if digest not in parts:
+            log.debug('Removing the stale thin part %s', fname)
+            os.remove(os.path.join(partsdir, fname))
+            continue
+        manifest['parts'][digest] = {
+            'root': parts[digest],
+            'sum': salt.utils.hashutils.get_hash(os.path.join(partsdir, fname), 'sha1'),
+        }
+    with salt.utils.files.fopen(manifest_path + '.tmp', 'w') as fp_:
+        salt.utils.json.dump(manifest, fp_)
+    os.rename(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+def thin_parts(cachedir):
+    '''
+    Return the manifest of the current thin parts, see
+    :py:func:`gen_thin_parts`
+    '''
+    manifest_path = os.path.join(cachedir, 'thin', 'parts', 'manifest.json')
+    try:
+        stat = os.stat(manifest_path)
+        key = (manifest_path, stat.st_mtime, stat.st_size)
+    except OSError:
+        key = None
+    if key is None or key not in _THIN_PARTS:
+        manifest = gen_thin_parts(cachedir)
+        stat = os.stat(manifest_path)
+        key = (manifest_path, stat.st_mtime, stat.st_size)
+        _THIN_PARTS.clear()
+        _THIN_PARTS[key] = manifest
+    return _THIN_PARTS[key]
 
 
 def gen_min(cachedir, extra_mods='', overwrite=False, so_mods='',
@@ -5,21 +5,29 @@ Custom YAML loading in Salt
 
 # Import python libs
 from __future__ import absolute_import, print_function, unicode_literals
+import functools
 import re
 import warnings
 
 import yaml  # pylint: disable=blacklisted-import
 from yaml.nodes import MappingNode, SequenceNode
-from yaml.constructor import ConstructorError
+from yaml.constructor import ConstructorError, SafeConstructor
+from yaml.resolver import Resolver
 try:
     yaml.Loader = yaml.CLoader
     yaml.Dumper = yaml.CDumper
 except Exception:
     pass
+try:
+    from yaml.cyaml import CParser  # pylint: disable=no-name-in-module
+    HAS_LIBYAML = True
+except ImportError:
+    HAS_LIBYAML = False
 
 import salt.utils.stringutils
+from salt.ext import six
 
-__all__ = ['SaltYamlSafeLoader', 'load', 'safe_load']
+__all__ = ['SaltYamlSafeLoader', 'load', 'safe_load', 'fast_load']
 
 
 class DuplicateKeyWarning(RuntimeWarning):
@@ -39,6 +47,9 @@ class SaltYamlSafeLoader(yaml.SafeLoader):
     '''
     def __init__(self, stream, dictclass=dict):
         super(SaltYamlSafeLoader, self).__init__(stream)
+        self._add_constructors(dictclass)
+
+    def _add_constructors(self, dictclass):
         if dictclass is not dict:
             # then assume ordered dict and use it for both !map and !omap
             self.add_constructor(
@@ -210,7 +221,51 @@ class SaltYamlSafeLoader(yaml.SafeLoader):
             node.value = mergeable_items + node.value
 
 
+if HAS_LIBYAML:
+    class SaltYamlCSafeLoader(CParser, SaltYamlSafeLoader):
+        '''
+        The SaltYamlSafeLoader with the scanner and the parser of libyaml
+        instead of the pure python ones. The nodes are still constructed by
+        the custom constructor, which gives the same data.
+        '''
+        def __init__(self, stream, dictclass=dict):  # pylint: disable=super-init-not-called
+            CParser.__init__(self, stream)
+            SafeConstructor.__init__(self)
+            Resolver.__init__(self)
+            self._add_constructors(dictclass)
+else:
+    SaltYamlCSafeLoader = None
+
+
+def fast_load(stream, dictclass=dict):
+    '''
+    .. versionadded:: Fluorine
+
+    Load the YAML with the SaltYamlCSafeLoader when libyaml is available,
+    which is several times faster than the SaltYamlSafeLoader.
+
+    The YAML that libyaml fails to load is loaded again by the
+    SaltYamlSafeLoader, which accepts the unicode literals, e.g. ``u'foo'``,
+    inline in the YAML and raises the same errors with the context of the
+    faulty lines.
+    '''
+    if HAS_LIBYAML:
+        if not isinstance(stream, (six.string_types, six.binary_type)):
+            stream = stream.read()
+        try:
+            return yaml.load(
+                stream,
+                Loader=functools.partial(SaltYamlCSafeLoader, dictclass=dictclass))
+        except yaml.YAMLError:
+            pass
+    return yaml.load(
+        stream,
+        Loader=functools.partial(SaltYamlSafeLoader, dictclass=dictclass))
+
+
 def load(stream, Loader=SaltYamlSafeLoader):
+    if Loader is SaltYamlSafeLoader:
+        return fast_load(stream)
     return yaml.load(stream, Loader=Loader)
 
 
@@ -220,4 +275,6 @@ def safe_load(stream, Loader=SaltYamlSafeLoader):
 
     Helper function which automagically uses our custom loader.
     '''
+    if Loader is SaltYamlSafeLoader:
+        return fast_load(stream)
     return yaml.load(stream, Loader=Loader)
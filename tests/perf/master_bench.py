@@ -0,0 +1,555 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+The master_bench script starts a real salt master and a swarm of simulated
+minions living in a single process, to measure the throughput of the
+ReqServer and of the publisher without running real minions.
+
+The simulated minions authenticate through ``salt.crypt.AsyncAuth``,
+subscribe to the publisher, answer ``test.ping`` and ``grains.items`` and
+fetch files from the master fileserver. The script reports:
+
+- the number of minion authentications per second
+- the fan-out latency of the publications
+- the rate at which the master ingests the returns
+- the fileserver throughput in MB/s
+- the CPU usage of each master process, MWorkers included (needs psutil)
+
+.. code-block:: bash
+
+    python tests/perf/master_bench.py -m 200 --transport zeromq --transport tcp
+'''
+# pylint: disable=resource-leakage
+# Import Python Libs
+from __future__ import absolute_import, print_function
+import os
+import pwd
+import time
+import socket
+import shutil
+import signal
+import optparse
+import tempfile
+import threading
+import multiprocessing
+
+# Import salt libs
+import salt.client
+import salt.config
+import salt.crypt
+import salt.master
+import salt.minion
+import salt.transport.client
+import salt.utils.files
+import salt.utils.yaml
+
+# Import third party libs
+import tornado.gen
+import tornado.ioloop
+from salt.ext import six
+from salt.ext.six.moves import range  # pylint: disable=import-error,redefined-builtin
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+
+def parse():
+    '''
+    Parse the cli options
+    '''
+    parser = optparse.OptionParser()
+    parser.add_option(
+        '-m',
+        '--minions',
+        dest='minions',
+        default=50,
+        type='int',
+        help='The number of simulated minions')
+    parser.add_option(
+        '--transport',
+        dest='transports',
+        default=[],
+        action='append',
+        help=('A transport to benchmark, zeromq or tcp. May be passed more '
+              'than once, default is zeromq'))
+    parser.add_option(
+        '--worker-threads',
+        dest='worker_threads',
+        default=5,
+        type='int',
+        help='The number of MWorkers of the master')
+    parser.add_option(
+        '--pubs',
+        dest='pubs',
+        default=5,
+        type='int',
+        help='The number of publications of each function')
+    parser.add_option(
+        '--file-size',
+        dest='file_size',
+        default=16,
+        type='int',
+        help='The size in MB of the file served to the minions')
+    parser.add_option(
+        '--file-minions',
+        dest='file_minions',
+        default=10,
+        type='int',
+        help='The number of minions fetching the file at the same time')
+    parser.add_option(
+        '--timeout',
+        dest='timeout',
+        default=120,
+        type='int',
+        help='Seconds to wait for each phase of the benchmark')
+    parser.add_option(
+        '--temp-dir',
+        dest='temp_dir',
+        default=None,
+        help='Place temporary files/directories here')
+    parser.add_option(
+        '--no-clean',
+        action='store_true',
+        default=False,
+        help='Don\'t cleanup temporary files/directories')
+    parser.add_option('-u', '--user', default=pwd.getpwuid(os.getuid()).pw_name)
+
+    options, _args = parser.parse_args()
+
+    opts = {}
+
+    for key, val in six.iteritems(options.__dict__):
+        opts[key] = val
+    if not opts['transports']:
+        opts['transports'] = ['zeromq']
+
+    return opts
+
+
+def free_port():
+    '''
+    Return a free TCP port on the loopback interface
+    '''
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+    finally:
+        sock.close()
+
+
+def percentile(values, pct):
+    '''
+    Return the pct percentile of the sorted values
+    '''
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def _run_master(opts):
+    '''
+    The target of the master process
+    '''
+    salt.master.Master(opts).start()
+
+
+class BenchMaster(object):
+    '''
+    A real salt master running in a child process
+    '''
+    def __init__(self, opts, root, transport):
+        self.opts = opts
+        self.root = root
+        self.transport = transport
+        self.conf = os.path.join(root, 'master')
+        self.master_opts = None
+        self.process = None
+        self.file_roots = os.path.join(root, 'file_roots')
+
+    def mkconf(self):
+        '''
+        Make a master config and write it
+        '''
+        os.makedirs(self.file_roots)
+        data = {
+            'id': 'bench-master',
+            'user': self.opts['user'],
+            'interface': '127.0.0.1',
+            'publish_port': free_port(),
+            'ret_port': free_port(),
+            'transport': self.transport,
+            'worker_threads': self.opts['worker_threads'],
+            'auto_accept': True,
+            'root_dir': self.root,
+            'pki_dir': os.path.join(self.root, 'pki', 'master'),
+            'cachedir': os.path.join(self.root, 'cache', 'master'),
+            'sock_dir': os.path.join(self.root, 'sock', 'master'),
+            'log_file': os.path.join(self.root, 'master.log'),
+            'file_roots': {'base': [self.file_roots]},
+        }
+        with salt.utils.files.fopen(self.conf, 'w+') as fp_:
+            salt.utils.yaml.safe_dump(data, fp_)
+        self.master_opts = salt.config.master_config(self.conf)
+
+    def start(self, timeout):
+        '''
+        Start the master and wait for it to accept connections
+        '''
+        self.mkconf()
+        self.process = multiprocessing.Process(target=_run_master,
+                                               args=(self.master_opts,))
+        self.process.start()
+        pull = os.path.join(self.master_opts['sock_dir'], 'publish_pull.ipc')
+        start = time.time()
+        while time.time() - start < timeout:
+            if not self.process.is_alive():
+                raise RuntimeError('The master exited, see {0}'.format(
+                    self.master_opts['log_file']))
+            try:
+                socket.create_connection(
+                    ('127.0.0.1', self.master_opts['ret_port']), 1).close()
+                if self.transport == 'tcp' or os.path.exists(pull):
+                    return
+            except socket.error:
+                pass
+            time.sleep(0.1)
+        raise RuntimeError('The master did not start in time')
+
+    def cpu_times(self):
+        '''
+        Return the CPU seconds used by each master process, by process name
+        '''
+        if not HAS_PSUTIL:
+            return {}
+        ret = {}
+        try:
+            procs = psutil.Process(self.process.pid).children(recursive=True)
+        except psutil.Error:
+            return ret
+        for proc in procs:
+            try:
+                name = ' '.join(proc.cmdline()) or proc.name()
+                times = proc.cpu_times()
+            except psutil.Error:
+                continue
+            # The process titles carry the role of the processes, e.g.
+            # MWorker-0, when setproctitle is available
+            name = '{0} ({1})'.format(name.split()[-1], proc.pid)
+            ret[name] = times.user + times.system
+        return ret
+
+    def stop(self):
+        '''
+        Stop the master and all of its processes
+        '''
+        if self.process is None or not self.process.is_alive():
+            return
+        os.kill(self.process.pid, signal.SIGTERM)
+        self.process.join(30)
+        if self.process.is_alive():
+            os.kill(self.process.pid, signal.SIGKILL)
+            self.process.join()
+
+
+class SimMinion(object):
+    '''
+    A simulated minion
+    '''
+    def __init__(self, opts, bench):
+        self.opts = opts
+        self.bench = bench
+        self.io_loop = bench.io_loop
+        self.pub_channel = None
+        self.req_channel = None
+        self.grains = dict(
+            ('grain{0}'.format(idx), 'value-{0}-{1}'.format(opts['id'], idx))
+            for idx in range(100)
+        )
+        self.grains['id'] = opts['id']
+
+    @tornado.gen.coroutine
+    def authenticate(self):
+        '''
+        Authenticate with the master
+        '''
+        auth = salt.crypt.AsyncAuth(self.opts, io_loop=self.io_loop)
+        yield auth.authenticate()
+
+    @tornado.gen.coroutine
+    def connect(self):
+        '''
+        Subscribe to the publisher and connect to the ReqServer
+        '''
+        self.pub_channel = salt.transport.client.AsyncPubChannel.factory(
+            self.opts, io_loop=self.io_loop)
+        yield self.pub_channel.connect()
+        self.pub_channel.on_recv(self._handle_payload)
+        self.req_channel = salt.transport.client.AsyncReqChannel.factory(
+            self.opts, io_loop=self.io_loop)
+
+    def _handle_payload(self, payload):
+        if payload is None or payload.get('enc') != 'aes':
+            return
+        load = payload['load']
+        if load.get('fun') == 'test.ping':
+            ret = True
+        elif load.get('fun') == 'grains.items':
+            ret = self.grains
+        else:
+            return
+        self.bench.received(load['jid'], time.time())
+        self.io_loop.spawn_callback(self._return, load, ret)
+
+    @tornado.gen.coroutine
+    def _return(self, load, ret):
+        yield self.req_channel.send({
+            'cmd': '_return',
+            'id': self.opts['id'],
+            'jid': load['jid'],
+            'fun': load['fun'],
+            'fun_args': load.get('arg', []),
+            'return': ret,
+            'retcode': 0,
+            'success': True,
+        })
+        self.bench.returned(load['jid'], time.time())
+
+    @tornado.gen.coroutine
+    def fetch_file(self, path):
+        '''
+        Fetch a file from the master fileserver, return its size
+        '''
+        loc = 0
+        while True:
+            ret = yield self.req_channel.send({
+                'cmd': '_serve_file',
+                'id': self.opts['id'],
+                'path': path,
+                'loc': loc,
+                'saltenv': 'base',
+            })
+            if not ret or not ret.get('data'):
+                break
+            loc += len(ret['data'])
+        raise tornado.gen.Return(loc)
+
+
+class Bench(object):
+    '''
+    Run the benchmark of a transport
+    '''
+    def __init__(self, opts, transport):
+        self.opts = opts
+        self.transport = transport
+        if opts['temp_dir']:
+            self.root = tempfile.mkdtemp(prefix='mbench-', dir=opts['temp_dir'])
+        else:
+            self.root = tempfile.mkdtemp(prefix='mbench-')
+        self.master = BenchMaster(opts, self.root, transport)
+        self.minions = []
+        self.io_loop = None
+        self.thread = None
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.receive_times = {}
+        self.return_times = {}
+        self.report = []
+
+    def start_loop(self):
+        '''
+        Run the io_loop of the simulated minions in a thread, so that the
+        LocalClient publishes from the main thread
+        '''
+        self.io_loop = tornado.ioloop.IOLoop()
+        started = threading.Event()
+
+        def run():
+            self.io_loop.make_current()
+            self.io_loop.add_callback(started.set)
+            self.io_loop.start()
+        self.thread = threading.Thread(target=run)
+        self.thread.daemon = True
+        self.thread.start()
+        started.wait()
+
+    def run_sync(self, func):
+        '''
+        Run a coroutine function on the io_loop of the minions, and wait
+        for its result
+        '''
+        ret = {}
+        done = threading.Event()
+
+        @tornado.gen.coroutine
+        def wrapper():
+            try:
+                ret['result'] = yield func()
+            except Exception as exc:  # pylint: disable=broad-except
+                ret['error'] = exc
+            done.set()
+        self.io_loop.add_callback(wrapper)
+        if not done.wait(self.opts['timeout']):
+            raise RuntimeError('Timed out')
+        if 'error' in ret:
+            raise ret['error']
+        return ret.get('result')
+
+    def minion_opts(self, idx, keys):
+        '''
+        Return the options of a simulated minion
+        '''
+        minion_id = 'bench-{0}'.format(str(idx).zfill(len(str(self.opts['minions']))))
+        dpath = os.path.join(self.root, 'minions', minion_id)
+        pki_dir = os.path.join(dpath, 'pki')
+        os.makedirs(pki_dir)
+        # All of the minions share a key, like in minionswarm
+        for name in ('minion.pem', 'minion.pub'):
+            shutil.copy(os.path.join(keys, name), pki_dir)
+        opts = salt.config.minion_config(None, minion_id=minion_id)
+        opts.update({
+            'id': minion_id,
+            'user': self.opts['user'],
+            'master': '127.0.0.1',
+            'master_port': self.master.master_opts['ret_port'],
+            'publish_port': self.master.master_opts['publish_port'],
+            'transport': self.transport,
+            'pki_dir': pki_dir,
+            'cachedir': os.path.join(dpath, 'cache'),
+            'sock_dir': os.path.join(dpath, 'sock'),
+        })
+        opts.update(salt.minion.resolve_dns(opts))
+        return opts
+
+    def received(self, jid, stamp):
+        with self.lock:
+            self.receive_times.setdefault(jid, []).append(stamp)
+
+    def returned(self, jid, stamp):
+        with self.lock:
+            self.return_times.setdefault(jid, []).append(stamp)
+            if len(self.return_times[jid]) >= len(self.minions):
+                self.done.set()
+
+    def add_report(self, name, value, unit):
+        self.report.append((name, value, unit))
+
+    def run(self):
+        '''
+        Run all of the phases of the benchmark
+        '''
+        try:
+            self.master.start(self.opts['timeout'])
+            self.start_loop()
+            keys = os.path.join(self.root, 'keys')
+            os.makedirs(keys)
+            salt.crypt.gen_keys(keys, 'minion', 2048)
+            self.minions = [SimMinion(self.minion_opts(idx, keys), self)
+                            for idx in range(self.opts['minions'])]
+            cpu = self.master.cpu_times()
+            start = time.time()
+            self.bench_auth()
+            self.bench_pubs('test.ping')
+            self.bench_pubs('grains.items')
+            self.bench_files()
+            self.report_cpu(cpu, time.time() - start)
+        finally:
+            self.master.stop()
+            if self.io_loop is not None:
+                self.io_loop.add_callback(self.io_loop.stop)
+            if not self.opts['no_clean']:
+                shutil.rmtree(self.root, ignore_errors=True)
+        self.print_report()
+
+    def bench_auth(self):
+        '''
+        Authenticate all of the minions at once, then connect them
+        '''
+        @tornado.gen.coroutine
+        def authenticate():
+            yield [minion.authenticate() for minion in self.minions]
+        start = time.time()
+        self.run_sync(authenticate)
+        elapsed = time.time() - start
+        self.add_report('auth', len(self.minions) / elapsed, 'auth/s')
+
+        @tornado.gen.coroutine
+        def connect():
+            yield [minion.connect() for minion in self.minions]
+        self.run_sync(connect)
+        # Let the subscriptions settle before publishing
+        time.sleep(1)
+
+    def bench_pubs(self, fun):
+        '''
+        Publish a function to all of the minions and measure the fan-out
+        latency and the rate of the returns
+        '''
+        client = salt.client.LocalClient(mopts=self.master.master_opts)
+        latencies = []
+        ingestion = []
+        for _ in range(self.opts['pubs']):
+            self.done.clear()
+            start = time.time()
+            pub_data = client.pub('*', fun, timeout=self.opts['timeout'])
+            if not self.done.wait(self.opts['timeout']):
+                print('Timed out waiting for the returns of {0}'.format(fun))
+            with self.lock:
+                received = sorted(self.receive_times.pop(pub_data['jid'], []))
+                returned = sorted(self.return_times.pop(pub_data['jid'], []))
+            latencies.extend(stamp - start for stamp in received)
+            if returned:
+                ingestion.append(len(returned) / max(returned[-1] - start, 1e-6))
+        latencies.sort()
+        self.add_report('{0} fan-out p50'.format(fun), percentile(latencies, 50) * 1000, 'ms')
+        self.add_report('{0} fan-out p95'.format(fun), percentile(latencies, 95) * 1000, 'ms')
+        self.add_report('{0} fan-out max'.format(fun), percentile(latencies, 100) * 1000, 'ms')
+        self.add_report('{0} returns'.format(fun),
+                        sum(ingestion) / max(len(ingestion), 1), 'ret/s')
+
+    def bench_files(self):
+        '''
+        Fetch a file from the fileserver with several minions at once
+        '''
+        path = os.path.join(self.master.file_roots, 'bench.bin')
+        with salt.utils.files.fopen(path, 'wb') as fp_:
+            for _ in range(self.opts['file_size']):
+                fp_.write(os.urandom(1024 * 1024))
+
+        @tornado.gen.coroutine
+        def fetch():
+            sizes = yield [minion.fetch_file('bench.bin')
+                           for minion in self.minions[:self.opts['file_minions']]]
+            raise tornado.gen.Return(sum(sizes))
+        start = time.time()
+        size = self.run_sync(fetch)
+        elapsed = time.time() - start
+        self.add_report('fileserver', size / elapsed / 1024.0 / 1024.0, 'MB/s')
+
+    def report_cpu(self, before, elapsed):
+        '''
+        Report the CPU usage of each master process over the benchmark
+        '''
+        if not HAS_PSUTIL:
+            print('psutil is not available, the CPU usage is not reported')
+            return
+        for name, seconds in sorted(six.iteritems(self.master.cpu_times())):
+            used = seconds - before.get(name, 0.0)
+            self.add_report('cpu {0}'.format(name), used / elapsed * 100, '%')
+
+    def print_report(self):
+        print('Transport: {0}, minions: {1}, MWorkers: {2}'.format(
+            self.transport, self.opts['minions'], self.opts['worker_threads']))
+        for name, value, unit in self.report:
+            print('  {0:<40} {1:>12.2f} {2}'.format(name, value, unit))
+
+
+# pylint: disable=C0103
+if __name__ == '__main__':
+    opts = parse()
+    for transport in opts['transports']:
+        Bench(opts, transport).run()
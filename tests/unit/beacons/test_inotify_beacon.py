@@ -60,6 +60,21 @@ class INotifyBeaconTestCase(TestCase, LoaderModuleMockMixin):
         self.assertEqual(ret[0]['path'], path)
         self.assertEqual(ret[0]['change'], 'IN_OPEN')
 
+    def test_get_fds(self):
+        missing = os.path.join(self.tmpdir, 'missing')
+        config = [{'files': {missing: {'mask': ['create']}}}]
+        ret = inotify.beacon(config)
+        self.assertEqual(ret, [])
+        # Poll the beacon until all of the paths are watched
+        self.assertEqual(inotify.get_fds(config), [])
+
+        config = [{'files': {self.tmpdir: {'mask': ['create']}}}]
+        ret = inotify.beacon(config)
+        self.assertEqual(ret, [])
+        fds = inotify.get_fds(config)
+        self.assertEqual(len(fds), 1)
+        self.assertEqual(fds[0], inotify._get_notifier({})._watch_manager.get_fd())
+
     def test_dir_no_auto_add(self):
         config = [{'files': {self.tmpdir: {'mask': ['create']}}}]
         ret = inotify.validate(config)
@@ -291,6 +291,40 @@ class FileclientCacheTest(TestCase, AdaptedConfigurationTestCaseMixin, LoaderMod
                 log.debug('content = %s', content)
                 self.assertTrue(saltenv in content)
 
+    def test_cache_files(self):
+        '''
+        Ensure a batch of files is cached with a single manifest request, and
+        that only the files which changed are fetched again
+        '''
+        patched_opts = dict((x, y) for x, y in six.iteritems(self.minion_opts))
+        patched_opts.update(MOCKED_OPTS)
+
+        with patch.dict(fileclient.__opts__, patched_opts):
+            client = fileclient.get_file_client(fileclient.__opts__, pillar=False)
+            for saltenv in SALTENVS:
+                paths = ['salt://foo.txt', 'salt://missing.txt'] + [
+                    'salt://{0}/{1}'.format(SUBDIR, x) for x in SUBDIR_FILES
+                ]
+                ret = client.cache_files(paths, saltenv)
+                cache_root = os.path.join(
+                    fileclient.__opts__['cachedir'], 'files', saltenv)
+                self.assertEqual(ret[0], os.path.join(cache_root, 'foo.txt'))
+                self.assertFalse(ret[1])
+                for cache_loc in ret[2:]:
+                    with salt.utils.files.fopen(cache_loc) as fp_:
+                        self.assertIn(saltenv, fp_.read())
+
+                with salt.utils.files.fopen(
+                        os.path.join(FS_ROOT, saltenv, 'foo.txt'), 'w') as fp_:
+                    fp_.write('changed')
+                with patch.object(client, 'get_file',
+                                  MagicMock(wraps=client.get_file)) as get_file:
+                    self.assertEqual(client.cache_files(paths, saltenv), ret)
+                get_file.assert_called_once_with(
+                    'salt://foo.txt', '', True, saltenv, cachedir=None)
+                with salt.utils.files.fopen(ret[0]) as fp_:
+                    self.assertEqual(fp_.read(), 'changed')
+
     def test_cache_file_with_alternate_cachedir_and_absolute_path(self):
         '''
         Ensure file is cached to correct location when an alternate cachedir is
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+# Import Python libs
+from __future__ import absolute_import, print_function, unicode_literals
+import os
+import shutil
+import tempfile
+
+# Import Salt Testing libs
+from tests.support.paths import TMP
+from tests.support.unit import TestCase
+from tests.support.mock import patch
+
+# Import Salt libs
+import salt.utils.files
+import salt.utils.hashutils
+from salt import fileserver
+
+
+class HashIndexTestCase(TestCase):
+    '''
+    TestCase for salt.fileserver.HashIndex
+    '''
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(dir=TMP)
+        self.opts = {'cachedir': os.path.join(self.tmp_dir, 'cache'),
+                     'hash_type': 'sha256'}
+        self.path = os.path.join(self.tmp_dir, 'testfile')
+        with salt.utils.files.fopen(self.path, 'w') as fp_:
+            fp_.write('foo')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        del self.opts
+
+    def test_get(self):
+        '''
+        Test that a file is only hashed again once it changed
+        '''
+        index = fileserver.HashIndex(self.opts, 'roots', 'base')
+        hsum = salt.utils.hashutils.get_hash(self.path, 'sha256')
+        self.assertEqual(index.get('testfile', self.path), hsum)
+        with patch('salt.utils.hashutils.get_hash') as get_hash:
+            self.assertEqual(index.get('testfile', self.path), hsum)
+            get_hash.assert_not_called()
+
+        with salt.utils.files.fopen(self.path, 'w') as fp_:
+            fp_.write('foobar')
+        self.assertEqual(index.get('testfile', self.path),
+                         salt.utils.hashutils.get_hash(self.path, 'sha256'))
+
+    def test_get_rewritten(self):
+        '''
+        Test that a file rewritten with the same size and mtime is hashed
+        again
+        '''
+        index = fileserver.HashIndex(self.opts, 'roots', 'base')
+        index.get('testfile', self.path)
+        stat_result = os.stat(self.path)
+        with salt.utils.files.fopen(self.path, 'w') as fp_:
+            fp_.write('bar')
+        os.utime(self.path, (stat_result.st_atime, stat_result.st_mtime))
+        self.assertEqual(index.get('testfile', self.path),
+                         salt.utils.hashutils.get_hash(self.path, 'sha256'))
+
+    def test_update(self):
+        '''
+        Test that the index written by update is loaded by other instances
+        '''
+        index = fileserver.HashIndex(self.opts, 'roots', 'base')
+        self.assertEqual(index.update({'testfile': self.path}), ['testfile'])
+        self.assertTrue(os.path.isfile(index.path))
+        self.assertEqual(index.update({'testfile': self.path}), [])
+
+        reader = fileserver.HashIndex(self.opts, 'roots', 'base')
+        with patch('salt.utils.hashutils.get_hash') as get_hash:
+            self.assertEqual(reader.get('testfile', self.path),
+                             index.entries['testfile'][-1])
+            get_hash.assert_not_called()
+
+        self.assertEqual(index.update({}), [])
+        self.assertEqual(reader.load(), {})
@@ -142,6 +142,24 @@ class RootsTest(TestCase, AdaptedConfigurationTestCaseMixin, LoaderModuleMockMix
                 {'data': data,
                  'dest': 'testfile'})
 
+    def test_serve_file_stream(self):
+        path = os.path.join(self.tmp_dir, 'testfile')
+        with salt.utils.files.fopen(path, 'rb') as fp_:
+            data = fp_.read()
+        with patch.dict(roots.__opts__, {'file_buffer_size': 100}):
+            load = {'saltenv': 'base',
+                    'path': path,
+                    'loc': 0}
+            fnd = {'path': path,
+                   'rel': 'testfile'}
+            ret = list(roots.serve_file_stream(load, fnd))
+
+        self.assertEqual(len(ret), (len(data) + 99) // 100 + 1)
+        self.assertEqual(ret[-1], {'data': '', 'dest': 'testfile', 'loc': len(data)})
+        self.assertEqual([chunk['loc'] for chunk in ret[:-1]],
+                         list(range(0, len(data), 100)))
+        self.assertEqual(b''.join(chunk['data'] for chunk in ret[:-1]), data)
+
     def test_envs(self):
         opts = {'file_roots': copy.copy(self.opts['file_roots'])}
         opts['file_roots'][UNICODE_ENVNAME] = opts['file_roots']['base']
@@ -17,6 +17,8 @@ import collections
 import sys
 import imp
 import copy
+import threading
+import time
 
 # Import Salt Testing libs
 from tests.support.unit import TestCase
@@ -33,6 +35,7 @@ from salt.ext.six.moves import range
 # pylint: enable=no-name-in-module,redefined-builtin
 
 from salt.loader import LazyLoader, _module_dirs, grains, utils, proxy, minion_mods
+from salt.loader import _run_grain_funcs
 
 log = logging.getLogger(__name__)
 
@@ -549,6 +552,198 @@ class LazyLoaderVirtualAliasTest(TestCase):
             self.assertTrue(getattr(self.loader, mod_name).test())
 
 
+loader_cache_modules = {
+    'cacheok': '''
+__virtualname__ = 'cachevirt'
+
+def __virtual__():
+    return __virtualname__
+
+def test():
+    return True
+''',
+    'cachereject': '''
+def __virtual__():
+    return (False, 'missing dependencies')
+
+def test():
+    return True
+''',
+}
+
+
+class LazyLoaderCacheTest(TestCase):
+    '''
+    Test the loader cache of the file mapping and of the __virtual__ outcomes
+    '''
+    @classmethod
+    def setUpClass(cls):
+        cls.opts = salt.config.minion_config(None)
+        cls.opts['grains'] = grains(cls.opts)
+        if not os.path.isdir(TMP):
+            os.makedirs(TMP)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(dir=TMP)
+        self.module_dir = os.path.join(self.tmp_dir, 'modules')
+        os.makedirs(self.module_dir)
+        for name, source in six.iteritems(loader_cache_modules):
+            self.write_module(name, source)
+        self.loader_opts = copy.deepcopy(self.opts)
+        self.loader_opts['cachedir'] = os.path.join(self.tmp_dir, 'cache')
+        self.loader_opts['loader_cache'] = True
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        for modname in list(sys.modules):
+            if modname.startswith('salt.loaded.ext.module.cache'):
+                del sys.modules[modname]
+        del self.tmp_dir
+        del self.module_dir
+        del self.loader_opts
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls.opts
+
+    def write_module(self, name, source):
+        with salt.utils.files.fopen(
+                os.path.join(self.module_dir, '{0}.py'.format(name)), 'w') as fh:
+            fh.write(salt.utils.stringutils.to_str(source))
+
+    def get_loader(self):
+        return LazyLoader([self.module_dir],
+                          copy.deepcopy(self.loader_opts),
+                          tag='module')
+
+    def test_file_mapping(self):
+        '''
+        Test that the cached file mapping is used until the module
+        directory changes
+        '''
+        loader = self.get_loader()
+        self.assertEqual(sorted(loader.file_mapping),
+                         ['cacheok', 'cachereject'])
+
+        with patch('os.listdir', side_effect=os.listdir) as listdir:
+            loader = self.get_loader()
+        self.assertEqual(sorted(loader.file_mapping),
+                         ['cacheok', 'cachereject'])
+        listdir.assert_not_called()
+
+        self.write_module('cachenew', 'def test():\n    return True\n')
+        # Make sure the directory does not keep the same mtime
+        stamp = os.stat(self.module_dir).st_mtime + 5
+        os.utime(self.module_dir, (stamp, stamp))
+        loader = self.get_loader()
+        self.assertIn('cachenew', loader.file_mapping)
+
+    def test_virtual(self):
+        '''
+        Test that the modules rejected by their __virtual__ function are not
+        imported again
+        '''
+        loader = self.get_loader()
+        self.assertTrue(loader['cachevirt.test']())
+        self.assertNotIn('cachereject.test', loader)
+        for modname in list(sys.modules):
+            if modname.startswith('salt.loaded.ext.module.cache'):
+                del sys.modules[modname]
+        # The outcomes are kept for the source files of the modules
+        for name in loader_cache_modules:
+            remove_bytecode(os.path.join(self.module_dir, '{0}.py'.format(name)))
+
+        loader = self.get_loader()
+        self.assertNotIn('cachereject.test', loader)
+        self.assertNotIn('salt.loaded.ext.module.cachereject', sys.modules)
+        self.assertEqual(loader.missing_fun_string('cachereject.test'),
+                         '\'cachereject\' __virtual__ returned False: '
+                         'missing dependencies')
+        self.assertTrue(loader['cachevirt.test']())
+
+    def test_virtual_override(self):
+        '''
+        Test that a module named after a cached virtual name still overrides
+        the module providing it, like a custom module does
+        '''
+        custom_dir = os.path.join(self.tmp_dir, 'custom')
+        os.makedirs(custom_dir)
+        with salt.utils.files.fopen(
+                os.path.join(custom_dir, 'cachevirt.py'), 'w') as fh:
+            fh.write(salt.utils.stringutils.to_str(
+                'def test():\n    return \'custom\'\n'))
+
+        loader = LazyLoader([custom_dir, self.module_dir],
+                            copy.deepcopy(self.loader_opts),
+                            tag='module')
+        # The module providing the virtual name is loaded first
+        loader._load_module('cacheok')
+        loader._load_module('cachevirt')
+        loader._save_virtual_cache()
+        self.assertEqual(loader._get_virtual_cache()['cacheok']['names'],
+                         ['cachevirt'])
+        for modname in list(sys.modules):
+            if modname.startswith('salt.loaded.ext.module.cache'):
+                del sys.modules[modname]
+
+        loader = LazyLoader([custom_dir, self.module_dir],
+                            copy.deepcopy(self.loader_opts),
+                            tag='module')
+        self.assertEqual(loader['cachevirt.test'](), 'custom')
+
+
+class GrainFuncsTest(TestCase):
+    '''
+    Test running the grains functions concurrently
+    '''
+    def setUp(self):
+        self.release = threading.Event()
+
+    def tearDown(self):
+        # Let the threads of the slow grains functions end
+        self.release.set()
+
+    def _slow(self):
+        self.release.wait(10)
+        return {'slow': True}
+
+    @staticmethod
+    def _fast(value):
+        return {'fast': value}
+
+    @staticmethod
+    def _failed():
+        raise ValueError('bad grain')
+
+    def test_serial(self):
+        '''
+        Test that the grains functions run in order without workers
+        '''
+        ret = _run_grain_funcs({}, [('test.fast', self._fast, (1,)),
+                                    ('test.failed', self._failed, ())])
+        self.assertEqual(ret['test.fast']['state'], 'ok')
+        self.assertEqual(ret['test.fast']['ret'], {'fast': 1})
+        self.assertEqual(ret['test.failed']['state'], 'failed')
+        self.assertIs(ret['test.failed']['exc_info'][0], ValueError)
+
+    def test_timeout(self):
+        '''
+        Test that a grains function timing out does not hold the others
+        '''
+        opts = {'grains_workers': 1,
+                'grains_timeouts': {'test.slow': 0.2}}
+        start = time.time()
+        ret = _run_grain_funcs(opts, [('test.slow', self._slow, ()),
+                                      ('test.fast', self._fast, (2,)),
+                                      ('test.failed', self._failed, ())])
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(ret['test.slow']['state'], 'timeout')
+        self.assertNotIn('ret', ret['test.slow'])
+        # The slow function was replaced by a new worker
+        self.assertEqual(ret['test.fast']['ret'], {'fast': 2})
+        self.assertEqual(ret['test.failed']['state'], 'failed')
+
+
 submodule_template = '''
 from __future__ import absolute_import
 
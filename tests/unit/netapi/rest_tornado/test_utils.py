@@ -221,3 +221,55 @@ class TestEventListener(AsyncTestCase):
 
             self.assertEqual(0, len(event_listener.tag_map))
             self.assertEqual(0, len(event_listener.request_map))
+
+    def test_match_keys(self):
+        '''
+        Make sure the events are only matched against the indexed keys they
+        can match
+        '''
+        with eventpublisher_process():
+            event_listener = saltnado.EventListener({},  # we don't use mod_opts, don't save?
+                                                    {'sock_dir': SOCK_DIR,
+                                                     'transport': 'zeromq'})
+            self._finished = False  # fit to event_listener's behavior
+            exact = saltnado.EventListener.exact_matcher
+            prefix = saltnado.EventListener.prefix_matcher
+            event_listener.get_event(self, tag='salt/job/1/ret/m1', matcher=exact)
+            event_listener.get_event(self, tag='salt/job/1/ret/m2', matcher=exact)
+            event_listener.get_event(self, tag='salt/job/1')
+            event_listener.get_event(self, tag='salt/job/2')
+            event_listener.get_event(self, tag='salt/job/1/ret/m1', matcher=lambda mtag, tag: True)
+
+            keys = event_listener._match_keys('salt/job/1/ret/m1')
+            self.assertEqual(len(keys), 3)
+            self.assertIn(('salt/job/1/ret/m1', exact), keys)
+            self.assertIn(('salt/job/1', prefix), keys)
+
+            event_listener.clean_by_request(self)
+            self.assertEqual(event_listener.prefix_trie, {})
+            self.assertEqual(event_listener.matcher_keys, set())
+
+    def test_subscribe(self):
+        '''
+        Make sure a subscription gets all of the matching events
+        '''
+        with eventpublisher_process():
+            me = salt.utils.event.MasterEvent(SOCK_DIR)
+            event_listener = saltnado.EventListener({},  # we don't use mod_opts, don't save?
+                                                    {'sock_dir': SOCK_DIR,
+                                                     'transport': 'zeromq'})
+            self._finished = False  # fit to event_listener's behavior
+            queue = event_listener.subscribe(self, tag='evt')
+            event_listener.get_event(self, tag='evt3', callback=lambda f: self.stop())
+            me.fire_event({'data': 'foo1'}, 'evt1')
+            me.fire_event({'data': 'foo2'}, 'other')
+            me.fire_event({'data': 'foo3'}, 'evt3')
+            self.wait()
+
+            self.assertEqual(queue.qsize(), 2)
+            self.assertEqual(queue.get_nowait()['tag'], 'evt1')
+            self.assertEqual(queue.get_nowait()['tag'], 'evt3')
+
+            event_listener.unsubscribe(self, queue)
+            self.assertEqual(0, len(event_listener.queue_map))
+            self.assertEqual(0, len(event_listener.subscription_map))
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+'''
+Unit tests for the segment job cache (segment_cache).
+'''
+
+# Import Python libs
+from __future__ import absolute_import, print_function, unicode_literals
+import os
+import shutil
+import tempfile
+
+# Import Salt Testing libs
+from tests.support.mixins import LoaderModuleMockMixin
+from tests.support.paths import TMP
+from tests.support.unit import TestCase, skipIf
+from tests.support.mock import NO_MOCK, NO_MOCK_REASON
+
+# Import Salt libs
+import salt.returners.segment_cache as segment_cache
+
+OLD_JID = '20000101000000000000'
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class SegmentCacheTestCase(TestCase, LoaderModuleMockMixin):
+    '''
+    Tests for the segment_cache returner
+    '''
+    def setup_loader_modules(self):
+        self.tmp_cachedir = tempfile.mkdtemp(dir=TMP)
+        return {segment_cache: {'__opts__': {'cachedir': self.tmp_cachedir,
+                                             'keep_jobs': 24}}}
+
+    def tearDown(self):
+        segment_cache._INDEXES.clear()
+        shutil.rmtree(self.tmp_cachedir)
+
+    def _store_job(self, jid=None):
+        jid = segment_cache.prep_jid(passed_jid=jid)
+        segment_cache.save_load(
+            jid,
+            {'jid': jid, 'fun': 'test.ping', 'arg': [], 'tgt': '*',
+             'tgt_type': 'glob', 'user': 'root'},
+            minions=['alpha', 'beta'])
+        segment_cache.returner({'jid': jid, 'id': 'alpha', 'return': True,
+                                'retcode': 0, 'success': True})
+        segment_cache.returner({'jid': jid, 'id': 'beta', 'return': True,
+                                'out': 'nested'})
+        return jid
+
+    def test_store_and_get_job(self):
+        '''
+        Test that the load, minions and returns of a job are read back
+        '''
+        jid = self._store_job()
+        segment_cache.save_minions(jid, ['gamma'], syndic_id='syndic')
+
+        load = segment_cache.get_load(jid)
+        self.assertEqual(load['fun'], 'test.ping')
+        self.assertEqual(load['Minions'], ['alpha', 'beta', 'gamma'])
+        self.assertEqual(
+            segment_cache.get_jid(jid),
+            {'alpha': {'return': True, 'retcode': 0, 'success': True},
+             'beta': {'return': True, 'out': 'nested'}})
+        self.assertEqual(list(segment_cache.get_jids()), [jid])
+        self.assertEqual(segment_cache.get_load('20010101000000000000'), {})
+
+        # Another process reads the segment from scratch
+        segment_cache._INDEXES.clear()
+        self.assertEqual(len(segment_cache.get_jid(jid)), 2)
+
+    def test_extra_return_dropped(self):
+        '''
+        Test that a second return of a minion for the same job is dropped
+        '''
+        jid = self._store_job()
+        self.assertFalse(
+            segment_cache.returner({'jid': jid, 'id': 'alpha',
+                                    'return': False}))
+        self.assertTrue(segment_cache.get_jid(jid)['alpha']['return'])
+
+    def test_nocache(self):
+        '''
+        Test that the returns of a nocache job are not stored
+        '''
+        jid = segment_cache.prep_jid(nocache=True)
+        segment_cache.returner({'jid': jid, 'id': 'alpha', 'return': True})
+        self.assertEqual(segment_cache.get_jid(jid), {})
+
+    def test_endtime(self):
+        '''
+        Test storing the end time of a job
+        '''
+        jid = self._store_job()
+        self.assertFalse(segment_cache.get_endtime(jid))
+        segment_cache.update_endtime(jid, '2018, Jan 01 00:00:00.000000')
+        self.assertEqual(segment_cache.get_endtime(jid),
+                         '2018, Jan 01 00:00:00.000000')
+
+    def test_clean_old_jobs(self):
+        '''
+        Test that the segments of expired jobs are unlinked as a whole
+        '''
+        new_jid = self._store_job()
+        self._store_job(OLD_JID)
+        self.assertEqual(len(os.listdir(segment_cache._job_dir())), 4)
+
+        segment_cache.clean_old_jobs()
+        self.assertEqual(len(os.listdir(segment_cache._job_dir())), 2)
+        self.assertEqual(segment_cache.get_jid(OLD_JID), {})
+        self.assertEqual(len(segment_cache.get_jid(new_jid)), 2)
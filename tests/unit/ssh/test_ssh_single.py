@@ -10,19 +10,69 @@ import os.path
 
 # Import Salt Testing libs
 from tests.support.unit import TestCase, skipIf
-from tests.support.mock import NO_MOCK, NO_MOCK_REASON
+from tests.support.mock import NO_MOCK, NO_MOCK_REASON, patch, MagicMock
 
 # Import Salt libs
 import tests.integration as integration
+import salt.defaults.exitcodes
 import salt.utils.thin as thin
 from salt.client import ssh
 
+# Import 3rd-party libs
+import tornado.concurrent
+import tornado.ioloop
+
 
 @skipIf(NO_MOCK, NO_MOCK_REASON)
 class SSHSingleTests(TestCase):
     def setUp(self):
         self.tmp_cachedir = tempfile.mkdtemp(dir=integration.TMP)
 
+    def _single(self):
+        opts = {
+            'argv': ['test.ping'],
+            '__role': 'master',
+            'cachedir': self.tmp_cachedir,
+            'extension_modules': os.path.join(self.tmp_cachedir, 'extmods'),
+        }
+        return ssh.Single(
+                opts,
+                opts['argv'],
+                'localhost',
+                host='login1',
+                mods={},
+                fsclient=None,
+                thin=thin.thin_path(opts['cachedir']),
+                mine=False)
+
+    def _cmd_block_async(self, stdout, stderr, retcode):
+        single = self._single()
+        future = tornado.concurrent.Future()
+        future.set_result((stdout, stderr, retcode))
+        with patch.object(single, '_cmd_str', MagicMock(return_value='')), \
+                patch.object(single.shell, 'exec_cmd_async',
+                             MagicMock(return_value=future)):
+            return tornado.ioloop.IOLoop().run_sync(single.cmd_block_async)
+
+    def test_cmd_block_async(self):
+        '''
+        Check that the SHIM output is stripped from the command output
+        '''
+        stdout = '{0}\n{{"local": true}}'.format(ssh.RSTR)
+        stderr = '{0}\n'.format(ssh.RSTR)
+        self.assertEqual(self._cmd_block_async(stdout, stderr, 0),
+                         ('{"local": true}', '', 0))
+
+    def test_cmd_block_async_master_request(self):
+        '''
+        Check that the master requests of the SHIM are left to cmd_block
+        '''
+        stdout = '{0}\ndeploy\n'.format(ssh.RSTR)
+        self.assertIsNone(self._cmd_block_async(
+            stdout, '', salt.defaults.exitcodes.EX_THIN_DEPLOY))
+        self.assertIsNone(self._cmd_block_async(
+            '', 'Host key verification failed.\r\n', 255))
+
     def test_single_opts(self):
         ''' Sanity check for ssh.Single options
         '''
@@ -63,3 +113,21 @@ class SSHSingleTests(TestCase):
                          'PasswordAuthentication=yes -o ConnectTimeout=65 -o Port=22 '
                          '-o IdentityFile=/etc/salt/pki/master/ssh/salt-ssh.rsa '
                          '-o User=root  date +%s')
+
+    def test_control_opts(self):
+        '''
+        Check that the sessions are multiplexed over a persistent master
+        connection
+        '''
+        single = self._single()
+        single.shell.opts = {'cachedir': self.tmp_cachedir,
+                             '_ssh_version': (7,),
+                             'ssh_control_persist': 60}
+        control_path = os.path.join(self.tmp_cachedir, 'ssh_control', '%C')
+        self.assertEqual(single.shell._control_opts(),
+                         ['ControlMaster=auto',
+                          'ControlPath={0}'.format(control_path),
+                          'ControlPersist=60'])
+        self.assertTrue(os.path.isdir(os.path.dirname(control_path)))
+        single.shell.opts['ssh_control_persist'] = 0
+        self.assertEqual(single.shell._control_opts(), [])
@@ -28,6 +28,7 @@ from salt.ext.six.moves import builtins
 import salt.utils.json
 from salt.utils.decorators.jinja import JinjaFilter
 from salt.utils.jinja import (
+    SaltBytecodeCache,
     SaltCacheLoader,
     SerializerExtension,
     ensure_sequence_filter
@@ -269,6 +270,45 @@ class TestGetTemplate(TestCase):
             self.assertEqual(out, 'Hey world !Hi Salt !' + os.linesep)
             self.assertEqual(fc.requests[0]['path'], 'salt://macro')
 
+    def test_bytecode_cache(self):
+        '''
+        The templates are compiled to the bytecode cache of the cachedir, the
+        environment is reused and the imported templates are requested from
+        the master again by the following renders.
+        '''
+        fc = MockFileClient()
+        opts = {'cachedir': self.TEMPDIR, 'file_client': 'remote',
+                'file_roots': self.local_opts['file_roots'],
+                'pillar_roots': self.local_opts['pillar_roots'],
+                'jinja_bytecode_cache': True}
+        with patch.object(SaltCacheLoader, 'file_client', MagicMock(return_value=fc)):
+            filename = os.path.join(self.TEMPLATES_DIR, 'hello_import')
+            with salt.utils.files.fopen(filename) as fp_:
+                tmplstr = salt.utils.stringutils.to_unicode(fp_.read())
+            for args in (('Hi', 'Salt'), ('Bye', 'Jinja')):
+                out = render_jinja_tmpl(
+                    tmplstr,
+                    dict(opts=opts, a=args[0], b=args[1], saltenv='test',
+                         salt=self.local_salt))
+                self.assertEqual(
+                    out, 'Hey world !{0} {1} !'.format(*args) + os.linesep)
+        self.assertEqual([request['path'] for request in fc.requests],
+                         ['salt://macro', 'salt://macro'])
+        self.assertEqual(len(os.listdir(os.path.join(self.TEMPDIR, 'jinja'))), 2)
+
+    def test_bytecode_cache_pruned(self):
+        '''
+        At most max_files templates are kept in the bytecode cache
+        '''
+        opts = dict(self.local_opts, jinja_bytecode_cache=True)
+        with patch.object(SaltBytecodeCache, 'max_files', 2):
+            for idx in range(4):
+                out = render_jinja_tmpl(
+                    '{{ ' + six.text_type(idx) + ' }}',
+                    dict(opts=opts, saltenv='test', salt=self.local_salt))
+                self.assertEqual(out, six.text_type(idx))
+        self.assertEqual(len(os.listdir(os.path.join(self.TEMPDIR, 'jinja'))), 2)
+
     def test_macro_additional_log_for_generalexc(self):
         '''
         If we failed in a macro because of e.g. a TypeError, get
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.test_beacons
+    ~~~~~~~~~~~~~~~~~~~~~~~
+'''
+
+# Import Python libs
+from __future__ import absolute_import, print_function, unicode_literals
+
+# Import Salt Testing libs
+from tests.support.unit import skipIf, TestCase
+from tests.support.mock import NO_MOCK, NO_MOCK_REASON, MagicMock, patch
+
+# Import Salt libs
+import salt.beacons
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class BeaconWatchTestCase(TestCase):
+    '''
+    Test the beacons run when their file descriptors are readable
+    '''
+
+    def setUp(self):
+        self.runs = []
+
+        def beacon(config):
+            self.runs.append(config)
+            return [{'run': len(self.runs)}]
+
+        def get_fds(config):
+            return [42]
+
+        modules = {'fdbeacon.beacon': beacon, 'fdbeacon.get_fds': get_fds}
+        with patch('salt.loader.beacons', MagicMock(return_value=modules)):
+            self.beacons = salt.beacons.Beacon({'id': 'minion'}, {})
+        self.io_loop = MagicMock(READ=1)
+        self.config = {'fdbeacon': [{'foo': 'bar'}]}
+        self.events = []
+        self.beacons.set_io_loop(
+            self.io_loop,
+            lambda: self.events.extend(
+                self.beacons.process(self.config, {}, ready_only=True)))
+
+    def tearDown(self):
+        del self.runs
+        del self.beacons
+        del self.io_loop
+        del self.config
+        del self.events
+
+    def test_fd_fired_twice(self):
+        '''
+        Test that the beacon is run each time its file descriptor is
+        readable, without waiting for the next loop_interval
+        '''
+        self.assertEqual(len(self.beacons.process(self.config, {})), 1)
+        self.assertEqual(self.io_loop.add_handler.call_count, 1)
+        fd, handler, events = self.io_loop.add_handler.call_args[0]
+        self.assertEqual((fd, events), (42, self.io_loop.READ))
+
+        handler(fd, self.io_loop.READ)
+        self.assertEqual(len(self.runs), 2)
+        # The file descriptor is watched again once the beacon ran
+        self.assertEqual(self.io_loop.update_handler.call_args_list[-1][0],
+                         (42, self.io_loop.READ))
+        self.assertNotIn('fdbeacon', self.beacons.muted)
+
+        handler(fd, self.io_loop.READ)
+        self.assertEqual(len(self.runs), 3)
+        self.assertEqual([event['data']['run'] for event in self.events],
+                         [2, 3])
+        self.assertEqual(self.io_loop.add_handler.call_count, 1)
+
+        # Not run by the next loop_interval without data
+        self.assertEqual(self.beacons.process(self.config, {}), [])
+        self.assertEqual(len(self.runs), 3)
@@ -9,10 +9,16 @@ from __future__ import absolute_import, print_function, unicode_literals
 # Import Salt Testing libs
 import tests.integration as integration
 from tests.support.unit import TestCase, skipIf
-from tests.support.mock import patch, NO_MOCK, NO_MOCK_REASON
+from tests.support.mock import patch, MagicMock, NO_MOCK, NO_MOCK_REASON
+
+# Import 3rd-party libs
+import tornado.concurrent
+import tornado.gen
+from tornado.testing import AsyncTestCase, gen_test
 
 # Import Salt libs
 from salt import client
+import salt.client.stream
 import salt.utils.platform
 from salt.exceptions import (
     EauthAuthenticationError, SaltInvocationError, SaltClientError, SaltReqTimeoutError
@@ -47,6 +53,56 @@ class LocalClientTestCase(TestCase,
 
         self.assertDictEqual(valid_pub_data, self.client._check_pub_data(valid_pub_data))
 
+    def test_run_job_subscribe_before_pub(self):
+        '''
+        Test that the events of a job are subscribed to before the job is
+        published when the publisher filters the events
+        '''
+        event = MagicMock(tag_prefixes=[])
+
+        def pub(*args, **kwargs):
+            event.subscribe.assert_called_once_with(
+                'salt/job/{0}'.format(kwargs['jid']))
+            return {'jid': kwargs['jid'], 'minions': ['m1']}
+
+        with patch.object(self.client, 'event', event), \
+                patch.object(self.client, 'pub', MagicMock(side_effect=pub)), \
+                patch.dict(self.client.opts, {'order_masters': False}):
+            pub_data = self.client.run_job('m1', 'test.ping', listen=True)
+            self.assertTrue(pub_data['jid'])
+            # Not subscribed twice by _check_pub_data
+            self.assertEqual(event.subscribe.call_count, 1)
+            self.client._clean_up_subscriptions(pub_data['jid'])
+
+            # The subscription is dropped if no minion was targeted
+            event.reset_mock()
+            self.client.pub.side_effect = lambda *args, **kwargs: {
+                'jid': kwargs['jid'], 'minions': []}
+            self.assertEqual(
+                self.client.run_job('m2', 'test.ping', listen=True), {})
+            event.unsubscribe.assert_called_once_with(
+                'salt/job/{0}'.format(self.client.pub.call_args[1]['jid']))
+            self.assertEqual(self.client._subscribed_jids, set())
+
+    def test_add_stream_held_events(self):
+        '''
+        Test that the events of a job read before its stream is added are
+        handled by the stream
+        '''
+        handled = tornado.concurrent.Future()
+        handled.set_result(None)
+        stream = MagicMock()
+        stream.handle_event.return_value = handled
+        raw = {'tag': 'salt/job/1234/ret/m1', 'data': {'id': 'm1'}}
+        with patch.object(self.client, '_read_stream_events', MagicMock()), \
+                patch.object(self.client, '_streams', {}), \
+                patch.object(self.client, '_stream_reader', None):
+            self.client._add_stream('1234')
+            self.client._streams['1234'].append(raw)
+            self.client._add_stream('1234', stream)
+            stream.handle_event.assert_called_once_with(raw)
+            self.assertIs(self.client._streams['1234'], stream)
+
     def test_cmd_subset(self):
         with patch('salt.client.LocalClient.cmd', return_value={'minion1': ['first.func', 'second.func'],
                                                                 'minion2': ['first.func', 'second.func']}):
@@ -126,3 +182,102 @@ class LocalClientTestCase(TestCase,
                 self.assertRaises(SaltInvocationError,
                                   self.client.pub,
                                   'non_existent_group', 'test.ping', tgt_type='nodegroup')
+
+
+class ReturnStreamTestCase(AsyncTestCase):
+
+    def _stream(self, minions, **kwargs):
+        local = MagicMock()
+        local.opts = {'syndic_wait': 1, 'order_masters': False}
+        local.event.io_loop = self.io_loop
+        stream = salt.client.stream.ReturnStream(
+            local, '1234', minions, 5, 5, **kwargs)
+        stream.start()
+        return stream
+
+    def _ret(self, minion, ret):
+        return {'tag': 'salt/job/1234/ret/{0}'.format(minion),
+                'data': {'id': minion, 'return': ret, 'jid': '1234'}}
+
+    def test_tag_jid(self):
+        self.assertEqual(salt.client.stream.tag_jid('salt/job/1234/ret/m1'), '1234')
+        self.assertEqual(salt.client.stream.tag_jid('salt/job/1234'), '1234')
+        self.assertIsNone(salt.client.stream.tag_jid('salt/auth'))
+
+    @gen_test
+    def test_get(self):
+        stream = self._stream(['m1', 'm2'])
+        yield stream.handle_event(self._ret('m1', True))
+        ret = yield stream.get()
+        self.assertEqual(ret, {'m1': {'ret': True, 'jid': '1234'}})
+        self.assertFalse(stream.finished)
+        yield stream.handle_event(self._ret('m2', False))
+        self.assertTrue(stream.finished)
+        stream.client._remove_stream.assert_called_once_with(stream)
+        ret = yield stream.get()
+        self.assertEqual(ret, {'m2': {'ret': False, 'jid': '1234'}})
+        ret = yield stream.get()
+        self.assertIsNone(ret)
+        ret = yield stream.get()
+        self.assertIsNone(ret)
+
+    @gen_test
+    def test_backpressure(self):
+        stream = self._stream(['m1', 'm2'], max_pending=1)
+        yield stream.handle_event(self._ret('m1', True))
+        handled = stream.handle_event(self._ret('m2', True))
+        yield tornado.gen.moment
+        self.assertFalse(handled.done())
+        ret = yield stream.get()
+        self.assertIn('m1', ret)
+        ret = yield stream.get()
+        self.assertIn('m2', ret)
+        yield handled
+        self.assertTrue(stream.finished)
+
+    @gen_test
+    def test_reducer(self):
+        stream = self._stream(['m1', 'm2', 'm3'],
+                              reducer=salt.client.stream.aggregate,
+                              expect_minions=True)
+        yield stream.handle_event(self._ret('m1', 'Debian'))
+        yield stream.handle_event(self._ret('m2', 'Debian'))
+        self.assertEqual(stream.queue.qsize(), 0)
+        yield stream.finish()
+        counts = yield stream.wait()
+        self.assertEqual(counts, {'Debian': 2, None: 1})
+
+    @gen_test
+    def test_count(self):
+        stream = self._stream(['m1', 'm2'], reducer=salt.client.stream.count)
+        yield stream.handle_event(self._ret('m1', True))
+        yield stream.handle_event(self._ret('m2', True))
+        total = yield stream.wait()
+        self.assertEqual(total, 2)
+
+    @gen_test
+    def test_gather_early_jinfo_return(self):
+        stream = self._stream(['m1', 'm2'])
+        yield stream.handle_event(self._ret('m1', True))
+        registered = tornado.concurrent.Future()
+        registered.set_result(None)
+        stream.client._add_stream.return_value = registered
+
+        @tornado.gen.coroutine
+        def run_job_async(tgt, fun, jid=None, **kwargs):
+            # the minion answers before the publish call returns
+            stream.client._add_stream.assert_called_once_with(jid, stream)
+            yield stream.handle_event({
+                'tag': 'salt/job/{0}/ret/m2'.format(jid),
+                'data': {'id': 'm2', 'jid': jid,
+                         'return': {'jid': '1234', 'fun': 'test.sleep'}}})
+            raise tornado.gen.Return({'jid': jid, 'minions': ['m2']})
+
+        stream.client.run_job_async.side_effect = run_job_async
+        yield stream._gather()
+        jid = stream.client.run_job_async.call_args[1]['jid']
+        self.assertEqual(stream.jinfo_jids, set([jid]))
+        self.assertEqual(stream.running, set(['m2']))
+        self.assertFalse(stream.finished)
+        stream.client._remove_stream_jid.assert_not_called()
+        yield stream.finish()
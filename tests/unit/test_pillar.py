@@ -10,6 +10,8 @@
 
 # Import python libs
 from __future__ import absolute_import
+import os
+import shutil
 import tempfile
 
 # Import Salt Testing libs
@@ -684,6 +686,114 @@ foo_wildcard:
 
         client.get_state.side_effect = get_state
 
+    def _fragment_cache_opts(self):
+        cachedir = tempfile.mkdtemp(dir=TMP)
+        self.addCleanup(shutil.rmtree, cachedir)
+        return {
+            'renderer': 'yaml',
+            'renderer_blacklist': [],
+            'renderer_whitelist': [],
+            'state_top': '',
+            'pillar_roots': {'base': []},
+            'file_roots': {'base': []},
+            'extension_modules': '',
+            'saltenv': 'base',
+            'cachedir': cachedir,
+            'pillar_sls_cache': True,
+            'ext_pillar_cache_ttl': {'fake_ext_pillar': 60},
+        }
+
+    def test_sls_cache(self):
+        '''
+        Test that a pillar SLS file is rendered again only when it changed
+        '''
+        sls_file = tempfile.NamedTemporaryFile(dir=TMP, delete=False)
+        self.addCleanup(sls_file.close)
+        sls_file.write(b'foo: bar')
+        sls_file.flush()
+        with patch('salt.pillar.salt.fileclient.get_file_client', autospec=True) as get_file_client, \
+                patch('salt.pillar.salt.minion.Matcher'), \
+                patch('salt.pillar.compile_template',
+                      MagicMock(return_value={'foo': 'bar'})) as compile_template:
+            client = get_file_client.return_value
+            client.get_state.return_value = {'path': '', 'dest': sls_file.name}
+            pillar = salt.pillar.Pillar(self._fragment_cache_opts(),
+                                        {'os': 'Ubuntu'}, 'minion', 'base')
+            for _ in range(2):
+                state, mods, errors = pillar.render_pstate('foo', 'base', set())
+                self.assertEqual(state, {'foo': 'bar'})
+                self.assertEqual(mods, set(['foo']))
+                self.assertEqual(errors, [])
+            self.assertEqual(compile_template.call_count, 1)
+
+            sls_file.write(b'\nbaz: qux')
+            sls_file.flush()
+            pillar.render_pstate('foo', 'base', set())
+            self.assertEqual(compile_template.call_count, 2)
+
+    def test_shared_render_cache(self):
+        '''
+        Test that the rendering of a pillar SLS file which reads no minion
+        data is shared by the minions
+        '''
+        opts = self._fragment_cache_opts()
+        opts.update({'renderer': 'jinja|yaml',
+                     'pillar_sls_cache': False,
+                     'pillar_shared_render_cache': True})
+        sls_file = tempfile.NamedTemporaryFile(dir=TMP, delete=False)
+        self.addCleanup(sls_file.close)
+        sls_file.write(b'{% set foo = "bar" %}\nfoo: {{ foo }}\nsls: {{ sls }}')
+        sls_file.flush()
+        with patch('salt.pillar.salt.fileclient.get_file_client', autospec=True) as get_file_client, \
+                patch('salt.pillar.salt.minion.Matcher'), \
+                patch('salt.pillar.compile_template',
+                      MagicMock(return_value={'foo': 'bar'})) as compile_template:
+            client = get_file_client.return_value
+            client.get_state.return_value = {'path': '', 'dest': sls_file.name}
+            for minion_id in ('minion1', 'minion2'):
+                pillar = salt.pillar.Pillar(opts, {'id': minion_id},
+                                            minion_id, 'base')
+                state, mods, errors = pillar.render_pstate('foo', 'base', set())
+                self.assertEqual(state, {'foo': 'bar'})
+                self.assertEqual(errors, [])
+            self.assertEqual(compile_template.call_count, 1)
+
+            # Templates reading the grains are rendered for each minion
+            sls_file.write(b'\nid: {{ grains.id }}')
+            sls_file.flush()
+            for minion_id in ('minion1', 'minion2'):
+                pillar = salt.pillar.Pillar(opts, {'id': minion_id},
+                                            minion_id, 'base')
+                pillar.render_pstate('foo', 'base', set())
+            self.assertEqual(compile_template.call_count, 3)
+
+            salt.pillar.clear_shared_render_cache(opts)
+            self.assertFalse(os.path.exists(
+                os.path.join(opts['cachedir'], 'pillar_shared')))
+
+    def test_ext_pillar_cache(self):
+        '''
+        Test that the data of an ext_pillar is fetched again only when the
+        pillar passed to it changed
+        '''
+        opts = self._fragment_cache_opts()
+        opts['ext_pillar'] = [{'fake_ext_pillar': {'arg': 'foo'}}]
+        mock_ext_pillar_func = MagicMock(return_value={'ext': 'data'})
+        with patch('salt.loader.pillars',
+                   MagicMock(return_value={'fake_ext_pillar':
+                                           mock_ext_pillar_func})):
+            pillar = salt.pillar.Pillar(opts, {}, 'mocked-minion', 'base')
+        with patch('salt.utils.args.get_function_argspec',
+                   MagicMock(return_value=MagicMock(args=[]))):
+            for _ in range(2):
+                self.assertEqual(pillar.ext_pillar({'foo': 'bar'}),
+                                 ({'foo': 'bar', 'ext': 'data'}, []))
+            mock_ext_pillar_func.assert_called_once_with(
+                'mocked-minion', {'foo': 'bar'}, arg='foo')
+
+            pillar.ext_pillar({'foo': 'baz'})
+            self.assertEqual(mock_ext_pillar_func.call_count, 2)
+
 
 @skipIf(NO_MOCK, NO_MOCK_REASON)
 @patch('salt.transport.Channel.factory', MagicMock())
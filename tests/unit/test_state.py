@@ -22,6 +22,8 @@ from tests.support.mixins import AdaptedConfigurationTestCaseMixin
 # Import Salt libs
 import salt.exceptions
 import salt.state
+import salt.utils.files
+from salt.ext import six
 from salt.utils.odict import OrderedDict, DefaultOrderedDict
 from salt.utils.decorators import state as statedecorators
 
@@ -149,6 +151,115 @@ class HighStateTestCase(TestCase, AdaptedConfigurationTestCaseMixin):
         self.assertEqual(state_usage_dict['base']['unused'], ['state.c'])
 
 
+class ChunkIndexTestCase(TestCase):
+    '''
+    Test the resolution of requisites with the ChunkIndex
+    '''
+    def setUp(self):
+        self.chunks = [
+            {'state': 'pkg', '__id__': 'nginx', 'name': 'nginx', '__sls__': 'web'},
+            {'state': 'file', '__id__': 'conf', 'name': '/etc/nginx.conf', '__sls__': 'web.conf'},
+            {'state': 'service', '__id__': 'nginx_service', 'name': 'nginx', '__sls__': 'web'},
+            {'state': 'cmd', '__id__': 'reload', 'name': 'nginx -s reload', '__sls__': 'other'},
+        ]
+        self.index = salt.state.ChunkIndex(self.chunks)
+
+    def test_match(self):
+        '''
+        Test that the matched chunks are the ones fnmatch matches, in order
+        '''
+        chunks = self.chunks
+        self.assertEqual(self.index.match('id', 'nginx'), [chunks[0], chunks[2]])
+        self.assertEqual(self.index.match('service', 'nginx'), [chunks[2]])
+        self.assertEqual(self.index.match('file', '/etc/nginx.conf'), [chunks[1]])
+        self.assertEqual(self.index.match('id', 'nginx*'), [chunks[0], chunks[2], chunks[3]])
+        self.assertEqual(self.index.match('sls', 'web'), [chunks[0], chunks[2]])
+        self.assertEqual(self.index.match('sls', 'web*'), chunks[:3])
+        self.assertEqual(self.index.match('id', 'apache'), [])
+
+    def test_is_current(self):
+        '''
+        Test that the index does not cover another list of chunks
+        '''
+        self.assertTrue(self.index.is_current(self.chunks))
+        self.assertFalse(self.index.is_current(list(self.chunks)))
+        self.chunks.pop()
+        self.assertFalse(self.index.is_current(self.chunks))
+
+
+class HighStateRenderTestCase(TestCase, AdaptedConfigurationTestCaseMixin):
+    '''
+    Test the parallel and cached rendering of the SLS files
+    '''
+    sls_files = {
+        'common.sls': 'common_file:\n  file.touch:\n    - name: /tmp/common\n',
+        'a.sls': 'include:\n  - common\na_file:\n  file.touch:\n    - name: /tmp/a\n',
+        'b.sls': 'include:\n  - common\nb_file:\n  file.touch:\n    - name: /tmp/b\n',
+        'c.sls': ('{% from "map.jinja" import name %}\n'
+                  'c_file:\n  file.touch:\n    - name: {{ name }}\n'),
+        'map.jinja': '{% set name = "/tmp/c" %}\n',
+    }
+    matches = {'base': ['a', 'b', 'c']}
+
+    def setUp(self):
+        root_dir = tempfile.mkdtemp(dir=integration.TMP)
+        self.state_tree_dir = os.path.join(root_dir, 'state_tree')
+        os.makedirs(self.state_tree_dir)
+        for name, contents in six.iteritems(self.sls_files):
+            self._write(name, contents)
+        self.overrides = {
+            'root_dir': root_dir,
+            'state_events': False,
+            'id': 'match',
+            'file_client': 'local',
+            'file_roots': dict(base=[self.state_tree_dir]),
+            'cachedir': os.path.join(root_dir, 'cachedir'),
+            'test': False,
+        }
+
+    def _write(self, name, contents):
+        with salt.utils.files.fopen(
+                os.path.join(self.state_tree_dir, name), 'w') as fp_:
+            fp_.write(contents)
+
+    def _render(self, **overrides):
+        config = self.get_temp_config('minion', **dict(self.overrides, **overrides))
+        highstate = salt.state.HighState(config)
+        highstate.push_active()
+        try:
+            return highstate.render_highstate(self.matches)
+        finally:
+            highstate.pop_active()
+
+    def test_render_workers(self):
+        '''
+        Test that rendering in workers gives the same highstate, including
+        the automatic ordering, as rendering serially
+        '''
+        high, errors = self._render()
+        self.assertEqual(errors, [])
+        self.assertEqual(list(high),
+                         ['common_file', 'a_file', 'b_file', 'c_file'])
+        self.assertEqual(self._render(state_render_workers=3), (high, errors))
+
+    def test_render_cache(self):
+        '''
+        Test that unchanged SLS files are not rendered again
+        '''
+        high, errors = self._render(state_render_cache=True)
+        render = MagicMock(side_effect=salt.state.compile_template)
+        with patch('salt.state.compile_template', render):
+            self.assertEqual(self._render(state_render_cache=True),
+                             (high, errors))
+            self.assertEqual(render.call_count, 0)
+
+            # A template imported by c.sls changed
+            self._write('map.jinja', '{% set name = "/tmp/d" %}\n')
+            high, errors = self._render(state_render_cache=True)
+            self.assertEqual(render.call_count, 1)
+            self.assertEqual(high['c_file']['file'][0], {'name': '/tmp/d'})
+
+
 class TopFileMergeTestCase(TestCase, AdaptedConfigurationTestCaseMixin):
     '''
     Test various merge strategies for multiple tops files collected from
@@ -27,7 +27,7 @@ from salt.ext.six.moves import range
 # Import Salt Testing libs
 from tests.support.mock import MagicMock
 from tests.support.paths import TMP
-from tests.support.unit import skipIf
+from tests.support.unit import TestCase, skipIf
 
 log = logging.getLogger(__name__)
 
@@ -154,3 +154,38 @@ class IPCMessageClient(BaseIPCReqCase):
         self.channel.send({'stop': True})
         self.wait()
         self.assertEqual(self.payloads[:-1], [None, None, 'foo', 'foo'])
+
+
+class IPCMessagePublisherPrefixes(TestCase):
+    '''
+    Test the tag prefixes registered with the publisher
+    '''
+    def setUp(self):
+        self.publisher = salt.transport.ipc.IPCMessagePublisher(
+            {}, os.path.join(TMP, 'ipc_test.ipc'))
+        self.streams = [MagicMock() for _ in range(3)]
+        self.publisher.streams.update(self.streams)
+        self.publisher.unfiltered_streams.update(self.streams)
+
+    def test_match_streams(self):
+        job, ret, unfiltered = self.streams
+        self.publisher.set_prefixes(job, ['salt/job/', 'salt/auth'])
+        self.publisher.set_prefixes(ret, ['salt/job/1/ret/'])
+
+        self.assertEqual(self.publisher.match_streams('salt/job/1/ret/minion'),
+                         set([job, ret, unfiltered]))
+        self.assertEqual(self.publisher.match_streams('salt/job/2/ret/minion'),
+                         set([job, unfiltered]))
+        self.assertEqual(self.publisher.match_streams('salt/key'),
+                         set([unfiltered]))
+
+    def test_set_prefixes_prunes_trie(self):
+        stream = self.streams[0]
+        self.publisher.set_prefixes(stream, ['salt/job/', 'salt/auth'])
+        self.publisher.set_prefixes(stream, ['salt/job/'])
+        self.assertNotIn('a', self.publisher.prefix_trie['s']['a']['l']['t']['/'])
+
+        self.publisher.set_prefixes(stream, None)
+        self.assertEqual(self.publisher.prefix_trie, {})
+        self.assertEqual(self.publisher.stream_prefixes, {})
+        self.assertIn(stream, self.publisher.match_streams('salt/key'))
@@ -150,6 +150,45 @@ class AESReqTestCases(BaseTCPReqCase, ReqChannelMixin):
                 ret = self.channel.send(msg)
 
 
+@skipIf(salt.utils.platform.is_darwin(), 'hanging test suite on MacOS')
+class StreamReqTestCases(BaseTCPReqCase):
+    '''
+    Test replies streamed by the req server
+    '''
+    def setUp(self):
+        self.channel = salt.transport.client.ReqChannel.factory(self.minion_config)
+
+    def tearDown(self):
+        del self.channel
+
+    @classmethod
+    @tornado.gen.coroutine
+    def _handle_payload(cls, payload):
+        '''
+        Stream back as many messages as requested
+        '''
+        ret = ({'idx': idx} for idx in range(payload['load']['count']))
+        raise tornado.gen.Return((ret, {'fun': 'send_stream'}))
+
+    def test_send_stream(self):
+        '''
+        Test that all but the last message are passed to the callback
+        '''
+        msgs = []
+        ret = self.channel.send_stream({'count': 4}, msgs.append)
+        self.assertEqual(msgs, [{'idx': 0}, {'idx': 1}, {'idx': 2}])
+        self.assertEqual(ret, {'idx': 3})
+
+    def test_send_stream_single(self):
+        '''
+        Test a stream made of the final reply only
+        '''
+        msgs = []
+        ret = self.channel.send_stream({'count': 1}, msgs.append)
+        self.assertEqual(msgs, [])
+        self.assertEqual(ret, {'idx': 0})
+
+
 class BaseTCPPubCase(AsyncTestCase, AdaptedConfigurationTestCaseMixin):
     '''
     Test the req server/client pair
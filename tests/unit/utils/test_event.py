@@ -11,6 +11,8 @@
 from __future__ import absolute_import, unicode_literals, print_function
 import os
 import hashlib
+import shutil
+import tempfile
 import time
 from tornado.testing import AsyncTestCase
 import zmq
@@ -292,6 +294,22 @@ class TestSaltEvent(TestCase):
             evt2 = me2.get_event(tag='evt1')
             self.assertGotEvent(evt2, {'data': 'foo1'})
 
+    def test_event_tag_prefixes(self):
+        '''Test the publisher only sends the events matching the tag prefixes'''
+        with eventpublisher_process():
+            me = salt.utils.event.MasterEvent(SOCK_DIR, listen=True)
+            me.set_tag_prefixes(['evt1'])
+            me.subscribe('evt3')
+            # Let the publisher register the prefixes
+            time.sleep(0.5)
+            me.fire_event({'data': 'foo1'}, 'evt1')
+            me.fire_event({'data': 'foo2'}, 'evt2')
+            me.fire_event({'data': 'foo3'}, 'evt3')
+            evt1 = me.get_event(tag='')
+            evt3 = me.get_event(tag='')
+            self.assertGotEvent(evt1, {'data': 'foo1'})
+            self.assertGotEvent(evt3, {'data': 'foo3'})
+
     @expectedFailure
     def test_event_nested_sub_all(self):
         '''Test nested event subscriptions do not drop events, get event for all tags'''
@@ -338,6 +356,85 @@ class TestSaltEvent(TestCase):
             self.assertGotEvent(evt, {'data': data, 'tag': 'test_master', 'events': None, 'pretag': None})
 
 
+class TestTagPrefix(TestCase):
+    def test_tag_prefix(self):
+        '''Test the prefixes of the tags matched by search tags'''
+        tag_prefix = salt.utils.event.tag_prefix
+        self.assertEqual(tag_prefix('salt/job/123'), 'salt/job/123')
+        # The regex search tags are only anchored by ^
+        self.assertEqual(tag_prefix('syndic/.*/123', 'regex'), '')
+        self.assertEqual(tag_prefix('job/.*/ret', 'regex'), '')
+        self.assertEqual(tag_prefix('ret', 'regex'), '')
+        self.assertEqual(tag_prefix('^syndic/.*/123', 'regex'), 'syndic/')
+        self.assertEqual(tag_prefix('^salt/jobs?/', 'regex'), 'salt/job')
+        self.assertEqual(tag_prefix('^salt/(job|run)/', 'regex'), '')
+        self.assertEqual(tag_prefix('salt/minion/*/start', 'fnmatch'),
+                         'salt/minion/')
+        self.assertEqual(tag_prefix('/ret', 'endswith'), '')
+
+
+class TestEventReturnQueue(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(dir=integration.TMP)
+        self.spill_path = os.path.join(self.tmpdir, 'event_return.spill')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _events(self, count):
+        return [{'tag': 'evt{0}'.format(idx), 'data': {'idx': idx}}
+                for idx in range(count)]
+
+    def test_batches(self):
+        '''
+        Test that events are returned in batches, or as they are once the
+        queue is closed
+        '''
+        queue = salt.utils.event.EventReturnQueue(10)
+        events = self._events(5)
+        for event in events:
+            queue.put(event)
+        self.assertEqual(queue.get(2), events[:2])
+        # The oldest queued event is older than max_age
+        self.assertEqual(queue.get(10, max_age=0.01), events[2:])
+        queue.put(events[0])
+        queue.close()
+        self.assertEqual(queue.get(10), events[:1])
+        self.assertEqual(queue.get(10), [])
+
+    def test_drop_oldest(self):
+        '''
+        Test that the oldest events are dropped from a full queue
+        '''
+        queue = salt.utils.event.EventReturnQueue(3, 'drop_oldest')
+        events = self._events(5)
+        for event in events:
+            self.assertTrue(queue.put(event))
+        self.assertEqual(len(queue), 3)
+        self.assertEqual(queue.dropped, 2)
+        self.assertEqual(queue.get(3), events[2:])
+
+    def test_spill(self):
+        '''
+        Test that the events overflowing the queue are spilled to a file and
+        read back in order, also after a restart
+        '''
+        queue = salt.utils.event.EventReturnQueue(2, 'spill', self.spill_path)
+        events = self._events(7)
+        for event in events:
+            self.assertTrue(queue.put(event))
+        self.assertEqual(len(queue), 7)
+        self.assertEqual(queue.spilled, 5)
+        self.assertEqual(queue.get(2), events[:2])
+        self.assertEqual(queue.get(2), events[2:4])
+
+        # The events read back are not returned again after a restart
+        queue = salt.utils.event.EventReturnQueue(2, 'spill', self.spill_path)
+        self.assertEqual(len(queue), 1)
+        self.assertEqual(queue.get(2, max_age=0.01), events[6:])
+        self.assertFalse(os.path.exists(self.spill_path))
+
+
 class TestAsyncEventPublisher(AsyncTestCase):
     def get_new_ioloop(self):
         return zmq.eventloop.ioloop.ZMQIOLoop()
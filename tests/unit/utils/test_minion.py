@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+'''
+Unit tests for salt.utils.minion
+'''
+
+# Import Python libs
+from __future__ import absolute_import, print_function, unicode_literals
+import itertools
+import time
+
+# Import Salt Testing libs
+from tests.support.unit import TestCase, skipIf
+from tests.support.mock import MagicMock, patch, NO_MOCK, NO_MOCK_REASON
+
+# Import Salt libs
+import salt.utils.minion
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class JobWorkerPoolTestCase(TestCase):
+    '''
+    Tests for the JobWorkerPool bookkeeping, with the worker processes mocked
+    '''
+    def setUp(self):
+        pids = itertools.count(100)
+
+        def _worker(*args, **kwargs):
+            process = MagicMock()
+            process.pid = next(pids)
+            process.is_alive.return_value = True
+            return process
+
+        patcher = patch('salt.utils.minion.JobWorker', side_effect=_worker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('salt.utils.minion.multiprocessing.Pipe',
+                        side_effect=lambda: (MagicMock(), MagicMock()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.minion = MagicMock(connected=True)
+
+    def _done(self, pool, pid):
+        pool.done.put(pid)
+        # Wait for the feeder thread of the queue
+        while pool.done.empty():
+            time.sleep(0.01)
+
+    def test_dispatch(self):
+        '''
+        Test that jobs are queued until a worker is idle
+        '''
+        pool = salt.utils.minion.JobWorkerPool(self.minion, 2)
+        for jid in ('1', '2', '3'):
+            pool.dispatch({'jid': jid})
+        self.assertEqual(sorted(pool.workers), [100, 101])
+        self.assertTrue(all(w['busy'] for w in pool.workers.values()))
+        self.assertEqual(list(pool.pending), [{'jid': '3'}])
+
+        self._done(pool, 100)
+        pool.maintain()
+        self.assertEqual(list(pool.pending), [])
+        self.assertEqual(pool.workers[100]['jobs'], 2)
+        pool.workers[100]['conn'].send.assert_called_with(
+            ({'jid': '3'}, True))
+
+    def test_recycle(self):
+        '''
+        Test that the workers are replaced once idle after a recycle, and
+        after running max_jobs jobs
+        '''
+        pool = salt.utils.minion.JobWorkerPool(self.minion, 2, max_jobs=1)
+        pool.maintain()
+        pool.dispatch({'jid': '1'})
+        busy = [pid for pid, w in pool.workers.items() if w['busy']][0]
+
+        pool.recycle()
+        # The busy worker is kept until its job is done
+        self.assertIn(busy, pool.workers)
+        self.assertEqual(len(pool.workers), 2)
+        self.assertEqual(len(pool.retired), 1)
+
+        self._done(pool, busy)
+        pool.maintain()
+        self.assertNotIn(busy, pool.workers)
+        self.assertEqual(len(pool.workers), 2)
+        self.assertTrue(all(w['generation'] == 1
+                            for w in pool.workers.values()))
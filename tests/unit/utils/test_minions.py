@@ -4,6 +4,7 @@
 from __future__ import absolute_import, unicode_literals
 
 # Import Salt Libs
+import salt.utils.data
 import salt.utils.minions as minions
 
 # Import Salt Testing Libs
@@ -42,6 +43,52 @@ class MinionsTestCase(TestCase):
             self.assertEqual(ret, expected)
 
 
+class CompileCompoundTestCase(TestCase):
+    '''
+    TestCase for salt.utils.minions.compile_compound
+    '''
+    def test_precedence(self):
+        '''
+        Test that "and" binds tighter than "or" and "not" to the next term
+        '''
+        self.assertEqual(
+            minions.compile_compound('web* or G@os:Ubuntu and not L@a,b'),
+            ('or',
+             ('target', None, 'web*', None),
+             ('and',
+              ('target', 'G', 'os:Ubuntu', None),
+              ('not', ('target', 'L', 'a,b', None)))))
+
+    def test_parentheses(self):
+        '''
+        Test grouping, including parentheses left open at the end
+        '''
+        expected = ('and',
+                    ('or', ('target', None, 'a*', None), ('target', None, 'b*', None)),
+                    ('target', 'G', 'os:Ubuntu', None))
+        self.assertEqual(minions.compile_compound(['(', 'a*', 'or', 'b*', ')', 'and', 'G@os:Ubuntu']),
+                         expected)
+        self.assertEqual(minions.compile_compound('not ( a* or b*'),
+                         ('not', ('or', ('target', None, 'a*', None), ('target', None, 'b*', None))))
+
+    def test_invalid(self):
+        '''
+        Test that invalid expressions are rejected
+        '''
+        for expr in ('', 'and a*', 'a* b*', '( or a* )', 'a* )', 'not not a*', 'N@group'):
+            self.assertIsNone(minions.compile_compound(expr), expr)
+
+    def test_cached(self):
+        '''
+        Test that parsed expressions are cached
+        '''
+        with patch.dict(minions._COMPOUND_CACHE, {}, clear=True):
+            tree = minions.compile_compound('a* and b*')
+            with patch.object(minions._CompoundParser, 'parse', MagicMock()) as parse:
+                self.assertIs(minions.compile_compound('a* and b*'), tree)
+                parse.assert_not_called()
+
+
 class CkMinionsTestCase(TestCase):
     '''
     TestCase for salt.utils.minions.CkMinions class
@@ -366,3 +413,114 @@ class CkMinionsTestCase(TestCase):
         args = ['1', '2']
         ret = self.ckminions.auth_check(auth_list, 'test.arg', args, 'runner')
         self.assertTrue(ret)
+
+    def test_check_compound_minions(self):
+        '''
+        Test the evaluation of compound targets with set operations
+        '''
+        ckminions = minions.CkMinions({'minion_data_cache': True})
+        grains = {'os:Ubuntu': ['web1', 'web2'], 'os:CentOS': ['db1']}
+        with patch.object(ckminions, '_pki_minions', MagicMock(return_value=['web1', 'web2', 'db1'])), \
+                patch.object(ckminions, '_check_grain_minions',
+                             MagicMock(side_effect=lambda expr, delim, greedy: {'minions': grains[expr],
+                                                                                 'missing': []})):
+            for expr, expected in (('G@os:Ubuntu and not web2', ['web1']),
+                                   ('G@os:CentOS or web2', ['db1', 'web2']),
+                                   ('not G@os:Ubuntu', ['db1']),
+                                   ('( web* or db* ) and not ( G@os:CentOS or web1 )', ['web2']),
+                                   ('web1 or or', [])):
+                ret = ckminions._check_compound_minions(expr, ':', True)
+                self.assertEqual(sorted(ret['minions']), expected, expr)
+
+
+MINION_DATA = {
+    'web1': {'grains': {'os': 'Ubuntu', 'roles': ['web', 'lb'],
+                        'ip_interfaces': {'eth0': ['10.0.0.1']}},
+             'pillar': {'env': 'prod', 'users': [{'name': 'fred'}]}},
+    'web2': {'grains': {'os': 'ubuntu', 'roles': ['web'],
+                        'ip_interfaces': {'eth0': ['10.0.0.2']}},
+             'pillar': {'env': 'dev:qa'}},
+    'db1': {'grains': {'os': 'CentOS', 'roles': 'db',
+                       'ip_interfaces': {'eth1': ['10.0.1.1']}},
+            'pillar': {'env': 'prod', 'users': [{'name': 'wilma'}]}},
+}
+
+
+class MinionDataIndexTestCase(TestCase):
+    '''
+    TestCase for salt.utils.minions.MinionDataIndex class
+    '''
+    def setUp(self):
+        self.cache = MagicMock()
+        self.cache.list.return_value = list(MINION_DATA)
+        self.cache.updated.return_value = 1
+        self.cache.fetch.side_effect = lambda bank, key: MINION_DATA[bank.split('/', 1)[1]]
+        self.index = minions.MinionDataIndex({}, cache=self.cache)
+        self.index.refresh()
+
+    def tearDown(self):
+        del self.cache
+        del self.index
+
+    def test_match_same_as_subdict_match(self):
+        '''
+        Test that the index matches the same minions as subdict_match
+        '''
+        exprs = ('os:Ubuntu', 'os:ubu*', 'os:C*', 'roles:web', 'roles:d?',
+                 'ip_interfaces:eth0', 'ip_interfaces:*', 'ip_interfaces:eth0:10.0.0.*',
+                 'env:prod', 'env:dev:qa', 'users:name:fred', 'users:*red',
+                 'nope:nope', 'os')
+        for search_type in ('grains', 'pillar'):
+            for expr in exprs:
+                for kwargs in ({}, {'regex_match': True}, {'exact_match': True}):
+                    if kwargs.get('regex_match') and '*' in expr.split(':')[1]:
+                        continue
+                    expected = set(
+                        id_ for id_, data in MINION_DATA.items()
+                        if salt.utils.data.subdict_match(data[search_type], expr, **kwargs)
+                    )
+                    self.assertEqual(
+                        self.index.match(search_type, expr, **kwargs),
+                        expected,
+                        '{0} {1} {2}'.format(search_type, expr, kwargs))
+
+    def test_update_and_remove(self):
+        '''
+        Test incremental updates of the index
+        '''
+        self.assertEqual(self.index.match('grains', 'os:centos'), set(['db1']))
+        self.index.update('db1', {'grains': {'os': 'Debian'}, 'pillar': {}})
+        self.assertEqual(self.index.match('grains', 'os:centos'), set())
+        self.assertEqual(self.index.match('grains', 'os:debian'), set(['db1']))
+        self.index.remove('db1')
+        self.assertEqual(self.index.match('grains', 'os:debian'), set())
+        self.assertEqual(self.index.minions, set(['web1', 'web2']))
+
+    def test_refresh_fetches_changed_minions_only(self):
+        '''
+        Test that a refresh only fetches the data of updated minions
+        '''
+        self.cache.fetch.reset_mock()
+        self.index.refresh(force=True)
+        self.cache.fetch.assert_not_called()
+        self.cache.updated.side_effect = lambda bank, key: 2 if bank == 'minions/web2' else 1
+        self.index.refresh(force=True)
+        self.cache.fetch.assert_called_once_with('minions/web2', 'data')
+
+    def test_check_cache_minions_uses_index(self):
+        '''
+        Test grain targeting through the index
+        '''
+        opts = {'minion_data_cache': True,
+                'minion_data_cache_index': True,
+                'cache': 'index_test',
+                'cachedir': '/tmp'}
+        with patch('salt.cache.factory', MagicMock(return_value=self.cache)), \
+                patch.dict(minions._DATA_INDEXES, {}, clear=True):
+            ckminions = minions.CkMinions(opts)
+            ret = ckminions._check_grain_minions('os:ubuntu', ':', False)
+            self.assertEqual(sorted(ret['minions']), ['web1', 'web2'])
+            with patch('os.listdir', MagicMock(return_value=['db1', 'web1', 'new'])), \
+                    patch('os.path.isfile', MagicMock(return_value=True)):
+                ret = ckminions._check_grain_minions('os:ubuntu', ':', True)
+            self.assertEqual(sorted(ret['minions']), ['new', 'web1'])
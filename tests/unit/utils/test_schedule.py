@@ -309,6 +309,35 @@ class ScheduleTestCase(TestCase):
         self.schedule.eval()
         self.assertTrue(self.schedule.opts['schedule']['testjob']['_splay'] - now > datetime.timedelta(seconds=60))
 
+    def test_eval_schedule_due(self):
+        '''
+        Tests that eval skips the jobs until their next fire time is due
+        '''
+        now = datetime.datetime(2018, 1, 1, 12, 0, 0)
+        job = {'function': 'test.true', 'seconds': 60}
+        self.schedule.opts.update({'pillar': {'schedule': {}}})
+        self.schedule.opts.update({'schedule': {'testjob': job}})
+        with patch.object(self.schedule, '_run_job') as run_job:
+            self.schedule.eval(now=now)
+            self.assertEqual(self.schedule.seconds_until_due(now=now), 60)
+
+            self.schedule.eval(now=now + datetime.timedelta(seconds=30))
+            self.assertEqual(job['_next_fire_time'],
+                             now + datetime.timedelta(seconds=60))
+            run_job.assert_not_called()
+
+            self.schedule.eval(now=now + datetime.timedelta(seconds=60))
+            self.assertEqual(run_job.call_count, 1)
+            self.assertEqual(job['_next_fire_time'],
+                             now + datetime.timedelta(seconds=120))
+
+            # A replaced job is evaluated again
+            self.schedule.opts['schedule']['testjob'] = {'function': 'test.true',
+                                                        'seconds': 10}
+            self.schedule.eval(now=now + datetime.timedelta(seconds=70))
+            self.assertEqual(self.schedule.seconds_until_due(
+                now=now + datetime.timedelta(seconds=70)), 10)
+
     @skipIf(not _CRON_SUPPORTED, 'croniter module not installed')
     def test_eval_schedule_cron(self):
         '''
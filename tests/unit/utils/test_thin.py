@@ -5,7 +5,9 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import os
+import shutil
 import sys
+import tempfile
 from tests.support.unit import TestCase, skipIf
 from tests.support.mock import (
     NO_MOCK,
@@ -14,6 +16,7 @@ from tests.support.mock import (
     patch)
 
 import salt.exceptions
+import salt.utils.files
 from salt.utils import thin
 from salt.utils import json
 import salt.utils.stringutils
@@ -355,6 +358,9 @@ class SSHThinTestCase(TestCase):
 
     @patch('salt.utils.thin.gen_thin', MagicMock(return_value='/path/to/thin/thin.tgz'))
     @patch('salt.utils.hashutils.get_hash', MagicMock(return_value=12345))
+    @patch('os.stat', MagicMock(return_value=MagicMock(st_mtime=1, st_size=2)))
+    @patch('os.path.isfile', MagicMock(return_value=False))
+    @patch('salt.utils.thin._THIN_SUMS', {})
     def test_thin_sum(self):
         '''
         Test thin.thin_sum function.
@@ -369,6 +375,25 @@ class SSHThinTestCase(TestCase):
         assert path == '/path/to/thin/thin.tgz'
         assert form == 'sha256'
 
+    @patch('salt.utils.thin.gen_thin', MagicMock(return_value='/path/to/thin/thin.tgz'))
+    @patch('salt.utils.hashutils.get_hash', MagicMock(return_value=12345))
+    @patch('os.path.isfile', MagicMock(return_value=False))
+    @patch('salt.utils.thin._THIN_SUMS', {})
+    def test_thin_sum_cached(self):
+        '''
+        Test thin.thin_sum function hashes the tarball again only once it
+        changed.
+
+        :return:
+        '''
+        with patch('os.stat', MagicMock(return_value=MagicMock(st_mtime=1, st_size=2))):
+            thin.thin_sum('/cachedir')
+            thin.thin_sum('/cachedir')
+        assert thin.salt.utils.hashutils.get_hash.call_count == 1
+        with patch('os.stat', MagicMock(return_value=MagicMock(st_mtime=3, st_size=2))):
+            thin.thin_sum('/cachedir')
+        assert thin.salt.utils.hashutils.get_hash.call_count == 2
+
     @patch('salt.utils.thin.gen_min', MagicMock(return_value='/path/to/thin/min.tgz'))
     @patch('salt.utils.hashutils.get_hash', MagicMock(return_value=12345))
     def test_min_sum(self):
@@ -610,3 +635,39 @@ class SSHThinTestCase(TestCase):
             tops=tops, extended_cfg=ext_cfg)).strip().split('\n')
         for t_line in ['second-system-effect:2:7', 'solar-interference:2:6']:
             assert t_line in out
+
+    def test_gen_thin_parts(self):
+        '''
+        Test that the thin is generated again by packing only the parts of the
+        top modules which changed.
+        :return:
+        '''
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        cachedir = os.path.join(tmpdir, 'cache')
+        os.makedirs(os.path.join(tmpdir, 'tops', 'foo'))
+        for fname, data in (('foo/__init__.py', ''), ('foo/bar.py', 'bar = 1'), ('baz.py', 'baz = 1')):
+            with salt.utils.files.fopen(os.path.join(tmpdir, 'tops', fname), 'w') as fp_:
+                fp_.write(data)
+        tops = {3: [os.path.join(tmpdir, 'tops', 'foo'), os.path.join(tmpdir, 'tops', 'baz.py')]}
+        with patch('salt.utils.thin._get_tops_py_version_mapping', MagicMock(return_value=tops)):
+            manifest = thin.gen_thin_parts(cachedir)
+            roots = dict([(part['root'], digest) for digest, part in manifest['parts'].items()])
+            assert sorted(roots) == ['', 'py3/baz.py', 'py3/foo']
+            assert thin.gen_thin_parts(cachedir) == manifest
+
+            with salt.utils.files.fopen(os.path.join(tmpdir, 'tops', 'foo', 'bar.py'), 'w') as fp_:
+                fp_.write('bar = 2')
+            baz_part = os.path.join(cachedir, 'thin', 'parts', roots['py3/baz.py'] + '.tgz')
+            baz_inode = os.stat(baz_part).st_ino
+            tmp_part = os.path.join(cachedir, 'thin', 'parts', 'interrupted.tgz.tmp')
+            with salt.utils.files.fopen(tmp_part, 'w') as fp_:
+                fp_.write('')
+            regen = thin.gen_thin_parts(cachedir, overwrite=True)
+        regen_roots = dict([(part['root'], digest) for digest, part in regen['parts'].items()])
+        assert regen_roots['py3/baz.py'] == roots['py3/baz.py']
+        assert regen_roots['py3/foo'] != roots['py3/foo']
+        assert not os.path.exists(os.path.join(cachedir, 'thin', 'parts', roots['py3/foo'] + '.tgz'))
+        assert not os.path.exists(tmp_part)
+        # The part of the unchanged top module was not packed again
+        assert os.stat(baz_part).st_ino == baz_inode
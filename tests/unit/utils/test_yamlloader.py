@@ -6,17 +6,23 @@
 # Import python libs
 from __future__ import absolute_import, print_function, unicode_literals
 import collections
+import functools
+import os
 import textwrap
 
 # Import Salt Libs
+import yaml
 from yaml.constructor import ConstructorError
+from salt.utils.odict import OrderedDict
 from salt.utils.yamlloader import SaltYamlSafeLoader
 import salt.utils.files
+import salt.utils.yamlloader
 from salt.ext import six
 
 # Import Salt Testing Libs
 from tests.support.unit import TestCase, skipIf
 from tests.support.mock import patch, NO_MOCK, NO_MOCK_REASON, mock_open
+from tests.support.paths import FILES
 
 # Import 3rd-party libs
 from salt.ext import six
@@ -172,3 +178,61 @@ class YamlLoaderTestCase(TestCase):
                   b: {foo: bar, one: 1, list: [1, two, 3]}''')),
             {'foo': {'b': {'foo': 'bar', 'one': 1, 'list': [1, 'two', 3]}}}
         )
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+@skipIf(not salt.utils.yamlloader.HAS_LIBYAML, 'libyaml is not available')
+class YamlFastLoaderTestCase(YamlLoaderTestCase):
+    '''
+    TestCase for salt.utils.yamlloader.fast_load, running the tests of the
+    SaltYamlSafeLoader with the SaltYamlCSafeLoader
+    '''
+
+    @staticmethod
+    def render_yaml(data):
+        '''
+        Takes a YAML string, puts it into a mock file, passes that to
+        fast_load and then returns the rendered/parsed YAML data
+        '''
+        if six.PY2:
+            data = salt.utils.data.encode(data)
+        with patch('salt.utils.files.fopen', mock_open(read_data=data)) as mocked_file:
+            with salt.utils.files.fopen(mocked_file) as mocked_stream:
+                return salt.utils.yamlloader.fast_load(mocked_stream)
+
+    def test_fixtures(self):
+        '''
+        fast_load loads the YAML fixtures to the same data as the
+        SaltYamlSafeLoader, or raises the same errors
+        '''
+        def _load(data, dictclass):
+            try:
+                return yaml.load(
+                    data,
+                    Loader=functools.partial(SaltYamlSafeLoader, dictclass=dictclass))
+            except yaml.YAMLError as exc:
+                return exc
+
+        def _fast_load(data, dictclass):
+            try:
+                return salt.utils.yamlloader.fast_load(data, dictclass=dictclass)
+            except yaml.YAMLError as exc:
+                return exc
+
+        loaded = 0
+        for root, _, files in os.walk(FILES):
+            for name in files:
+                if not name.endswith(('.sls', '.yml', '.yaml')):
+                    continue
+                with salt.utils.files.fopen(os.path.join(root, name), 'rb') as fp_:
+                    data = fp_.read()
+                for dictclass in (dict, OrderedDict):
+                    expected = _load(data, dictclass)
+                    ret = _fast_load(data, dictclass)
+                    if isinstance(expected, yaml.YAMLError):
+                        self.assertEqual(str(ret), str(expected))
+                        continue
+                    loaded += 1
+                    self.assertEqual(ret, expected)
+                    self.assertEqual(type(ret), type(expected))
+        self.assertTrue(loaded)